@@ -126,7 +126,7 @@ class SmsViewModel(
                 }
                 
                 val batchInfo = messagesToAnalyze.map { BatchSmsInfo(id = it.id, message = it.body, sender = it.address) }
-                val results = scamDetectionService.analyzeMultipleSms(batchInfo)
+                val results = scamDetectionService.analyzeMultipleSmsCompact(batchInfo)
                 
                 _analysisResults.value = results
 
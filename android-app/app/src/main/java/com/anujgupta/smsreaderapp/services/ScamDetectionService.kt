@@ -9,7 +9,11 @@ import okhttp3.Request
 import okhttp3.RequestBody.Companion.toRequestBody
 import org.json.JSONObject
 import org.json.JSONArray
+import java.io.ByteArrayOutputStream
+import java.security.MessageDigest
+import java.time.Instant
 import java.util.concurrent.TimeUnit
+import java.util.zip.GZIPOutputStream
 
 data class BatchSmsInfo(val id: Long, val message: String, val sender: String)
 
@@ -90,6 +94,98 @@ class ScamDetectionService {
         return@withContext results
     }
 
+    /**
+     * Compact /batch sync: sends only content hashes first, then the bodies of the messages
+     * the server has no verdict for. Requests are gzip-compressed and results carry no
+     * message echo; OkHttp decompresses gzip responses transparently.
+     */
+    suspend fun analyzeMultipleSmsCompact(messages: List<BatchSmsInfo>): List<SmsAnalysisResult> = withContext(Dispatchers.IO) {
+        val byId = messages.associateBy { it.id }
+        val hashEntries = JSONArray()
+        messages.forEach { msg ->
+            hashEntries.put(JSONObject().apply {
+                put("id", msg.id)
+                put("sender", msg.sender)
+                put("hash", contentHash(msg.sender, msg.message))
+            })
+        }
+        val firstResponse = postCompactBatch(hashEntries)
+        val results = parseCompactResults(firstResponse.getJSONArray("results"), byId).toMutableList()
+
+        val needBody = firstResponse.getJSONArray("need_body")
+        if (needBody.length() > 0) {
+            val bodyEntries = JSONArray()
+            for (i in 0 until needBody.length()) {
+                val msg = byId[needBody.getLong(i)] ?: continue
+                bodyEntries.put(JSONObject().apply {
+                    put("id", msg.id)
+                    put("sender", msg.sender)
+                    put("message", msg.message)
+                })
+            }
+            results.addAll(parseCompactResults(postCompactBatch(bodyEntries).getJSONArray("results"), byId))
+        }
+
+        val order = messages.withIndex().associate { it.value.id to it.index }
+        return@withContext results.sortedBy { order[it.id] }
+    }
+
+    private fun postCompactBatch(entries: JSONArray): JSONObject {
+        val requestJson = JSONObject().apply {
+            put("compact", true)
+            put("messages", entries)
+        }
+
+        val request = Request.Builder()
+            .url("$baseUrl/batch")
+            .header("Content-Encoding", "gzip")
+            .post(gzip(requestJson.toString().toByteArray(Charsets.UTF_8)).toRequestBody(jsonMediaType))
+            .build()
+
+        val response = client.newCall(request).execute()
+        if (!response.isSuccessful) {
+            throw Exception("Batch analysis failed: ${response.code}")
+        }
+        return JSONObject(response.body?.string() ?: throw Exception("Empty response"))
+    }
+
+    private fun parseCompactResults(jsonResults: JSONArray, byId: Map<Long, BatchSmsInfo>): List<SmsAnalysisResult> {
+        val results = mutableListOf<SmsAnalysisResult>()
+        for (i in 0 until jsonResults.length()) {
+            val json = jsonResults.getJSONObject(i)
+            if (!json.has("classification")) continue // {"id", "error"} for an entry the server could not analyze
+            val msg = byId[json.optLong("id", -1)] ?: continue
+            results.add(SmsAnalysisResult(
+                id = msg.id,
+                sender = msg.sender,
+                message_content = msg.message, // Not echoed in compact mode
+                classification = json.getString("classification"),
+                confidence = json.getString("confidence"),
+                confidenceScore = json.getInt("confidence_score"),
+                reason = json.optString("reason"),
+                riskScore = json.getDouble("risk_score"),
+                detectionMethod = json.getString("detection_method"),
+                alertLevel = json.getString("alert_level"),
+                sender_watchlist_status = json.getString("sender_watchlist_status"),
+                processingTimeSeconds = json.getDouble("processing_time_seconds"),
+                timestamp = Instant.now().toString()
+            ))
+        }
+        return results
+    }
+
+    // Must match content_hash() on the server: sha256 of sender + "\n" + message, lowercase hex
+    private fun contentHash(sender: String, message: String): String {
+        val digest = MessageDigest.getInstance("SHA-256").digest("$sender\n$message".toByteArray(Charsets.UTF_8))
+        return digest.joinToString("") { "%02x".format(it) }
+    }
+
+    private fun gzip(bytes: ByteArray): ByteArray {
+        val buffer = ByteArrayOutputStream()
+        GZIPOutputStream(buffer).use { it.write(bytes) }
+        return buffer.toByteArray()
+    }
+
     suspend fun analyzeSms(message: String, sender: String): SmsAnalysisResult = withContext(Dispatchers.IO) {
         val requestJson = JSONObject().apply {
             put("message", message)
@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "batch": 1, "background": 2}
+
+
+class LoadShed(Exception):
+    """The generation was not admitted; reason is QUEUE_FULL, PREDICTED_WAIT or DEADLINE_EXPIRED."""
+
+    def __init__(self, reason, priority, predicted_wait=None):
+        super().__init__(f"{reason} ({priority})")
+        self.reason = reason
+        self.priority = priority
+        self.predicted_wait = predicted_wait
+
+
+class AdmissionController:
+    """
+    Bounded, prioritized admission to the LLM. At most max_concurrent generations run at
+    once; the rest wait in a queue of at most max_queue entries, interactive before batch
+    before background, first come first served within a class. A caller whose predicted
+    wait (queue position x smoothed generation time / max_concurrent) plus one generation
+    would overrun its deadline is shed immediately instead of queuing; one whose deadline
+    passes while queued is shed then. The priority and deadline come from context() on
+    the calling thread, so they need not be passed down through the classification code.
+    """
+
+    def __init__(self, max_concurrent, max_queue=200, smoothing=0.1):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.cond = threading.Condition()
+        self.in_use = 0
+        self.waiting = [] # heap of (priority value, sequence)
+        self._sequence = itertools.count()
+        self.ewma_seconds = None
+        self.admitted = {name: 0 for name in PRIORITIES}
+        self.shed = {} # (priority, reason) -> count
+        self._local = threading.local()
+
+    @contextmanager
+    def context(self, priority, deadline=None):
+        """Sets the priority class and absolute deadline (time.monotonic()) for slots taken on this thread."""
+        previous = getattr(self._local, 'context', None)
+        self._local.context = (priority, deadline)
+        try:
+            yield
+        finally:
+            self._local.context = previous
+
+    def current(self):
+        """(priority, deadline) of this thread; batch without a deadline when no context is set."""
+        return getattr(self._local, 'context', None) or ("batch", None)
+
+    def remaining(self):
+        """Seconds left until this thread's deadline, or None without one."""
+        deadline = self.current()[1]
+        return None if deadline is None else deadline - time.monotonic()
+
+    def predicted_wait(self, ahead):
+        """Estimated queueing time with `ahead` callers in front, from the smoothed generation time."""
+        if self.in_use < self.max_concurrent and ahead == 0:
+            return 0.0
+        return (ahead + 1) * (self.ewma_seconds or 0.0) / self.max_concurrent
+
+    def _shed(self, priority, reason, predicted_wait=None):
+        self.shed[(priority, reason)] = self.shed.get((priority, reason), 0) + 1
+        return LoadShed(reason, priority, predicted_wait)
+
+    def expired(self):
+        """
+        Counts and returns the DEADLINE_EXPIRED LoadShed for this thread's context, for a caller
+        that ran out of time waiting outside the queue (e.g. on a coalesced LLM call).
+        """
+        priority = self.current()[0]
+        with self.cond:
+            return self._shed(priority, "DEADLINE_EXPIRED")
+
+    def _acquire(self, priority, deadline):
+        rank = PRIORITIES.get(priority, PRIORITIES["batch"])
+        with self.cond:
+            if self.in_use < self.max_concurrent and not self.waiting:
+                self.in_use += 1
+                self.admitted[priority] = self.admitted.get(priority, 0) + 1
+                return
+            if len(self.waiting) >= self.max_queue:
+                raise self._shed(priority, "QUEUE_FULL")
+            ahead = sum(1 for entry in self.waiting if entry[0] <= rank)
+            predicted = self.predicted_wait(ahead)
+            if deadline is not None and time.monotonic() + predicted + (self.ewma_seconds or 0.0) > deadline:
+                raise self._shed(priority, "PREDICTED_WAIT", predicted)
+
+            entry = (rank, next(self._sequence))
+            heapq.heappush(self.waiting, entry)
+            while self.waiting[0] != entry or self.in_use >= self.max_concurrent:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.cond.notify_all() # The next caller may now be at the head
+                    raise self._shed(priority, "DEADLINE_EXPIRED", predicted)
+                self.cond.wait(timeout)
+            heapq.heappop(self.waiting)
+            self.in_use += 1
+            self.admitted[priority] = self.admitted.get(priority, 0) + 1
+            self.cond.notify_all()
+
+    def _release(self, seconds):
+        with self.cond:
+            self.in_use -= 1
+            if seconds is not None:
+                self.ewma_seconds = seconds if self.ewma_seconds is None else self.ewma_seconds + self.smoothing * (seconds - self.ewma_seconds)
+            self.cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """
+        Holds one generation slot for the with-block, using this thread's context.
+        Raises LoadShed without running the block when the caller is not admitted.
+        Yields the seconds spent queuing.
+        """
+        priority, deadline = self.current()
+        start = time.monotonic()
+        self._acquire(priority, deadline)
+        admitted_at = time.monotonic()
+        completed = False
+        try:
+            yield admitted_at - start
+            completed = True
+        finally:
+            # Failed generations say little about service time, so only completed ones are averaged
+            self._release(time.monotonic() - admitted_at if completed else None)
+
+    def stats(self):
+        with self.cond:
+            queued = {name: sum(1 for entry in self.waiting if entry[0] == rank) for name, rank in PRIORITIES.items()}
+            shed_total = sum(self.shed.values())
+            admitted_total = sum(self.admitted.values())
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_use": self.in_use,
+                "queue_depth": len(self.waiting),
+                "queued": queued,
+                "avg_generation_seconds": round(self.ewma_seconds, 3) if self.ewma_seconds is not None else None,
+                "predicted_wait_seconds": round(self.predicted_wait(len(self.waiting)), 3),
+                "admitted": admitted_total,
+                "shed": shed_total,
+                "shed_rate": round(shed_total / (shed_total + admitted_total), 4) if shed_total + admitted_total else 0.0,
+                "shed_by_reason": {f"{priority}:{reason}": count for (priority, reason), count in sorted(self.shed.items())}
+            }
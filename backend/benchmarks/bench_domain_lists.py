@@ -0,0 +1,112 @@
+"""
+Benchmark for the link domain lists.
+
+Writes a blocklist of --domains random domains (a tenth of them subdomains), loads it
+through DomainLists as the server does, and measures build time, trie memory, and the
+cost of a lookup for listed domains, subdomains of listed domains and unlisted hosts.
+A flat set probed once per suffix is timed as the reference and must give the same
+answers. Finally times the whole link check (extraction plus lookups) per message.
+
+Run from the backend directory:
+    python benchmarks/bench_domain_lists.py --domains 1000000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from domain_lists import DomainLists, DomainTrie, BLOCK # noqa: E402
+
+TLDS = ["com", "net", "org", "in", "co.in", "xyz", "top", "info", "online", "site", "ru", "cn", "io", "co.uk", "shop"]
+MESSAGES = ["Your OTP is {n}. Do not share it with anyone.",
+            "URGENT: account blocked, verify at http://{d}/login?id={n}",
+            "Order {n} shipped! Track at https://www.amazon.in/track/{n} or {d}",
+            "Win Rs {n} now: bit.ly/{n} and https://secure.{d}/claim",
+            "Meeting moved to 4pm, see you there"]
+
+
+def random_label(rng):
+    return ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(rng.randint(5, 15)))
+
+
+def random_domain(rng):
+    domain = f"{random_label(rng)}.{rng.choice(TLDS)}"
+    return f"{random_label(rng)}.{domain}" if rng.random() < 0.1 else domain
+
+
+def time_per_call(function, items, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(items) * 1e6
+
+
+def suffix_set_lookup(listed):
+    def lookup(host):
+        labels = host.split('.')
+        for i in range(len(labels)):
+            if '.'.join(labels[i:]) in listed:
+                return True
+        return False
+    return lookup
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark domain list loading and lookups")
+    parser.add_argument('--domains', type=int, default=1000000, help="Blocklist size")
+    parser.add_argument('--lookups', type=int, default=100000, help="Hosts per lookup kind")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced rebuild that measures memory")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    domains = list(dict.fromkeys(random_domain(rng) for _ in range(args.domains)))
+    with tempfile.TemporaryDirectory() as tmp:
+        blocklist = os.path.join(tmp, 'blocklist.txt')
+        with open(blocklist, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(domains) + '\n')
+        lists = DomainLists(blocklist, os.path.join(tmp, 'missing.txt'))
+        start = time.perf_counter()
+        lists.load()
+        load_seconds = time.perf_counter() - start
+    print(f"🔗 {len(domains):,} blocklisted domains loaded from a file in {load_seconds:.2f}s")
+
+    if not args.no_memory:
+        tracemalloc.start()
+        trie = DomainTrie()
+        entry = (BLOCK, 'bench')
+        for domain in domains:
+            trie.add(domain, entry)
+        trie_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del trie
+        print(f"   Trie memory: {trie_bytes / 2**20:.0f} MB ({trie_bytes / len(domains):.0f} bytes/domain)")
+
+    listed = rng.sample(domains, min(args.lookups, len(domains)))
+    kinds = {
+        "listed": listed,
+        "subdomain": [f"login.secure.{d}" for d in listed],
+        "unlisted": [random_domain(rng) for _ in range(args.lookups)]
+    }
+    flat = set(domains)
+    reference = suffix_set_lookup(flat)
+    for hosts in kinds.values():
+        for host in hosts[:10000]:
+            assert (lists.trie.lookup(host) is not None) == reference(host), host
+    print("✅ Trie lookups match the suffix-set reference")
+
+    print(f"\n{'hosts':>10} {'trie us':>9} {'suffix set us':>14}")
+    for kind, hosts in kinds.items():
+        print(f"{kind:>10} {time_per_call(lists.trie.lookup, hosts):>9.3f} {time_per_call(reference, hosts):>14.3f}")
+
+    messages = [rng.choice(MESSAGES).format(n=rng.randint(1000, 999999), d=rng.choice(listed)) for _ in range(args.lookups)]
+    per_message = time_per_call(lists.check, messages)
+    print(f"\n📨 Link check (extraction + lookups): {per_message:.2f} us/message ({1e6 / per_message:,.0f} messages/s)")
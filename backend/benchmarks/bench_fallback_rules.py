@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for the fallback keyword rules.
+
+Compares the compiled KeywordMatcher counts against the original per-call list scans
+of analyze_with_fallback_rules, checks both give identical counts, and shows where the
+regex scan takes over from the keyword table as the rule set grows. Only fallback_rules
+is imported, so nothing of the server (databases, lists, Ollama) is touched.
+
+At the shipped 37 keywords the table mode counts only about 1.2x faster than the
+original scans (1.0-1.45x across runs on one core): both are dominated by the same `in`
+checks, and a combined regex, with or without lookahead, is slower than the table there.
+The regex is used from REGEX_MIN_KEYWORDS keywords up, where it wins by 6x at ~450
+keywords and 15x at ~1500.
+
+Run from the backend directory:
+    python benchmarks/bench_fallback_rules.py
+"""
+import csv
+import os
+import random
+import string
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fallback_rules import FallbackRules, KeywordMatcher, REGEX_MIN_KEYWORDS # noqa: E402
+
+RULES_FILE = os.path.join(BACKEND_DIR, 'fallback_rules.json')
+SCAM_LOG_FILE = os.path.join(BACKEND_DIR, 'high_confidence_scams.csv') # Extra messages when present
+
+
+def legacy_counts(text_lower, sender_lower):
+    """The keyword counting of analyze_with_fallback_rules before the compiled matcher, kept as the reference."""
+    urgent_threats = ["urgent", "suspended", "closed", "blocked", "expired"]
+    action_demands = ["click here", "verify now", "act now", "immediate", "within 24"]
+    sensitive_requests = ["ssn", "social security", "password", "pin", "bank account", "routing"]
+    impersonation = ["irs", "government", "police", "fbi", "court"]
+
+    legitimate_senders = ["amazon", "fedex", "ups", "usps", "cvs", "walgreens", "google", "apple"]
+    legitimate_content = ["delivered", "shipped", "prescription ready", "appointment", "verification code", "otp"]
+
+    return {
+        "urgent_threats": sum(1 for word in urgent_threats if word in text_lower),
+        "action_demands": sum(1 for phrase in action_demands if phrase in text_lower),
+        "sensitive_requests": sum(1 for word in sensitive_requests if word in text_lower),
+        "impersonation": sum(1 for word in impersonation if word in text_lower),
+        "legitimate_content": sum(1 for phrase in legitimate_content if phrase in text_lower),
+        "legitimate_senders": sum(1 for sender in legitimate_senders if sender in sender_lower)
+    }
+
+
+def load_corpus():
+    corpus = [
+        ("Your Amazon package will be delivered today by 8 PM", "Amazon"),
+        ("Prescription ready for pickup at CVS Pharmacy", "CVS"),
+        ("URGENT! Account suspended. Click bit.ly/verify123 to restore access NOW!", "+1234567890"),
+        ("Congratulations! You won $5000! Reply with your SSN to claim prize", "Unknown"),
+        ("IRS Notice: You owe $2000 in back taxes. Pay immediately or face arrest.", "+919876500001"),
+        ("Hi, this is Sarah from the dentist office confirming your appointment", "+5551234567"),
+        ("Your OTP is 483920. Do not share it with anyone.", "AX-HDFCBK"),
+        ("Police case filed. Verify now at court-notice.in or your bank account will be blocked", "+919812345678"),
+    ]
+    if os.path.exists(SCAM_LOG_FILE):
+        with open(SCAM_LOG_FILE, mode='r', newline='', encoding='utf-8') as f:
+            corpus.extend((row['message_content'], row['sender_id']) for row in csv.DictReader(f))
+    return [(text.lower(), sender.lower()) for text, sender in corpus]
+
+
+def per_call_us(fn, corpus, rounds, repeats=5):
+    """Best of several timed runs, in microseconds per message."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text, sender in corpus:
+                fn(text, sender)
+        best = min(best, time.perf_counter() - start)
+    return best / (rounds * len(corpus)) * 1e6
+
+
+def check_large_rule_sets():
+    """Random rule sets on both sides of REGEX_MIN_KEYWORDS must count exactly like naive scans."""
+    rng = random.Random(7)
+    texts = [text for text, _ in load_corpus()]
+    print(f"\n{'keywords':>9} {'mode':>8} {'naive us':>10} {'compiled us':>12}")
+    for size in (30, 64, REGEX_MIN_KEYWORDS, 512, 2000):
+        words = {''.join(rng.choices(string.ascii_lowercase[:8], k=rng.randint(2, 6))) for _ in range(size)}
+        words |= {"urgent", "pin", "shipping", "ship", "bank", "bank account", "otp"} # overlapping keywords
+        groups = {f"group_{i}": sorted(words)[i::5] for i in range(5)}
+        matcher = KeywordMatcher(groups)
+
+        for text in texts:
+            expected = {name: sum(1 for k in kws if k in text) for name, kws in groups.items()}
+            assert matcher.count(text) == expected, f"mismatch for {size} keywords on: {text}"
+
+        pairs = [(text, None) for text in texts]
+        naive = per_call_us(lambda text, _s: {name: sum(1 for k in kws if k in text) for name, kws in groups.items()}, pairs, 100)
+        compiled = per_call_us(lambda text, _s: matcher.count(text), pairs, 100)
+        mode = "regex" if matcher._pattern is not None else "table"
+        print(f"{len(matcher._keyword_groups):>9} {mode:>8} {naive:>10.2f} {compiled:>12.2f}")
+
+
+if __name__ == '__main__':
+    corpus = load_corpus()
+    rules = FallbackRules(RULES_FILE)
+    for text, sender in corpus:
+        assert rules.count(text, sender) == legacy_counts(text, sender), text
+    print(f"✅ Compiled rules count like the original rules on {len(corpus)} messages")
+
+    rounds = 2000
+    legacy = per_call_us(legacy_counts, corpus, rounds)
+    compiled = per_call_us(rules.active.count, corpus, rounds)
+    print(f"{'original':>10}: {legacy:.2f} us/message ({1e6 / legacy:,.0f} messages/s)")
+    print(f"{'compiled':>10}: {compiled:.2f} us/message ({1e6 / compiled:,.0f} messages/s)")
+    print(f"{'speedup':>10}: {legacy / compiled:.2f}x")
+
+    check_large_rule_sets()
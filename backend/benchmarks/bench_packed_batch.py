@@ -0,0 +1,103 @@
+"""
+Benchmark for packed /batch classification.
+
+Classifies the same number of unique messages (no cache or template hits) once per
+message, as the regular /batch path does, and then BATCH_PACK_SIZE at a time for
+several pack sizes, all against the fake Ollama stub. Reports messages per second,
+generations, and prompt/generated tokens per message as counted by the stub (about
+four characters per token). The stub charges --prompt-token-delay per prompt token
+and --token-delay per generated token, so the timings follow the token counts.
+
+Run from the backend directory:
+    python benchmarks/bench_packed_batch.py --messages 64 --pack-sizes 4,8,16
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama # noqa: E402
+
+SCAM_PHRASES = ["URGENT: your account {w} is suspended, verify at bit.ly/{w}", "You won a prize of Rs {n}, claim via {w}",
+                "IRS notice for {w}: pay {n} or face arrest"]
+LEGIT_PHRASES = ["Your order {n} from {w} has shipped", "Lunch with {w} at {n}?", "Meeting about {w} moved to room {n}"]
+
+
+def unique_messages(count, seed):
+    """Messages with random filler words, so no two share a verdict cache or template entry."""
+    rng = random.Random(seed)
+
+    def word():
+        return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+
+    messages = []
+    for _ in range(count):
+        phrase = rng.choice(SCAM_PHRASES if rng.random() < 0.4 else LEGIT_PHRASES)
+        text = phrase.format(n=rng.randint(100, 99999), w=word()) + " " + " ".join(word() for _ in range(rng.randint(3, 8)))
+        messages.append((text, f"+91{rng.randint(7000000000, 9999999999)}"))
+    return messages
+
+
+def run(label, config, classify, messages):
+    before = dict(config.counts)
+    start = time.perf_counter()
+    verdicts = classify(messages)
+    seconds = time.perf_counter() - start
+    generations = config.counts["generate"] - before["generate"]
+    prompt_tokens = config.counts["prompt_tokens"] - before["prompt_tokens"]
+    eval_tokens = config.counts["eval_tokens"] - before["eval_tokens"]
+    llm_verdicts = sum(1 for verdict in verdicts if verdict["detection_method"] == "LLM")
+    print(f"{label:<14} {len(messages) / seconds:>9.1f} {generations:>12} {prompt_tokens / len(messages):>14.0f} "
+          f"{eval_tokens / len(messages):>12.1f} {(prompt_tokens + eval_tokens) / seconds:>11.0f} {llm_verdicts:>8}/{len(messages)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-message vs packed LLM classification")
+    parser.add_argument('--messages', type=int, default=64)
+    parser.add_argument('--pack-sizes', default='4,8,16')
+    parser.add_argument('--latency', type=float, default=0.05, help="Fake Ollama seconds per generation")
+    parser.add_argument('--token-delay', type=float, default=0.002, help="Fake Ollama seconds per generated token")
+    parser.add_argument('--prompt-token-delay', type=float, default=0.0002, help="Fake Ollama seconds per prompt token")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(latency=args.latency, jitter=0.0, token_delay=args.token_delay,
+                              prompt_token_delay=args.prompt_token_delay, seed=1)
+    server, url = start_fake_ollama(config=config)
+
+    # main keeps its cache database and scam log in the working directory
+    workdir = tempfile.mkdtemp(prefix='sms-bench-packed-')
+    shutil.copy(os.path.join(BACKEND_DIR, 'fallback_rules.json'), workdir)
+    os.chdir(workdir)
+    os.environ['OLLAMA_BASE_URL'] = url
+    logging.disable(logging.CRITICAL)
+    import main as backend
+
+    print(f"{args.messages} unique messages, {backend.BATCH_MAX_WORKERS} workers, "
+          f"fake Ollama {args.latency}s + {args.prompt_token_delay}s/prompt token + {args.token_delay}s/token\n")
+    print(f"{'mode':<14} {'msgs/sec':>9} {'generations':>12} {'prompt tok/msg':>14} {'gen tok/msg':>12} {'tokens/sec':>11} {'LLM':>8}")
+
+    def per_message(messages):
+        return list(backend.batch_executor.map(lambda item: backend.classify_sms_with_ollama(*item), messages))
+
+    run("per-message", config, per_message, unique_messages(args.messages, seed=0))
+
+    for pack_size in (int(k) for k in args.pack_sizes.split(',')):
+        def packed(messages):
+            packs = [messages[i:i + pack_size] for i in range(0, len(messages), pack_size)]
+            return [verdict for verdicts in backend.batch_executor.map(backend.classify_packed_with_ollama, packs) for verdict in verdicts]
+
+        run(f"packed K={pack_size}", config, packed, unique_messages(args.messages, seed=pack_size))
+
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
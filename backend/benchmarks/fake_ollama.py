@@ -0,0 +1,200 @@
+"""
+Local stand-in for the Ollama API, for load tests without a GPU.
+
+Serves /api/generate (streaming and non-streaming), /api/tags and /api/ps. Each
+generation sleeps for a configurable latency plus jitter, and a fraction of requests
+can be made to fail with HTTP 500 or to hang past the server's read timeout. The
+verdict is chosen from a few scam keywords in the message, so results look plausible.
+The model counts as loaded (/api/ps) after the first generation or preload request.
+
+    python benchmarks/fake_ollama.py --port 11435 --latency 0.4 --jitter 0.2 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SCAM_HINTS = ("urgent", "suspended", "ssn", "irs", "won", "prize", "verify", "blocked", "arrest", "lottery")
+MESSAGE_IN_PROMPT = re.compile(r'Message: "(.*)"', re.DOTALL)
+PACKED_MESSAGE = re.compile(r'^\[(\d+)\] From: .*\nMessage: "(.*)"$', re.MULTILINE)
+
+
+class FakeOllamaConfig:
+    def __init__(self, latency=0.3, jitter=0.1, error_rate=0.0, timeout_rate=0.0, hang_seconds=120,
+                 token_delay=0.005, model="llama3.2:3b", seed=None, prompt_token_delay=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.token_delay = token_delay # Per generated token (decode)
+        self.prompt_token_delay = prompt_token_delay # Per prompt token (prefill)
+        self.model = model
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"generate": 0, "errors": 0, "timeouts": 0, "tags": 0, "preloads": 0,
+                       "prompt_tokens": 0, "eval_tokens": 0}
+        self.loaded = False
+
+    def draw(self):
+        """Returns (outcome, delay) for one generation: outcome is 'ok', 'error' or 'timeout'."""
+        with self.lock:
+            self.counts["generate"] += 1
+            roll = self.random.random()
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            if roll < self.error_rate:
+                self.counts["errors"] += 1
+                return "error", delay
+            if roll < self.error_rate + self.timeout_rate:
+                self.counts["timeouts"] += 1
+                return "timeout", self.hang_seconds
+            return "ok", delay
+
+
+def count_tokens(text):
+    """Rough token count (about 4 characters per token), good enough for throughput comparisons."""
+    return max(1, len(text) // 4)
+
+
+def fake_verdict(message):
+    hits = sum(1 for hint in SCAM_HINTS if hint in message.lower())
+    if hits:
+        return "SCAM", min(99, 80 + 5 * hits), f"Message contains {hits} typical scam indicator(s)."
+    return "LEGITIMATE", 85, "No typical scam indicators found."
+
+
+def fake_answer(prompt, structured=False):
+    if structured:
+        # Packed prompt with a JSON format: one verdict per numbered message
+        verdicts = []
+        for number, message in PACKED_MESSAGE.findall(prompt):
+            classification, confidence, reason = fake_verdict(message)
+            verdicts.append({"id": int(number), "classification": classification, "confidence": confidence, "reason": reason})
+        return json.dumps({"verdicts": verdicts})
+    match = MESSAGE_IN_PROMPT.search(prompt)
+    message = (match.group(1) if match else prompt).lower()
+    hits = sum(1 for hint in SCAM_HINTS if hint in message)
+    if hits:
+        return f"CLASSIFICATION: SCAM\nCONFIDENCE: {min(99, 80 + 5 * hits)}\nREASON: Message contains {hits} typical scam indicator(s).\n"
+    return "CLASSIFICATION: LEGITIMATE\nCONFIDENCE: 85\nREASON: No typical scam indicators found.\n"
+
+
+def make_handler(config):
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' # Keep-alive, like the real server
+
+        def log_message(self, *args):
+            pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except (BrokenPipeError, ConnectionResetError):
+                pass # The client hung up first: read timeout, injected hang or stream early exit
+
+        def _send_json(self, obj, status=200):
+            body = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, obj):
+            data = (json.dumps(obj) + "\n").encode('utf-8')
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_GET(self):
+            path = self.path.rstrip('/')
+            if path == '/api/ps':
+                loaded = [{"name": config.model, "expires_at": "2099-01-01T00:00:00Z"}] if config.loaded else []
+                return self._send_json({"models": loaded})
+            if path != '/api/tags':
+                return self._send_json({"error": "not found"}, 404)
+            with config.lock:
+                config.counts["tags"] += 1
+            self._send_json({"models": [{"name": config.model, "size": 2019393189}]})
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/api/generate':
+                return self._send_json({"error": "not found"}, 404)
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            config.loaded = True
+            if not payload.get("prompt"):
+                # Preload request (no prompt): Ollama just loads the model and answers done
+                with config.lock:
+                    config.counts["preloads"] += 1
+                return self._send_json({"model": config.model, "response": "", "done": True, "done_reason": "load"})
+            outcome, delay = config.draw()
+            prompt = payload.get("prompt", "")
+            prompt_tokens = count_tokens(prompt)
+            time.sleep(delay + prompt_tokens * config.prompt_token_delay)
+            if outcome == "error":
+                return self._send_json({"error": "injected failure"}, 500)
+
+            answer = fake_answer(prompt, structured="format" in payload)
+            tokens = re.findall(r'\S+\s*', answer)
+            eval_tokens = count_tokens(answer)
+            with config.lock:
+                config.counts["prompt_tokens"] += prompt_tokens
+            stats = {"done": True, "prompt_eval_count": prompt_tokens, "eval_count": eval_tokens,
+                     "total_duration": int(delay * 1e9)}
+            if not payload.get("stream", True):
+                time.sleep(eval_tokens * config.token_delay)
+                with config.lock:
+                    config.counts["eval_tokens"] += eval_tokens
+                return self._send_json(dict(stats, model=config.model, response=answer))
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for token in tokens:
+                self._send_chunk({"model": config.model, "response": token, "done": False})
+                with config.lock:
+                    config.counts["eval_tokens"] += count_tokens(token)
+                time.sleep(config.token_delay * count_tokens(token))
+            self._send_chunk(dict(stats, model=config.model, response=""))
+            self.wfile.write(b"0\r\n\r\n")
+
+    return FakeOllamaHandler
+
+
+def start_fake_ollama(port=0, config=None):
+    """Starts the stub on a background thread; returns (server, base_url)."""
+    config = config or FakeOllamaConfig()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, name='fake-ollama', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load tests")
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds per generation")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Uniform +/- jitter on the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of generations answered with HTTP 500")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fraction of generations that hang for --hang-seconds")
+    parser.add_argument('--hang-seconds', type=float, default=120)
+    parser.add_argument('--token-delay', type=float, default=0.005, help="Seconds per generated token")
+    parser.add_argument('--prompt-token-delay', type=float, default=0.0, help="Seconds per prompt token (prefill)")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.latency, args.jitter, args.error_rate, args.timeout_rate,
+                              args.hang_seconds, args.token_delay, seed=args.seed,
+                              prompt_token_delay=args.prompt_token_delay)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"🧪 Fake Ollama on http://127.0.0.1:{args.port} ({args.latency}s ± {args.jitter}s, "
+          f"{args.error_rate:.0%} errors, {args.timeout_rate:.0%} timeouts)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,284 @@
+"""
+Load test for the detection server.
+
+Starts the fake Ollama stub (benchmarks/fake_ollama.py) and a server process that
+points at it, drives /analyze and /batch at each concurrency level with a
+configurable message mix, and reports throughput and p50/p95/p99 latency. Results
+are written as JSON. A run can be compared with an earlier one to flag regressions.
+
+Run from the backend directory:
+    python benchmarks/load_test.py --concurrency 1,4,16 --requests 200 --latency 0.4
+    python benchmarks/load_test.py --output after.json --baseline before.json
+
+Use --server-url to test an already running server instead, for example one that
+talks to a real Ollama. The fake latency options have no effect in that case.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama # noqa: E402
+
+WATCHLISTED_SENDER = "+919876500001"
+
+SCAM_PHRASES = ["URGENT: your account is suspended", "You won a prize of Rs {n}", "IRS notice, pay {n} or face arrest",
+                "Verify your SSN now at bit.ly/{w}", "Your card is blocked, call {n}"]
+LEGIT_PHRASES = ["Your order #{n} has shipped", "Lunch at {n}:30?", "Meeting moved to room {n}",
+                 "Your package was delivered to {w}", "Thanks for the update on {w}"]
+TEMPLATES = [("Your OTP is {n}. Do not share it with anyone.", "AX-HDFCBK"),
+             ("Rs {n} debited from a/c XX{n4} on {d}. Not you? Call 1800-{n4}", "VM-SBIINB"),
+             ("Your Amazon order {n} will be delivered today", "Amazon")]
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet", "kilo", "lima"]
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ("unique", "template", "watchlist"):
+            raise argparse.ArgumentTypeError(f"Unknown message kind '{name}' (unique, template, watchlist)")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class MessageMix:
+    """
+    Generates test messages. 'unique' messages are random enough to miss the verdict
+    cache and template index, 'template' ones are OTP/bank/order templates that only
+    differ in digits, and 'watchlist' ones come from a watchlisted sender.
+    """
+
+    def __init__(self, mix, seed=1):
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def _fill(self, template):
+        r = self.random
+        return template.format(n=r.randint(1000, 999999), n4=r.randint(1000, 9999), d=f"{r.randint(1, 28)}-10",
+                               w=''.join(r.choices(WORDS, k=3)))
+
+    def next(self):
+        with self.lock:
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            if kind == "template":
+                template, sender = self.random.choice(TEMPLATES)
+                return kind, self._fill(template), sender
+            phrase = self.random.choice(SCAM_PHRASES if self.random.random() < 0.5 else LEGIT_PHRASES)
+            # Random filler words keep unique messages apart after template masking
+            text = f"{self._fill(phrase)} {' '.join(self.random.choices(WORDS, k=6))}"
+            sender = WATCHLISTED_SENDER if kind == "watchlist" else f"+1555{self.random.randint(1000000, 9999999)}"
+            return kind, text, sender
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(ollama_url, workdir):
+    """Runs main.app in its own process and working directory, so the scam log and cache DB are throwaway."""
+    shutil.copy(os.path.join(BACKEND_DIR, 'fallback_rules.json'), workdir)
+    with open(os.path.join(workdir, 'suspicious_numbers.csv'), 'w', encoding='utf-8') as f:
+        f.write(f"phone_number,country_code,name,source,detection_date\n{WATCHLISTED_SENDER},,Load test,bench,2024-01-01\n")
+    port = free_port()
+    code = ("import main; main.load_suspicious_numbers(); main.start_ollama_prober(); "
+            f"main.app.run(host='127.0.0.1', port={port}, threaded=True)")
+    env = dict(os.environ, OLLAMA_BASE_URL=ollama_url,
+               PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Server process exited during startup")
+        try:
+            if requests.get(f"{url}/health", timeout=1).ok:
+                return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not become healthy within 30s")
+
+
+def run_scenario(server_url, endpoint, concurrency, total_requests, batch_size, mix, timeout):
+    sessions = threading.local()
+
+    def one_request(_):
+        session = getattr(sessions, 'session', None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        count = batch_size if endpoint == "batch" else 1
+        items = [mix.next() for _ in range(count)]
+        if endpoint == "batch":
+            url = f"{server_url}/batch"
+            body = {"messages": [{"id": i, "message": text, "sender": sender} for i, (_, text, sender) in enumerate(items)]}
+        else:
+            url = f"{server_url}/analyze"
+            body = {"message": items[0][1], "sender": items[0][2]}
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json=body, timeout=timeout)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                return elapsed, count, f"HTTP {response.status_code}", []
+            data = response.json()
+            results = data if isinstance(data, list) else [data]
+            return elapsed, count, None, [r.get("decision_tier") or r.get("detection_method") for r in results]
+        except requests.RequestException as e:
+            return time.perf_counter() - start, count, type(e).__name__, []
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one_request, range(total_requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(elapsed for elapsed, _, error, _ in outcomes if error is None)
+    errors, tiers = {}, {}
+    for _, _, error, outcome_tiers in outcomes:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+        for tier in outcome_tiers:
+            tiers[tier] = tiers.get(tier, 0) + 1
+    messages = sum(count for _, count, error, _ in outcomes if error is None)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "batch_size": batch_size if endpoint == "batch" else 1,
+        "requests": total_requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 2),
+        "messages_per_second": round(messages / wall, 2),
+        "latency_ms": {name: round(percentile(latencies, pct) * 1000, 1) if latencies else None
+                       for name, pct in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "latency_ms_max": round(latencies[-1] * 1000, 1) if latencies else None,
+        "decision_tiers": tiers
+    }
+
+
+def scenario_key(scenario):
+    return f"{scenario['endpoint']}@{scenario['concurrency']}x{scenario['batch_size']}"
+
+
+def compare_with_baseline(scenarios, baseline_path, tolerance):
+    """Returns a list of regression descriptions (throughput down or p95 up by more than tolerance)."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {scenario_key(s): s for s in json.load(f)["scenarios"]}
+    regressions = []
+    for scenario in scenarios:
+        before = baseline.get(scenario_key(scenario))
+        if before is None:
+            continue
+        key = scenario_key(scenario)
+        if scenario["messages_per_second"] < before["messages_per_second"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {before['messages_per_second']} -> {scenario['messages_per_second']} msg/s")
+        old_p95, new_p95 = before["latency_ms"]["p95"], scenario["latency_ms"]["p95"]
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old_p95} -> {new_p95} ms")
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test /analyze and /batch against a fake Ollama")
+    parser.add_argument('--server-url', help="Test this running server instead of starting one")
+    parser.add_argument('--endpoints', default='analyze,batch')
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated client concurrency levels")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--batch-size', type=int, default=10, help="Messages per /batch request")
+    parser.add_argument('--mix', type=parse_mix, default='unique=0.6,template=0.3,watchlist=0.1',
+                        help="Message kinds and weights: unique, template, watchlist")
+    parser.add_argument('--latency', type=float, default=0.3, help="Fake Ollama seconds per generation")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of fake generations failing with HTTP 500")
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help="Fraction of fake generations that hang")
+    parser.add_argument('--request-timeout', type=float, default=120, help="Client timeout per request")
+    parser.add_argument('--output', default='load_test_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression vs. the baseline")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    fake, process, workdir = None, None, None
+    server_url = args.server_url
+    try:
+        if server_url is None:
+            fake_config = FakeOllamaConfig(args.latency, args.jitter, args.error_rate, args.timeout_rate, seed=args.seed)
+            fake, ollama_url = start_fake_ollama(config=fake_config)
+            workdir = tempfile.mkdtemp(prefix='sms-load-test-')
+            process, server_url = start_server(ollama_url, workdir)
+            print(f"🧪 Fake Ollama at {ollama_url} ({args.latency}s ± {args.jitter}s), server at {server_url}")
+
+        mix = MessageMix(args.mix, args.seed)
+        scenarios = []
+        print(f"{'scenario':>16} {'req/s':>8} {'msg/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for endpoint in args.endpoints.split(','):
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                scenario = run_scenario(server_url, endpoint, concurrency, args.requests, args.batch_size, mix, args.request_timeout)
+                scenarios.append(scenario)
+                latency = scenario["latency_ms"]
+                print(f"{scenario_key(scenario):>16} {scenario['requests_per_second']:>8} {scenario['messages_per_second']:>8} "
+                      f"{latency['p50']!s:>8} {latency['p95']!s:>8} {latency['p99']!s:>8} {sum(scenario['errors'].values()):>7}")
+
+        report = {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "fake_ollama": dict(fake.config.counts) if fake else None,
+            "scenarios": scenarios
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+        if args.baseline:
+            regressions = compare_with_baseline(scenarios, args.baseline, args.tolerance)
+            for regression in regressions:
+                print(f"❌ Regression: {regression}")
+            if regressions:
+                sys.exit(1)
+            print(f"✅ No regressions beyond {args.tolerance:.0%} vs. {args.baseline}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+        if fake is not None:
+            fake.shutdown()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
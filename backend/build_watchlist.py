@@ -0,0 +1,39 @@
+"""
+Builds the binary watchlist the server memory-maps.
+
+Parses suspicious_numbers.csv once into the sorted number, metadata and range arrays
+and writes them as one file of fixed-width sections. Every worker process maps it
+read-only, so they share one copy in the page cache and start without parsing the
+CSV. Rebuild after editing the CSV; until then the server parses the (newer) CSV.
+
+    python build_watchlist.py
+    python build_watchlist.py --csv suspicious_numbers.csv --output suspicious_numbers.bin
+"""
+import argparse
+import time
+
+from watchlist import build_watchlist_index, write_watchlist_binary, load_watchlist_binary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the memory-mapped binary watchlist from the CSV")
+    parser.add_argument('--csv', default='suspicious_numbers.csv')
+    parser.add_argument('--output', default='suspicious_numbers.bin')
+    parser.add_argument('--default-country-code', default='91', help="Applied to 10-digit national numbers")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = build_watchlist_index(args.csv, args.default_country_code)
+    parsed = time.perf_counter()
+    size = write_watchlist_binary(index, args.output, args.default_country_code)
+    written = time.perf_counter()
+
+    mapped = load_watchlist_binary(args.output)
+    if (mapped.numbers.tobytes() != index.numbers.tobytes() or mapped.meta.tobytes() != index.meta.tobytes()
+            or len(mapped.strings) != len(index.strings) or len(mapped) != len(index)):
+        parser.error(f"{args.output} does not match {args.csv} after writing")
+
+    print(f"👁️ {len(index.numbers)} numbers, {len(index.prefixes)} prefixes, {len(index.range_starts)} ranges, "
+          f"{len(index.strings)} metadata strings")
+    print(f"   Parsed CSV in {parsed - start:.2f}s, wrote binary in {written - parsed:.2f}s")
+    print(f"💾 Saved {size / 1024:.1f} KB to {args.output}")
@@ -0,0 +1,224 @@
+"""
+Scores large SMS archives offline with the same pipeline as the server.
+
+The input (CSV with message/sender[/id] columns, or JSON lines; optionally .gz) is
+streamed in chunks of --chunk-size rows. Each chunk goes through the cheap cascade
+tiers (watchlist, domain blocklist, rules, local classifier) on a process pool;
+messages none of them decides go to the LLM on --llm-concurrency threads (cache,
+coalescing and fallback rules included), or to the fallback rules with --no-llm.
+Every chunk is written as one columnar file (Parquet when pyarrow is installed, else
+gzip JSON columns) and then checkpointed, so re-running the same command resumes
+after the last chunk.
+
+    python bulk_score.py archive.csv.gz --output scored/
+    python bulk_score.py archive.jsonl --output scored/ --no-llm --workers 8
+"""
+import argparse
+import csv
+import gzip
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import main
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError: # Parquet output is optional
+    pyarrow = None
+
+CHECKPOINT_FILE = 'checkpoint.json'
+OUTPUT_COLUMNS = ['row', 'id', 'sender', 'sender_watchlist_status', 'classification', 'confidence_score', 'risk_score',
+                  'alert_level', 'detection_method', 'decision_tier', 'reason', 'model_used', 'cached']
+
+_use_llm = True # Set per worker process by init_worker
+
+
+def open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode='rt', newline='', encoding='utf-8')
+    return open(path, mode='r', newline='', encoding='utf-8')
+
+
+def iter_rows(path, input_format, message_field, sender_field, id_field):
+    """Yields (row, id, sender, message) one input row at a time; row counts from 0 and ids default to it."""
+    with open_text(path) as f:
+        if input_format == 'csv':
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) if line.strip() else {} for line in f)
+        for row, record in enumerate(records):
+            yield row, record.get(id_field, row), record.get(sender_field) or '', record.get(message_field) or ''
+
+
+def init_worker(use_llm, log_level):
+    global _use_llm
+    _use_llm = use_llm
+    logging.getLogger('main').setLevel(log_level)
+    main.watchlist.load() # No-op when the index came along with a fork
+    main.domain_lists.load()
+
+
+def score_without_llm(item):
+    """Runs in the process pool: returns (watchlist_status, result), result None when the LLM must decide."""
+    sender, message = item
+    watchlist_status = main.check_sender_watchlist(sender)
+    result = main.classify_without_llm(message, sender, watchlist_status)
+    if result is None and not _use_llm:
+        result = main.analyze_with_fallback_rules(message, sender, "LLM_DISABLED")
+        result["decision_tier"] = "FALLBACK"
+    return watchlist_status, result
+
+
+def score_with_llm(item):
+    sender, message = item
+    try:
+        return main.classify_llm_tier(message, sender)
+    except Exception as e:
+        main.logger.error(f"💥 Bulk LLM scoring failed: {e}")
+        result = main.analyze_with_fallback_rules(message, sender, "ERROR")
+        result["decision_tier"] = "FALLBACK"
+        return result
+
+
+def score_chunk(rows, pool, llm_executor, pool_chunksize):
+    """Returns the output columns for one chunk of (row, id, sender, message) rows."""
+    items = [(sender, message) for _, _, sender, message in rows]
+    decided = list(pool.map(score_without_llm, items, chunksize=pool_chunksize))
+    pending = [i for i, (_, result) in enumerate(decided) if result is None]
+    for i, result in zip(pending, llm_executor.map(score_with_llm, [items[i] for i in pending])):
+        decided[i] = (decided[i][0], result)
+
+    columns = {name: [] for name in OUTPUT_COLUMNS}
+    for (row, msg_id, sender, _), (watchlist_status, result) in zip(rows, decided):
+        columns['row'].append(row)
+        columns['id'].append(str(msg_id))
+        columns['sender'].append(sender)
+        columns['sender_watchlist_status'].append(watchlist_status)
+        columns['classification'].append(result.get('classification', 'ERROR'))
+        columns['confidence_score'].append(int(result.get('confidence_score', 0)))
+        columns['risk_score'].append(float(result.get('risk_score', 0.0)))
+        columns['alert_level'].append(main.get_alert_level(result.get('classification'), result.get('confidence_score', 0)))
+        columns['detection_method'].append(result.get('detection_method', 'ERROR'))
+        columns['decision_tier'].append(result.get('decision_tier'))
+        columns['reason'].append(result.get('reason'))
+        columns['model_used'].append(result.get('model_used'))
+        columns['cached'].append(bool(result.get('cached', False)))
+    return columns
+
+
+def write_chunk(output_dir, chunk_number, columns, output_format):
+    """Writes one chunk atomically (temp file, then rename), so a crash never leaves a partial part file."""
+    extension = 'parquet' if output_format == 'parquet' else 'json.gz'
+    path = os.path.join(output_dir, f"part-{chunk_number:05d}.{extension}")
+    temp_path = path + '.tmp'
+    if output_format == 'parquet':
+        pyarrow.parquet.write_table(pyarrow.table(columns), temp_path, compression='zstd')
+    else:
+        with gzip.open(temp_path, mode='wt', encoding='utf-8') as f:
+            json.dump({"columns": list(columns), "data": columns}, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+    return path
+
+
+def load_checkpoint(output_dir):
+    try:
+        with open(os.path.join(output_dir, CHECKPOINT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(output_dir, checkpoint):
+    checkpoint["updated"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score an SMS archive offline with the detection pipeline")
+    parser.add_argument('input', help="CSV or JSON lines file, optionally gzip-compressed (.gz)")
+    parser.add_argument('--output', required=True, help="Directory for the part files and the checkpoint")
+    parser.add_argument('--input-format', choices=['csv', 'jsonl'], help="Default: from the file name")
+    parser.add_argument('--message-field', default='message')
+    parser.add_argument('--sender-field', default='sender')
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--output-format', choices=['parquet', 'json'], help="Default: parquet if pyarrow is installed")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per part file and per checkpoint")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes for the rule tiers")
+    parser.add_argument('--llm-concurrency', type=int, default=main.BATCH_MAX_WORKERS, help="Concurrent LLM calls")
+    parser.add_argument('--no-llm', action='store_true', help="Rules only: undecided messages get the fallback rules")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    parser.add_argument('--verbose', action='store_true', help="Keep the server's per-message log lines")
+    args = parser.parse_args()
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or ('parquet' if pyarrow is not None else 'json')
+    if output_format == 'parquet' and pyarrow is None:
+        parser.error("Parquet output needs pyarrow (pip install pyarrow); use --output-format json")
+    log_level = logging.INFO if args.verbose else logging.WARNING
+    logging.getLogger('main').setLevel(log_level)
+
+    os.makedirs(args.output, exist_ok=True)
+    source = {"input": os.path.abspath(args.input), "input_bytes": os.path.getsize(args.input),
+              "input_format": input_format, "output_format": output_format, "no_llm": args.no_llm}
+    checkpoint = None if args.restart else load_checkpoint(args.output)
+    if checkpoint is not None and any(checkpoint.get(k) != v for k, v in source.items()):
+        parser.error(f"{args.output} has a checkpoint for a different input or settings; use --restart or another --output")
+    if checkpoint is None:
+        checkpoint = dict(source, rows_done=0, chunks_written=0, tiers={}, started=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    elif checkpoint["rows_done"]:
+        print(f"↩️ Resuming after row {checkpoint['rows_done']} ({checkpoint['chunks_written']} part files written)")
+
+    main.watchlist.load()
+    main.domain_lists.load()
+    rows = itertools.islice(iter_rows(args.input, input_format, args.message_field, args.sender_field, args.id_field),
+                            checkpoint["rows_done"], None)
+    pool_chunksize = max(1, args.chunk_size // (args.workers * 4))
+    tiers = Counter(checkpoint["tiers"])
+    scored, skipped = 0, 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(not args.no_llm, log_level)) as pool, \
+            ThreadPoolExecutor(max(1, args.llm_concurrency), thread_name_prefix='bulk-llm') as llm_executor:
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, args.chunk_size))
+                if not chunk:
+                    break
+                valid = [r for r in chunk if r[2] and r[3]] # Rows without a sender or message are skipped
+                columns = score_chunk(valid, pool, llm_executor, pool_chunksize)
+                write_chunk(args.output, checkpoint["chunks_written"], columns, output_format)
+                tiers.update(columns['decision_tier'])
+                checkpoint.update(rows_done=checkpoint["rows_done"] + len(chunk), chunks_written=checkpoint["chunks_written"] + 1,
+                                  tiers=dict(tiers))
+                save_checkpoint(args.output, checkpoint)
+                scored += len(valid)
+                skipped += len(chunk) - len(valid)
+                elapsed = time.perf_counter() - start
+                print(f"📦 {checkpoint['rows_done']} rows done, {scored / elapsed:.0f} msgs/sec this run")
+        except KeyboardInterrupt:
+            print(f"\n⏸️ Interrupted; {checkpoint['rows_done']} rows are checkpointed. Run the same command again to resume.")
+            pool.shutdown(cancel_futures=True)
+            llm_executor.shutdown(cancel_futures=True)
+            sys.exit(130)
+
+    checkpoint["finished"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    save_checkpoint(args.output, checkpoint)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {scored} messages in {elapsed:.1f}s ({scored / max(elapsed, 1e-9):.0f} msgs/sec), skipped {skipped} invalid rows")
+    print(f"   Decision tiers (all runs): {dict(tiers)}")
+    print(f"💾 {checkpoint['chunks_written']} part files in {args.output}")
@@ -0,0 +1,227 @@
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BLOCK, ALLOW, SHORTENER = "block", "allow", "shortener"
+# Used when the shortener list file is missing
+DEFAULT_SHORTENERS = [
+    "bit.ly", "tinyurl.com", "t.co", "goo.gl", "is.gd", "v.gd", "ow.ly", "buff.ly", "cutt.ly", "rb.gy",
+    "shorturl.at", "tiny.cc", "t.ly", "s.id", "rebrand.ly", "bl.ink", "short.io", "tiny.one", "shorte.st", "adf.ly"
+]
+
+# A URL or bare domain: optional scheme, dot-separated labels and an alphabetic TLD, then
+# an optional port and path. Not preceded by '@' (e-mail addresses), and neither preceded nor
+# followed by word characters, so 'no.xx1234' or 'a.b_c' are not part of a longer word.
+URL_PATTERN = re.compile(
+    r'(?<![@\w.-])(?:(?:https?|hxxps?)://)?((?:[^\W_](?:[\w-]{0,61}[^\W_])?\.)+[^\W\d_]{2,63})(?![\w-])\.?(?::\d{1,5})?(?:[/?#][^\s<>"]*)?',
+    re.IGNORECASE)
+HOSTS_FILE_ADDRESSES = ("0.0.0.0", "127.0.0.1", "::", "::1")
+PLAIN_DOMAIN = re.compile(r'[a-z0-9-]+(?:\.[a-z0-9-]+)+')
+# Second-level public suffixes under which registrations sit one label deeper (example.co.in)
+MULTI_LABEL_SUFFIXES = frozenset(
+    f"{sld}.{tld}" for tld in ("in", "uk", "au", "nz", "jp", "sg", "my", "za", "br", "cn", "pk", "bd", "lk")
+    for sld in ("co", "com", "net", "org", "gov", "ac", "edu", "res", "gen", "firm", "ind"))
+
+
+def normalize_domain(raw):
+    """
+    Lowercase ASCII (punycode) host for a list line or an extracted host. Accepts bare
+    domains, URLs, hosts-file lines ('0.0.0.0 example.com') and '*.example.com' / '.example.com'.
+    Returns None for blank or comment lines.
+    """
+    line = (raw or '').strip().lower()
+    if PLAIN_DOMAIN.fullmatch(line):
+        return line # Fast path for the usual one-domain-per-line list
+    parts = line.split('#', 1)[0].split()
+    if not parts:
+        return None
+    host = parts[1] if len(parts) > 1 and parts[0] in HOSTS_FILE_ADDRESSES else parts[0]
+    host = re.sub(r'^[a-z]+://', '', host)
+    host = re.split(r'[/?#:]', host, 1)[0].lstrip('*.').rstrip('.')
+    if not host:
+        return None
+    try:
+        return host.encode('idna').decode('ascii')
+    except UnicodeError:
+        return host
+
+
+def registrable_domain(host):
+    """The domain a host was registered under: 'netbanking.hdfcbank.com' -> 'hdfcbank.com', 'x.sbi.co.in' -> 'sbi.co.in'."""
+    labels = host.split('.')
+    keep = 3 if len(labels) > 2 and '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 2
+    return '.'.join(labels[-keep:])
+
+
+def extract_domains(text):
+    """Distinct hosts of the URLs and bare domains in a message, in order of appearance."""
+    hosts = {}
+    for match in URL_PATTERN.finditer(text or ''):
+        host = normalize_domain(match.group(1))
+        if host:
+            hosts.setdefault(host, None)
+    return list(hosts)
+
+
+class DomainTrie:
+    """
+    Suffix trie over reversed domain labels: 'login.example.com' is stored along
+    com -> example -> login, so looking up a host walks its labels from the TLD and
+    finds every listed parent domain in one pass of at most len(labels) dict lookups.
+    A node is a dict of child labels; a listed domain without listed subdomains is
+    stored as its entry directly instead of a dict, which keeps million-entry lists small.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.size = 0
+
+    def add(self, domain, entry):
+        """Lists a domain (and so all its subdomains); a later add of the same domain replaces the entry."""
+        labels = domain.split('.')[::-1]
+        node = self.root
+        for label in labels[:-1]:
+            child = node.get(label)
+            if child is None:
+                child = node[label] = {}
+            elif not isinstance(child, dict):
+                child = node[label] = {None: child} # A listed domain gains a subdomain
+            node = child
+        last = labels[-1]
+        child = node.get(last)
+        if isinstance(child, dict):
+            self.size += None not in child
+            child[None] = entry
+        else:
+            self.size += child is None
+            node[last] = entry
+
+    def lookup(self, host):
+        """Entry of the most specific listed domain that host equals or is a subdomain of, or None."""
+        node, found = self.root, None
+        for label in reversed(host.split('.')):
+            child = node.get(label)
+            if child is None:
+                break
+            if not isinstance(child, dict):
+                return child
+            found = child.get(None, found)
+            node = child
+        return found
+
+    def __len__(self):
+        return self.size
+
+
+def read_domain_file(path):
+    with open(path, mode='r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            domain = normalize_domain(line)
+            if domain:
+                yield domain
+
+
+class DomainLists:
+    """
+    Blocklist, allowlist and URL shortener domains in one DomainTrie, reloaded in the
+    background when a list file changes and swapped in with one reference assignment.
+    Entries are (list, path) tuples; the most specific listing wins, and for the same
+    domain the blocklist wins over the shortener list over the allowlist.
+    """
+
+    def __init__(self, blocklist_path, allowlist_path, shortener_path=None, reload_interval_seconds=30):
+        self.paths = {ALLOW: allowlist_path, SHORTENER: shortener_path, BLOCK: blocklist_path} # Load order = precedence
+        self.reload_interval_seconds = reload_interval_seconds
+        self.trie = DomainTrie()
+        self.counts = {kind: 0 for kind in self.paths}
+        self.reloads = 0
+        self.loaded_at = None
+        self._mtimes = None
+        self._reloader = None
+
+    def _current_mtimes(self):
+        mtimes = {}
+        for kind, path in self.paths.items():
+            try:
+                mtimes[kind] = os.path.getmtime(path) if path else None
+            except OSError:
+                mtimes[kind] = None
+        return mtimes
+
+    def load(self):
+        """(Re)builds the trie from the list files. Returns True if a new trie was swapped in."""
+        mtimes = self._current_mtimes()
+        if mtimes == self._mtimes:
+            return False
+        try:
+            start = time.time()
+            trie, counts = DomainTrie(), {}
+            for kind, path in self.paths.items():
+                if mtimes[kind] is not None:
+                    entry, domains = (kind, path), read_domain_file(path)
+                elif kind == SHORTENER:
+                    entry, domains = (kind, 'built-in'), DEFAULT_SHORTENERS
+                else:
+                    entry, domains = None, ()
+                before = len(trie)
+                for domain in domains:
+                    trie.add(domain, entry) # One shared entry tuple per list
+                counts[kind] = len(trie) - before
+            self.trie, self.counts = trie, counts # Readers see either the old or the new trie
+            self._mtimes = mtimes
+            self.reloads += 1
+            self.loaded_at = time.time()
+            logger.info(f"🔗 Loaded {counts[BLOCK]} blocklisted, {counts[ALLOW]} allowlisted and {counts[SHORTENER]} "
+                        f"shortener domains in {time.time() - start:.2f}s")
+            return True
+        except Exception as e:
+            logger.error(f"💥 Error loading domain lists: {e}. Keeping previous lists.")
+            return False
+
+    def start_auto_reload(self):
+        if self._reloader is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.reload_interval_seconds)
+                self.load()
+
+        self._reloader = threading.Thread(target=watch, name='domain-lists-reloader', daemon=True)
+        self._reloader.start()
+
+    def check(self, text):
+        """
+        The message's link hosts grouped by list, or None when it has no links:
+        {"domains": [...], "blocked": [...], "allowlisted": [...], "shortened": [...], "unlisted": [...]}
+        """
+        hosts = extract_domains(text)
+        if not hosts:
+            return None
+        trie = self.trie
+        result = {"domains": hosts, "blocked": [], "allowlisted": [], "shortened": [], "unlisted": []}
+        for host in hosts:
+            entry = trie.lookup(host)
+            kind = entry[0] if entry else None
+            result[{BLOCK: "blocked", ALLOW: "allowlisted", SHORTENER: "shortened"}.get(kind, "unlisted")].append(host)
+        return result
+
+    def blocked_hosts(self, hosts):
+        """The hosts (e.g. remembered from an earlier check) that are on the blocklist now."""
+        trie = self.trie
+        return [host for host in hosts if (trie.lookup(host) or (None,))[0] == BLOCK]
+
+    def stats(self):
+        return {
+            "blocklisted": self.counts.get(BLOCK, 0),
+            "allowlisted": self.counts.get(ALLOW, 0),
+            "shorteners": self.counts.get(SHORTENER, 0),
+            "files": self.paths,
+            "reloads": self.reloads,
+            "reload_interval_seconds": self.reload_interval_seconds,
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)) if self.loaded_at else None
+        }
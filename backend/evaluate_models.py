@@ -0,0 +1,81 @@
+"""
+Compares models and cascade tiers on a labeled dataset.
+
+Each target (rules, local_model, cascade and llm:<model> per model) classifies every
+case in parallel. The table shows accuracy, precision/recall/F1 for SCAM, mean/p95
+latency, generated tokens per second and the fallback rate. Reports are cached per
+target, dataset hash and the state of the rules, models, code and lists in
+evaluation_cache/, so rerunning an unchanged dataset is instant; --refresh re-runs them. The dataset is a CSV with message,label[,sender]
+columns (or JSON lines with the same fields).
+
+    python evaluate_models.py --dataset labeled_sms.csv --models llama3.2:3b,gemma2:2b
+    python evaluate_models.py --models recommended --tiers rules,cascade --output report.json
+"""
+import argparse
+import json
+import logging
+
+import main
+from evaluation import load_dataset
+
+
+def print_confusion(target, confusion):
+    print(f"   {target}: expected SCAM -> {confusion['SCAM']['SCAM']} SCAM / {confusion['SCAM']['LEGITIMATE']} LEGITIMATE / "
+          f"{confusion['SCAM']['ERROR']} ERROR; expected LEGITIMATE -> {confusion['LEGITIMATE']['SCAM']} SCAM / "
+          f"{confusion['LEGITIMATE']['LEGITIMATE']} LEGITIMATE / {confusion['LEGITIMATE']['ERROR']} ERROR")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluate models and tiers on a labeled SMS dataset")
+    parser.add_argument('--dataset', default=main.EVALUATION_DATASET_FILE)
+    parser.add_argument('--models', help="Comma-separated Ollama models, or 'recommended' (default: the configured backends' models)")
+    parser.add_argument('--tiers', default=','.join(main.EVALUATION_TIERS), help="Comma-separated tiers to evaluate ('' for none)")
+    parser.add_argument('--workers', type=int, default=main.BATCH_MAX_WORKERS, help="Cases classified in parallel per target")
+    parser.add_argument('--refresh', action='store_true', help="Ignore cached reports")
+    parser.add_argument('--output', help="Write the full reports (with per-case results) as JSON")
+    parser.add_argument('--verbose', action='store_true', help="Keep the server's per-message log lines")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger('main').setLevel(logging.WARNING)
+    cases = load_dataset(args.dataset)
+    if not cases:
+        parser.error(f"No labeled cases in {args.dataset}")
+
+    if args.models == 'recommended':
+        models = main.RECOMMENDED_MODELS
+    else:
+        models = [m.strip() for m in args.models.split(',') if m.strip()] if args.models else None
+    tiers = [t.strip() for t in args.tiers.split(',') if t.strip()]
+    targets = [t for t in main.evaluation_targets(models) if t in tiers or t.startswith("llm:")]
+    if "local_model" in targets and main.local_classifier is None:
+        print(f"⚠️ Skipping local_model: no model in {main.LOCAL_MODEL_FILE}")
+        targets.remove("local_model")
+
+    scam_cases = sum(1 for case in cases if case["expected"] == "SCAM")
+    print(f"📊 {len(cases)} cases ({scam_cases} SCAM) from {args.dataset}, {len(targets)} targets, {args.workers} workers\n")
+    print(f"{'target':<24} {'acc %':>6} {'prec':>6} {'recall':>6} {'f1':>6} {'mean s':>8} {'p95 s':>8} {'tok/s':>8} {'fallback':>8}")
+
+    reports = []
+    for target in targets:
+        try:
+            report = main.evaluate_target(target, cases, args.workers, args.refresh)
+        except ValueError as e: # e.g. a recommended model no backend serves
+            print(f"⚠️ Skipping {target}: {e}")
+            continue
+        reports.append(report)
+        summary = report["summary"]
+        tokens_per_second = summary.get("tokens_per_second")
+        print(f"{target:<24} {summary['accuracy_percentage']:>6.1f} {summary['precision']:>6.3f} {summary['recall']:>6.3f} "
+              f"{summary['f1']:>6.3f} {summary['latency_mean_seconds']:>8.3f} {summary['latency_p95_seconds']:>8.3f} "
+              f"{'-' if tokens_per_second is None else f'{tokens_per_second:.1f}':>8} {summary['fallback_rate']:>8.1%}"
+              f"{'  (cached)' if report['cached'] else ''}")
+
+    print("\n🧮 Confusion matrices:")
+    for report in reports:
+        print_confusion(report["target"], report["summary"]["confusion_matrix"])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"dataset": args.dataset, "reports": reports}, f, indent=2)
+        print(f"\n💾 Reports written to {args.output}")
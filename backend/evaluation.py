@@ -0,0 +1,206 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+LABELS = ("SCAM", "LEGITIMATE")
+
+
+def load_dataset(path):
+    """
+    Labeled cases from a CSV (message,label[,sender] columns, as for train_local_classifier.py)
+    or a JSON lines file with the same fields. Rows without a message or a valid label are skipped.
+    """
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    cases = []
+    for row in rows:
+        label = str(row.get('label') or row.get('expected') or '').strip().upper()
+        if row.get('message') and label in LABELS:
+            cases.append({"message": row['message'], "sender": row.get('sender') or 'Unknown', "expected": label})
+    return cases
+
+
+def dataset_hash(cases):
+    """Content hash of the parsed cases, so a reformatted but identical file keeps its cached results."""
+    canonical = json.dumps([[c["message"], c["sender"], c["expected"]] for c in cases], separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_cases(cases, classify, workers=4):
+    """
+    Classifies every case with classify(message, sender) on `workers` threads. Returns one
+    row per case, in dataset order, with the verdict and its wall-clock latency. Exceptions
+    become ERROR rows, so one failing case does not abort the run.
+    """
+    def run(case):
+        start = time.perf_counter()
+        try:
+            result = classify(case["message"], case["sender"])
+            error = None
+        except Exception as e:
+            result, error = {}, f"{type(e).__name__}: {e}"[:200]
+        return {
+            "message": case["message"],
+            "sender": case["sender"],
+            "expected": case["expected"],
+            "actual_classification": result.get("classification", "ERROR"),
+            "confidence": result.get("confidence_score"),
+            "method": result.get("detection_method"),
+            "decision_tier": result.get("decision_tier"),
+            "model_used": result.get("model_used"),
+            "reason": result.get("reason") if error is None else error,
+            "fallback_used": bool(result.get("fallback_used")) or error is not None,
+            "correct": result.get("classification") == case["expected"],
+            "latency_seconds": round(time.perf_counter() - start, 4)
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='eval') as executor:
+        return list(executor.map(run, cases))
+
+
+def summarize(rows, wall_seconds=None, generated_tokens=None):
+    """Accuracy, precision/recall/F1 for SCAM, the confusion matrix, latency, fallback rate and tier mix."""
+    confusion = {expected: {actual: 0 for actual in LABELS + ("ERROR",)} for expected in LABELS}
+    tier_mix = {}
+    for row in rows:
+        actual = row["actual_classification"] if row["actual_classification"] in LABELS else "ERROR"
+        confusion[row["expected"]][actual] += 1
+        tier = tier_mix.setdefault(row["decision_tier"] or "NONE", {"count": 0, "correct": 0})
+        tier["count"] += 1
+        tier["correct"] += 1 if row["correct"] else 0
+    for tier in tier_mix.values():
+        tier["accuracy_percentage"] = round(tier["correct"] / tier["count"] * 100, 1)
+
+    true_positive = confusion["SCAM"]["SCAM"]
+    predicted_scam = true_positive + confusion["LEGITIMATE"]["SCAM"]
+    actual_scam = sum(confusion["SCAM"].values())
+    precision = true_positive / predicted_scam if predicted_scam else 0.0
+    recall = true_positive / actual_scam if actual_scam else 0.0
+    latencies = [row["latency_seconds"] for row in rows]
+    correct = sum(1 for row in rows if row["correct"])
+
+    summary = {
+        "total": len(rows),
+        "correct": correct,
+        "accuracy_percentage": round(correct / len(rows) * 100, 1) if rows else 0.0,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "confusion_matrix": confusion, # expected -> actual -> count
+        "latency_mean_seconds": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        "latency_p95_seconds": round(percentile(latencies, 0.95), 4),
+        "fallback_rate": round(sum(1 for row in rows if row["fallback_used"]) / len(rows), 4) if rows else 0.0,
+        "tier_mix": tier_mix
+    }
+    if wall_seconds is not None:
+        summary["wall_seconds"] = round(wall_seconds, 3)
+        summary["messages_per_second"] = round(len(rows) / wall_seconds, 2) if wall_seconds else 0.0
+        if generated_tokens is not None:
+            summary["generated_tokens"] = generated_tokens
+            summary["tokens_per_second"] = round(generated_tokens / wall_seconds, 1) if wall_seconds else 0.0
+    return summary
+
+
+_file_digests = {} # path -> ((size, mtime_ns), sha256)
+_file_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 of a file's content ('missing' if it does not exist), rehashed only when its size or mtime changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "missing"
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _file_digests_lock:
+        cached = _file_digests.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    with _file_digests_lock:
+        _file_digests[path] = (version, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def state_hash(paths, extra=None):
+    """One hash over the content of the files (and any extra JSON-able values) a report depends on."""
+    state = {path: file_digest(path) for path in paths if path}
+    return hashlib.sha256(json.dumps([state, extra], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+_active_tally = threading.local()
+
+
+class TokenTally:
+    """Tokens generated by the LLM calls of one evaluation run, summed over its worker threads."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def active(self):
+        """Counts the tokens that count_tokens() sees on this thread into this tally."""
+        previous = getattr(_active_tally, 'tally', None)
+        _active_tally.tally = self
+        try:
+            yield self
+        finally:
+            _active_tally.tally = previous
+
+
+def count_tokens(amount):
+    """Adds generated tokens to the tally active on this thread, if any."""
+    tally = getattr(_active_tally, 'tally', None)
+    if tally is not None:
+        with tally.lock:
+            tally.tokens += amount
+
+
+class EvaluationCache:
+    """
+    Finished evaluations stored as one JSON file per (target, dataset hash, state hash) in a
+    directory, so rerunning an unchanged dataset against the same model or tier is instant.
+    The state hash covers whatever else the verdicts depend on (rules, models, code, lists).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, target, digest, state):
+        safe_target = re.sub(r'[^A-Za-z0-9._-]+', '_', target)
+        return os.path.join(self.directory, f"{safe_target}-{digest[:16]}-{state[:16]}.json")
+
+    def get(self, target, digest, state=''):
+        try:
+            with open(self._path(target, digest, state), encoding='utf-8') as f:
+                report = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return report if report.get("dataset_hash") == digest and report.get("state_hash", '') == state else None
+
+    def put(self, target, digest, report, state=''):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(target, digest, state)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(path + '.tmp', path)
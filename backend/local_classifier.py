@@ -0,0 +1,114 @@
+import json
+import logging
+import math
+import os
+import random
+import time
+import zlib
+
+from template_index import canonicalize_template
+from verdict_cache import sender_class
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NUM_BUCKETS = 1 << 18
+
+
+def extract_features(sms_text, sender_number, num_buckets=DEFAULT_NUM_BUCKETS):
+    """
+    Hashed features for one SMS: word unigrams and bigrams of the canonical template
+    plus the sender class. crc32 keeps the hashes stable between training and serving.
+    """
+    tokens = canonicalize_template(sms_text).split()
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    grams.append(f"__sender__{'PHONE' if sender_class(sender_number) == 'PHONE' else 'NAMED'}")
+    return sorted({zlib.crc32(g.encode('utf-8')) % num_buckets for g in grams})
+
+
+def _sigmoid(z):
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class HashedNgramClassifier:
+    """
+    Logistic regression over hashed n-gram features. Weights are sparse (only buckets seen
+    in training are stored), so inference is a handful of dict lookups per message.
+    """
+
+    def __init__(self, weights, bias, num_buckets=DEFAULT_NUM_BUCKETS, metadata=None):
+        self.weights = weights
+        self.bias = bias
+        self.num_buckets = num_buckets
+        self.metadata = metadata or {}
+
+    def scam_probability(self, sms_text, sender_number):
+        features = extract_features(sms_text, sender_number, self.num_buckets)
+        if not features:
+            return _sigmoid(self.bias)
+        scale = 1.0 / math.sqrt(len(features))
+        get = self.weights.get
+        return _sigmoid(self.bias + scale * sum(get(f, 0.0) for f in features))
+
+    @classmethod
+    def train(cls, examples, epochs=10, learning_rate=0.5, l2=1e-5, num_buckets=DEFAULT_NUM_BUCKETS, seed=13):
+        """
+        Trains with plain SGD. examples is a list of (sms_text, sender_number, is_scam).
+        """
+        rng = random.Random(seed)
+        rows = [(extract_features(text, sender, num_buckets), 1.0 if is_scam else 0.0) for text, sender, is_scam in examples]
+        weights = {}
+        bias = 0.0
+        for epoch in range(epochs):
+            rng.shuffle(rows)
+            rate = learning_rate / (1 + epoch)
+            for features, label in rows:
+                scale = 1.0 / math.sqrt(len(features)) if features else 0.0
+                p = _sigmoid(bias + scale * sum(weights.get(f, 0.0) for f in features))
+                gradient = p - label
+                bias -= rate * gradient
+                for f in features:
+                    w = weights.get(f, 0.0)
+                    weights[f] = w - rate * (gradient * scale + l2 * w)
+        weights = {f: round(w, 6) for f, w in weights.items() if abs(w) > 1e-6}
+        metadata = {
+            "trained_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "examples": len(rows),
+            "scam_examples": sum(1 for _, label in rows if label),
+            "epochs": epochs
+        }
+        return cls(weights, bias, num_buckets, metadata)
+
+    def save(self, path):
+        with open(path, mode='w', encoding='utf-8') as f:
+            json.dump({
+                "format": "hashed-ngram-logreg/1",
+                "num_buckets": self.num_buckets,
+                "bias": self.bias,
+                "metadata": self.metadata,
+                "weights": {str(k): v for k, v in self.weights.items()}
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a saved model, or returns None if the file is missing or unreadable."""
+        if not os.path.exists(path):
+            logger.warning(f"⚠️ Local model not found: {path}. Local classifier tier disabled.")
+            return None
+        try:
+            with open(path, mode='r', encoding='utf-8') as f:
+                data = json.load(f)
+            model = cls(
+                {int(k): float(v) for k, v in data["weights"].items()},
+                float(data["bias"]),
+                int(data.get("num_buckets", DEFAULT_NUM_BUCKETS)),
+                data.get("metadata")
+            )
+            logger.info(f"🧠 Loaded local classifier from {path} ({len(model.weights)} weights)")
+            return model
+        except Exception as e:
+            logger.error(f"💥 Error loading local classifier from {path}: {e}. Local classifier tier disabled.")
+            return None
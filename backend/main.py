@@ -1,13 +1,39 @@
 import requests
 import json
 import re
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import logging
 from datetime import datetime
-import csv # For CSV operations
 import os # For checking file existence
 import threading # For thread-safe CSV writing
+import time
+import uuid
+import gzip
+import hashlib
+import inspect
+import zlib
+from collections import OrderedDict
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED # For concurrent /batch classification
+from verdict_cache import VerdictCache, make_cache_key
+from template_index import TemplateIndex
+from fallback_rules import FallbackRules
+from ollama_router import OllamaRouter, parse_backends
+from local_classifier import HashedNgramClassifier
+from watchlist import Watchlist
+from domain_lists import DomainLists, extract_domains
+from scam_log import ScamLogWriter
+from scam_store import ScamEventStore, parse_time
+from metrics import MetricsRegistry
+from single_flight import SingleFlight, FollowerTimeout
+from admission import AdmissionController, LoadShed
+from evaluation import load_dataset, dataset_hash, run_cases, summarize, EvaluationCache, TokenTally, count_tokens, state_hash
+
+try:
+    import msgpack # Optional: MessagePack bodies for compact /batch
+except ImportError:
+    msgpack = None
 
 # Set up logging to see what's happening
 logging.basicConfig(level=logging.INFO)
@@ -17,113 +43,411 @@ logger = logging.getLogger(__name__)
 RECOMMENDED_MODELS = [
     "llama3.2:3b", "gemma2:2b", "phi3:3.8b", "qwen2.5:3b", "mistral:7b", "llama3.1:8b"
 ]
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
+OLLAMA_BASE_URL = os.environ.get('OLLAMA_BASE_URL', "http://localhost:11434")
 OLLAMA_MODEL = "llama3.2:3b"
 
+# Number of /batch items classified at once. Match this to Ollama's OLLAMA_NUM_PARALLEL,
+# otherwise the extra requests just queue up inside Ollama instead.
+BATCH_MAX_WORKERS = int(os.environ.get('OLLAMA_NUM_PARALLEL', '4'))
+SERVER_WORKERS = int(os.environ.get('SMS_SERVER_WORKERS', '1')) # Worker processes sharing the backends (set by serve.py)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS, thread_name_prefix='batch') # Shared so concurrent /batch calls stay bounded
+
+# Packed /batch mode ("packed": true in the request): messages that reach the LLM tier are
+# sent BATCH_PACK_SIZE at a time in one generation, so the ~1.5 KB guideline prompt is
+# paid once per pack instead of once per message. Verdicts come back as structured JSON.
+BATCH_PACKED_DEFAULT = False
+BATCH_PACK_SIZE = 8
+BATCH_PACK_TOKENS_PER_MESSAGE = 60 # num_predict budget per packed message
+BATCH_PACK_TIMEOUT_FACTOR = 2 # A pack generates more tokens, so it gets a longer read timeout
+PACKED_VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "verdicts": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "classification": {"type": "string", "enum": ["SCAM", "LEGITIMATE"]},
+                    "confidence": {"type": "integer"},
+                    "reason": {"type": "string"}
+                },
+                "required": ["id", "classification", "confidence", "reason"]
+            }
+        }
+    },
+    "required": ["verdicts"]
+}
+
+# One keep-alive connection pool per Ollama backend, shared by every request thread.
+# Connect failures surface in OLLAMA_CONNECT_TIMEOUT seconds; generations get OLLAMA_READ_TIMEOUT.
+OLLAMA_POOL_SIZE = max(10, BATCH_MAX_WORKERS * 2)
+OLLAMA_CONNECT_TIMEOUT = 3
+OLLAMA_READ_TIMEOUT = 50
+
+# Ollama backends, comma-separated 'url' or 'model@url' entries, e.g.
+# OLLAMA_BACKENDS="http://gpu1:11434,gemma2:2b@http://gpu2:11434". Requests go to the
+# backend with the fewest outstanding generations; a backend that fails
+# OLLAMA_FAILURE_THRESHOLD times in a row is skipped for OLLAMA_CIRCUIT_OPEN_SECONDS.
+OLLAMA_BACKENDS = parse_backends(os.environ.get('OLLAMA_BACKENDS', OLLAMA_BASE_URL), OLLAMA_MODEL)
+OLLAMA_FAILURE_THRESHOLD = 3
+OLLAMA_CIRCUIT_OPEN_SECONDS = 30
+OLLAMA_CROSS_MODEL_FAILOVER = True # Fail over to backends serving another model before using the fallback rules
+ollama_router = OllamaRouter(OLLAMA_BACKENDS, OLLAMA_POOL_SIZE, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT,
+                             OLLAMA_FAILURE_THRESHOLD, OLLAMA_CIRCUIT_OPEN_SECONDS, OLLAMA_CROSS_MODEL_FAILOVER)
+
+# A background prober checks every backend every OLLAMA_PROBE_SECONDS (via /api/ps, no
+# generation) and /health answers from its last result. Models are loaded at startup and
+# pinned with keep_alive so the first request after an idle period does not pay the load.
+OLLAMA_PROBE_SECONDS = 10
+OLLAMA_KEEP_ALIVE = "30m" # Sent with every generation; -1 keeps the model loaded forever
+OLLAMA_WARM_UP = True # Load the model at startup and again whenever Ollama has unloaded it
+OLLAMA_WARM_UP_TIMEOUT = 120 # Loading a model from disk can take a while
+
+# Stream generations and hang up as soon as the REASON line is complete, so Ollama
+# stops spending tokens on text nobody reads.
+OLLAMA_STREAM_EARLY_EXIT = True
+LLM_ANSWER_COMPLETE = re.compile(r'REASON:[^\n]*\S[^\n]*\n', re.IGNORECASE)
+
 # --- Enhancement 1: Suspicious Number Watchlist ---
 SUSPICIOUS_NUMBERS_FILE = 'suspicious_numbers.csv'
-WATCHLIST_NUMBERS = {} # Cache for loaded suspicious numbers: {'+919876500001': {'name': 'ScammerRavi', ...}}
+WATCHLIST_DEFAULT_COUNTRY_CODE = '91' # Applied to 10-digit national numbers without a country code
+WATCHLIST_RELOAD_SECONDS = 10 # How often the CSV is checked for changes
+# Built from the CSV by build_watchlist.py. When present and not older than the CSV it is
+# memory-mapped instead of parsed, so all worker processes share one read-only copy.
+WATCHLIST_BINARY_FILE = 'suspicious_numbers.bin'
+watchlist = Watchlist(SUSPICIOUS_NUMBERS_FILE, WATCHLIST_DEFAULT_COUNTRY_CODE, WATCHLIST_RELOAD_SECONDS, WATCHLIST_BINARY_FILE)
 # --- End Enhancement 1 Data ---
 
 # --- Enhancement 3: High-Confidence Scam Logging ---
-HIGH_CONFIDENCE_SCAMS_FILE = 'high_confidence_scams.csv'
+# Rows are queued and appended in batches by a background writer, so a scam blast
+# never makes request threads wait on disk I/O. With the 'sqlite' format they go to an
+# indexed store (SCAM_STORE_DB) that GET /scams queries; the legacy CSV is imported once.
+HIGH_CONFIDENCE_SCAMS_FILE = 'high_confidence_scams.csv' # Use a '.jsonl.gz' name with SCAM_LOG_FORMAT = 'jsonl.gz'
 SCAM_LOG_FIELDNAMES = ['timestamp', 'sender_id', 'message_content', 'analysis_json']
-scam_log_lock = threading.Lock() # To prevent race conditions when writing to CSV
+SCAM_LOG_FORMAT = 'sqlite' # 'sqlite' (indexed, queryable), 'csv' or 'jsonl.gz' (gzip-compressed segments)
+SCAM_STORE_DB = 'scam_events.db'
+SCAM_STORE_RETENTION_DAYS = 90
+SCAM_STORE_MAX_EVENTS = 1000000 # The oldest events beyond this are deleted at compaction
+SCAM_STORE_COMPACT_SECONDS = 3600
+SCAM_STORE_QUERY_MAX_LIMIT = 500
+# Messages whose exact (normalized) text the LLM already judged a high-confidence scam are
+# answered from the store before the LLM is called, whoever sends them. DELETE /scams/known
+# forgets a message at once (e.g. a reported false positive).
+SCAM_STORE_KNOWN_CONTENT = True
+SCAM_STORE_KNOWN_MIN_HITS = 1
+SCAM_STORE_KNOWN_TTL_DAYS = 7 # Since the LLM last confirmed the verdict
+scam_store = ScamEventStore(SCAM_STORE_DB, SCAM_STORE_RETENTION_DAYS, SCAM_STORE_MAX_EVENTS, SCAM_STORE_COMPACT_SECONDS,
+                            WATCHLIST_DEFAULT_COUNTRY_CODE, SCAM_STORE_KNOWN_TTL_DAYS) if SCAM_LOG_FORMAT == 'sqlite' else None
+SCAM_LOG_MAX_QUEUE = 10000 # Events beyond this are dropped (and counted) rather than blocking requests
+SCAM_LOG_BATCH_SIZE = 200
+SCAM_LOG_FLUSH_SECONDS = 1.0
+SCAM_LOG_ROTATE_BYTES = 50 * 1024 * 1024 # 0 disables size-based rotation
+SCAM_LOG_ROTATE_DAILY = False
+scam_log = ScamLogWriter(SCAM_STORE_DB if scam_store else HIGH_CONFIDENCE_SCAMS_FILE, SCAM_LOG_FIELDNAMES, SCAM_LOG_FORMAT,
+                         SCAM_LOG_MAX_QUEUE, SCAM_LOG_BATCH_SIZE, SCAM_LOG_FLUSH_SECONDS, SCAM_LOG_ROTATE_BYTES,
+                         SCAM_LOG_ROTATE_DAILY, scam_store)
+scam_log.start()
 # --- End Enhancement 3 Data ---
 
+# --- Enhancement 4: Verdict Cache ---
+# LLM verdicts keyed on normalized text + sender class + model, so repeated OTP templates
+# and mass-blast scams only cost one generation. Set VERDICT_CACHE_DB = None for memory only.
+VERDICT_CACHE_MAX_ENTRIES = 10000
+VERDICT_CACHE_TTL_SECONDS = 24 * 60 * 60
+VERDICT_CACHE_DB = 'verdict_cache.db'
+verdict_cache = VerdictCache(VERDICT_CACHE_MAX_ENTRIES, VERDICT_CACHE_TTL_SECONDS, VERDICT_CACHE_DB)
+
+# Templated SMS (OTPs, bank alerts, order updates) differ only in digits, amounts and links.
+# The template index clusters them so one LLM verdict covers the whole template, for as
+# long as the verdict cache would keep that verdict.
+TEMPLATE_INDEX_MAX_CLUSTERS = 50000
+TEMPLATE_MIN_SIMILARITY = 0.7 # Jaccard similarity of word features needed to join a cluster
+template_index = TemplateIndex(TEMPLATE_INDEX_MAX_CLUSTERS, TEMPLATE_MIN_SIMILARITY, ttl_seconds=VERDICT_CACHE_TTL_SECONDS)
+
+# Identical messages (same cache key) that arrive while their LLM call is still running
+# wait for that call instead of starting another one, from /analyze and /batch alike.
+llm_single_flight = SingleFlight()
+# --- End Enhancement 4 Data ---
+
+# --- Enhancement 5: Compiled Fallback Rules ---
+# Keyword groups used by analyze_with_fallback_rules. Edit the file while the server runs;
+# it is re-read within FALLBACK_RULES_CHECK_SECONDS of a change.
+FALLBACK_RULES_FILE = 'fallback_rules.json'
+FALLBACK_RULES_CHECK_SECONDS = 5
+fallback_rules = FallbackRules(FALLBACK_RULES_FILE, FALLBACK_RULES_CHECK_SECONDS)
+# --- End Enhancement 5 Data ---
+
+# --- Enhancement 6: Tiered Classification ---
+# watchlist -> compiled rules -> local classifier -> LLM. Each tier only decides when it is
+# confident; everything else falls through to classify_sms_with_ollama.
+CASCADE_ENABLED = True
+CASCADE_RULES_MIN_SCAM_SCORE = 85 # Rule-based SCAM verdicts at or above this skip the LLM
+LOCAL_MODEL_FILE = 'local_model.json' # Built by train_local_classifier.py; tier is skipped if missing
+LOCAL_MODEL_UNCERTAIN_BAND = (0.2, 0.8) # Scam probabilities inside this band go on to the LLM
+local_classifier = HashedNgramClassifier.load(LOCAL_MODEL_FILE)
+# --- End Enhancement 6 Data ---
+
+# --- Enhancement 7: Watchlist Short-Circuit ---
+# Watchlisted senders are answered without an LLM call. Clients can opt in (per request,
+# "llm_reason": true) to have the LLM assessment computed in the background and fetched
+# later from GET /analysis/<llm_reason_id>.
+WATCHLIST_ASYNC_LLM_REASON = False # Default when a request does not send "llm_reason"
+ASYNC_REASON_MAX_RESULTS = 10000 # Oldest background assessments are forgotten beyond this
+async_reason_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='llm-reason')
+async_reason_results = OrderedDict() # llm_reason_id -> {"status": ..., "llm_assessment": ...}
+async_reason_lock = threading.Lock()
+
+short_circuit_stats = {"watchlist_hits": 0, "async_reasons_requested": 0}
+short_circuit_lock = threading.Lock()
+llm_latency = {"calls": 0, "ewma_seconds": 0.0} # Smoothed LLM round trip, used to estimate time saved
+LLM_LATENCY_SMOOTHING = 0.1
+# --- End Enhancement 7 Data ---
+
+# --- Enhancement 8: Metrics ---
+# Per-stage latency histograms and counters, exported in the Prometheus text format on
+# GET /metrics. Messages slower than METRICS_SLOW_REQUEST_SECONDS keep their per-stage
+# breakdown for GET /metrics/slow (set to None to disable the sampler).
+METRICS_SLOW_REQUEST_SECONDS = 2.0
+METRICS_SLOW_REQUEST_SAMPLES = 100
+metrics = MetricsRegistry('sms', METRICS_SLOW_REQUEST_SECONDS, METRICS_SLOW_REQUEST_SAMPLES)
+request_seconds = metrics.histogram('request_seconds', "HTTP request latency by endpoint", ['endpoint'])
+requests_in_flight = metrics.gauge('requests_in_flight', "HTTP requests being handled", ['endpoint'])
+decisions_total = metrics.counter('decisions_total', "Verdicts by the cascade tier that decided them", ['tier'])
+fallbacks_total = metrics.counter('fallbacks_total', "Rule-based fallbacks by reason", ['reason'])
+verdict_lookups_total = metrics.counter('verdict_lookups_total', "Verdict cache and template index lookups", ['result'])
+packed_items_total = metrics.counter('packed_items_total', "Packed /batch messages by whether their JSON verdict parsed", ['result'])
+coalesced_total = metrics.counter('coalesced_total', "Classifications that joined an identical in-flight LLM call")
+ollama_in_flight = metrics.gauge('ollama_in_flight', "Generations waiting on Ollama")
+ollama_generations_total = metrics.counter('ollama_generations_total', "Ollama generations by outcome", ['outcome'])
+ollama_tokens_total = metrics.counter('ollama_tokens_total', "Token counts reported by Ollama", ['kind'])
+ollama_reported_seconds = metrics.histogram('ollama_reported_seconds', "Durations reported by Ollama", ['phase'])
+ollama_backend_gauge = metrics.gauge('ollama_backend', "Per-backend router state, sampled at scrape time", ['backend', 'field'])
+state_gauge = metrics.gauge('state', "Sizes and totals of in-memory components, sampled at scrape time", ['component', 'field'])
+load_shed_total = metrics.counter('load_shed_total', "LLM calls answered by the fallback rules instead, by priority and reason", ['priority', 'reason'])
+# --- End Enhancement 8 Data ---
+
+# --- Enhancement 9: Admission Control ---
+# At most ADMISSION_MAX_CONCURRENT generations run at once (what the Ollama servers process
+# in parallel); the rest queue, /analyze ahead of /batch. A call whose predicted queue wait
+# would overrun its request's deadline is answered by the fallback rules right away
+# ("error": "LOAD_SHED" plus a "degradation" reason) instead of timing out later.
+# Clients may ask for a shorter deadline with "deadline_seconds".
+ADMISSION_MAX_CONCURRENT = max(1, -(-BATCH_MAX_WORKERS * len(OLLAMA_BACKENDS) // SERVER_WORKERS)) # This process's share
+ADMISSION_MAX_QUEUE = 200 # Calls beyond this are shed immediately
+ADMISSION_INTERACTIVE_DEADLINE_SECONDS = 15 # /analyze
+ADMISSION_BATCH_DEADLINE_SECONDS = 45 # /batch and /batch/stream, per item (or pack) from when a worker starts it
+ADMISSION_MIN_READ_TIMEOUT = 5 # Generations get the time left until the deadline, but at least this
+admission = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE)
+# --- End Enhancement 9 Data ---
+
+# --- Enhancement 10: Compact Batch Sync ---
+# Opt-in /batch mode ("compact": true) for mobile links: bodies may be gzip-compressed or
+# MessagePack, results carry no message echo, and an entry can send "hash" (sha256 of
+# sender + "\n" + message) instead of "message". Known hashes are answered from
+# content_verdicts; unknown ones come back in "need_body" for the client to resend.
+COMPACT_BATCH_DEFAULT = False
+COMPACT_VERDICTS_MAX_ENTRIES = 100000
+COMPACT_VERDICTS_TTL_SECONDS = VERDICT_CACHE_TTL_SECONDS # A hash is never answered longer than its LLM verdict is cached
+COMPACT_VERDICTS_DB = 'content_verdicts.db' # Shared by the worker processes; None for memory only
+COMPACT_DROPPED_FIELDS = ("message_content", "sender", "timestamp") # The client already has these
+COMPACT_CACHEABLE_TIERS = ("RULES", "LOCAL_MODEL", "LLM") # Watchlist verdicts are re-checked on every request
+COMPACT_GZIP_MIN_BYTES = 512 # Smaller responses are sent uncompressed
+COMPACT_GZIP_LEVEL = 6
+COMPACT_MAX_BODY_BYTES = 10 * 1024 * 1024 # Limit on a decompressed request body
+content_verdicts = VerdictCache(COMPACT_VERDICTS_MAX_ENTRIES, COMPACT_VERDICTS_TTL_SECONDS, COMPACT_VERDICTS_DB)
+compact_entries_total = metrics.counter('compact_entries_total', "Compact /batch entries by how they were answered", ['result'])
+# --- End Enhancement 10 Data ---
+
+# --- Enhancement 11: Evaluation ---
+# /test and evaluate_models.py run a labeled dataset (message,label[,sender]) against the
+# rule tier, the local classifier, the full cascade and individual LLMs ("llm:<model>").
+# Reports are cached per (target, dataset hash) in EVALUATION_CACHE_DIR, and only reused while
+# the rules, local model, code, watchlist and domain lists they were made with are unchanged.
+EVALUATION_DATASET_FILE = 'evaluation_set.csv'
+EVALUATION_CACHE_DIR = 'evaluation_cache'
+EVALUATION_TIERS = ("rules", "local_model", "cascade")
+evaluation_cache = EvaluationCache(EVALUATION_CACHE_DIR)
+# --- End Enhancement 11 Data ---
+
+# --- Enhancement 12: Link Domain Lists ---
+# Hosts of the links in a message are looked up in a reversed-label suffix trie built from
+# these files (one domain per line; URLs and hosts-file lines work too). A listed domain
+# covers its subdomains and the most specific listing wins. A blocklisted link decides
+# SCAM right after the watchlist; when every link is an allowlisted brand domain, the
+# message's LLM call drops one admission priority class. Shortened links never count as
+# allowlisted. The files are re-read in the background after they change.
+DOMAIN_BLOCKLIST_FILE = 'domain_blocklist.txt'
+DOMAIN_ALLOWLIST_FILE = 'domain_allowlist.txt'
+DOMAIN_SHORTENERS_FILE = 'url_shorteners.txt' # A built-in list is used when it is missing
+DOMAIN_LISTS_RELOAD_SECONDS = 30
+DOMAIN_BLOCKLIST_CONFIDENCE = 95
+LINK_DEMOTED_PRIORITY = {"interactive": "batch", "batch": "background"}
+domain_lists = DomainLists(DOMAIN_BLOCKLIST_FILE, DOMAIN_ALLOWLIST_FILE, DOMAIN_SHORTENERS_FILE, DOMAIN_LISTS_RELOAD_SECONDS)
+link_domains_total = metrics.counter('link_domains_total', "Link hosts found in messages by list", ['list'])
+# --- End Enhancement 12 Data ---
+
 
 def load_suspicious_numbers():
-    """Loads suspicious numbers from CSV into memory."""
-    global WATCHLIST_NUMBERS
-    WATCHLIST_NUMBERS = {} # Reset before loading
+    """Loads the suspicious numbers index and starts watching the CSV for changes."""
+    watchlist.load()
+    watchlist.start_auto_reload()
+
+def load_domain_lists():
+    """Builds the link domain trie and starts watching the list files for changes."""
+    domain_lists.load()
+    domain_lists.start_auto_reload()
+
+def import_legacy_scam_log():
+    """Moves the events of a pre-existing CSV scam log into the store (once, whichever process gets there first)."""
+    if scam_store is None:
+        return
     try:
-        if os.path.exists(SUSPICIOUS_NUMBERS_FILE):
-            with open(SUSPICIOUS_NUMBERS_FILE, mode='r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                for row in reader:
-                    # Normalize phone number: ensure country code is present, default to +91 if ambiguous
-                    # This is a simple normalization, real-world scenarios are complex.
-                    phone_number = row.get('phone_number', '').strip()
-                    country_code = row.get('country_code', '').strip()
-
-                    if not phone_number:
-                        continue
-
-                    if phone_number.startswith('+'):
-                        full_number = phone_number
-                    elif country_code:
-                        full_number = f"+{country_code}{phone_number}"
-                    elif len(phone_number) == 10 and phone_number.isdigit(): # Assume Indian number if 10 digits and no CC
-                        full_number = f"+91{phone_number}"
-                    else:
-                        full_number = phone_number # Store as is if unsure
-
-                    WATCHLIST_NUMBERS[full_number] = {
-                        'name': row.get('name'),
-                        'source': row.get('source'),
-                        'detection_date': row.get('detection_date')
-                    }
-            logger.info(f"👁️ Loaded {len(WATCHLIST_NUMBERS)} numbers into watchlist from {SUSPICIOUS_NUMBERS_FILE}")
-        else:
-            logger.warning(f"⚠️ Watchlist file not found: {SUSPICIOUS_NUMBERS_FILE}. Watchlist will be empty.")
+        scam_store.import_csv(HIGH_CONFIDENCE_SCAMS_FILE)
     except Exception as e:
-        logger.error(f"💥 Error loading suspicious numbers: {e}")
+        logger.error(f"💥 Could not import {HIGH_CONFIDENCE_SCAMS_FILE} into the scam store: {e}")
+
+def start_ollama_prober():
+    """Starts the background backend prober (and model warm-up)."""
+    ollama_router.start_prober(OLLAMA_PROBE_SECONDS, OLLAMA_KEEP_ALIVE, OLLAMA_WARM_UP, OLLAMA_WARM_UP_TIMEOUT)
 
 def check_sender_watchlist(sender_number):
     """
-    Checks if a sender number (expected with +countrycode) is on the watchlist.
+    Checks if a sender number is on the watchlist (exact number, prefix block or range).
+    Any format is accepted; it is normalized to E.164 the same way the watchlist was.
     Returns "on_watchlist" or "none".
     """
-    # Basic normalization for lookup (e.g. removing spaces, though watchlist should be clean)
-    normalized_sender = sender_number.replace(" ", "").strip()
-    if normalized_sender in WATCHLIST_NUMBERS:
-        logger.info(f"🚦 Sender {normalized_sender} found on watchlist.")
+    with metrics.stage('watchlist'):
+        entry = watchlist.lookup(sender_number)
+    if entry is not None:
+        logger.info(f"🚦 Sender {sender_number} found on watchlist ({entry['match']} match {entry['number']}).")
         return "on_watchlist"
-    
-    # Check for partial matches for Indian numbers if +91 is missing and sender is 10 digits
-    if not normalized_sender.startswith('+') and len(normalized_sender) == 10 and normalized_sender.isdigit():
-        if f"+91{normalized_sender}" in WATCHLIST_NUMBERS:
-            logger.info(f"🚦 Sender +91{normalized_sender} (derived) found on watchlist.")
-            return "on_watchlist"
-            
     return "none"
 
 
 def log_high_confidence_scam(sender_id, message_content, analysis_result):
-    """Appends high-confidence scam details to a CSV file."""
+    """Queues high-confidence scam details for the background scam log writer."""
     try:
-        with scam_log_lock: # Ensure thread-safe writes
-            file_exists = os.path.isfile(HIGH_CONFIDENCE_SCAMS_FILE)
-            with open(HIGH_CONFIDENCE_SCAMS_FILE, mode='a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=SCAM_LOG_FIELDNAMES)
-                if not file_exists or os.path.getsize(HIGH_CONFIDENCE_SCAMS_FILE) == 0:
-                    writer.writeheader() # Write header only if file is new/empty
-
-                # Prepare data for CSV
-                # The 'analysis_result' is the core AI response part, not the full metadata-added one.
-                # We'll store the 'analysis_result' part of the 'result' from /analyze before further metadata is added.
-                log_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'sender_id': sender_id,
-                    'message_content': message_content,
-                    'analysis_json': json.dumps(analysis_result) # Store the detailed AI analysis as a JSON string
-                }
-                writer.writerow(log_entry)
-                logger.info(f"📝 Logged high-confidence scam from {sender_id} to {HIGH_CONFIDENCE_SCAMS_FILE}")
+        # The 'analysis_result' is the core AI response part, not the full metadata-added one.
+        log_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'sender_id': sender_id,
+            'message_content': message_content,
+            'analysis_json': json.dumps(analysis_result) # Store the detailed AI analysis as a JSON string
+        }
+        with metrics.stage('scam_log'):
+            queued = scam_log.log(log_entry)
+        if not queued:
+            logger.warning(f"⚠️ Scam log queue full, dropped event from {sender_id}")
     except Exception as e:
         logger.error(f"💥 Error logging high-confidence scam: {e}")
 
 
-def classify_sms_with_ollama(sms_text, sender_number): # Unchanged from your version
+def read_streamed_llm_response(response):
+    """
+    Reads an Ollama stream:true response until the CLASSIFICATION/CONFIDENCE/REASON answer
+    is complete (or generation is done), then closes the connection so generation stops.
+    Returns the answer text and the final "done" chunk (token counts and durations),
+    which is None when generation was stopped early.
+    """
+    chunks = []
+    final_part = None
+    try:
+        for line in response.iter_lines():
+            if not line:
+                continue
+            part = json.loads(line)
+            piece = part.get("response", "")
+            chunks.append(piece)
+            if part.get("done"):
+                final_part = part
+                break
+            # REASON is the last line of the answer, so a newline after it means we have everything
+            if "\n" in piece and LLM_ANSWER_COMPLETE.search("".join(chunks)):
+                logger.info("✂️ Answer complete, stopping generation early")
+                record_generated_tokens("eval", len(chunks)) # No final stats then; Ollama streams one token per chunk
+                break
+    finally:
+        response.close()
+    return "".join(chunks), final_part
+
+def read_generation(response):
+    """Reads a generate response; returns the answer text and the final response body (or None)."""
+    if OLLAMA_STREAM_EARLY_EXIT:
+        raw_response, response_data = read_streamed_llm_response(response)
+        return raw_response.strip(), response_data
+    response_data = response.json() #
+    return response_data.get("response", "").strip(), response_data #
+
+def record_generated_tokens(kind, amount):
+    ollama_tokens_total.inc(kind, amount=amount)
+    if kind == "eval":
+        count_tokens(amount) # For a running evaluation on this thread
+
+def record_ollama_stats(response_data):
+    """Token counts and durations (nanoseconds) from an Ollama generate response body."""
+    if not response_data:
+        return
+    for kind, field in (("prompt", "prompt_eval_count"), ("eval", "eval_count")):
+        if response_data.get(field):
+            record_generated_tokens(kind, response_data[field])
+    for phase in ("load", "prompt_eval", "eval", "total"):
+        if response_data.get(f"{phase}_duration"):
+            ollama_reported_seconds.observe(response_data[f"{phase}_duration"] / 1e9, phase)
+
+def lookup_cached_verdict(sms_text, sender_number):
+    """Returns (cache_key, verdict) from the verdict cache or template index; verdict is None on a miss."""
+    # A blocklisted link outranks any verdict remembered for the same text or template
+    links = check_links(sms_text)
+    if links is not None and links["blocked"]:
+        verdict_lookups_total.inc("blocklisted")
+        return make_cache_key(sms_text, sender_number, OLLAMA_MODEL), blocked_link_result(links)
+
+    with metrics.stage('cache'):
+        cache_key = make_cache_key(sms_text, sender_number, OLLAMA_MODEL)
+        cached_result = verdict_cache.get(cache_key)
+    if cached_result is not None:
+        logger.info(f"⚡ Cache hit for: {sms_text[:50]}...")
+        verdict_lookups_total.inc("cache_hit")
+        cached_result["cached"] = True
+        return cache_key, cached_result
+
+    with metrics.stage('template_index'):
+        cluster_id, template_result = template_index.lookup(sms_text, sender_number, OLLAMA_MODEL)
+    if template_result is not None:
+        logger.info(f"🧩 Template cluster {cluster_id} hit for: {sms_text[:50]}...")
+        verdict_lookups_total.inc("template_hit")
+        template_result.update({"cached": True, "template_cluster_id": cluster_id})
+        return cache_key, template_result
+    verdict_lookups_total.inc("miss")
+    return cache_key, None
+
+def classify_sms_with_ollama(sms_text, sender_number):
     """
     Analyzes SMS for scam indicators using Ollama AI with balanced prompt
     Returns classification with detection method info
+    Verdicts are served from the verdict cache when the same message was already classified
     """
-    
-    # Improved balanced prompt - focuses on being conservative
-    prompt = f"""You are a careful SMS security analyst. Your job is to identify CLEAR scams while avoiding false alarms.
+    cache_key, cached_result = lookup_cached_verdict(sms_text, sender_number)
+    if cached_result is not None:
+        return cached_result
+
+    # Callers only join a call of their own priority class: an interactive request must not
+    # wait behind a background generation, and a follower's wait ends at its own deadline
+    priority = admission.current()[0]
+    try:
+        result, shared = llm_single_flight.do((cache_key, priority), lambda: generate_llm_verdict(sms_text, sender_number, cache_key),
+                                              timeout=admission.remaining())
+    except FollowerTimeout:
+        return shed_to_fallback(sms_text, sender_number, admission.expired())
+    if shared:
+        logger.info(f"🔗 Joined in-flight classification for: {sms_text[:50]}...")
+        coalesced_total.inc()
+        result = dict(result, coalesced=True) # Callers annotate their copy
+    return result
 
-IMPORTANT GUIDELINES:
+# Shared by the single-message and packed prompts
+LLM_GUIDELINES = """IMPORTANT GUIDELINES:
 - Most legitimate businesses send SMS notifications
 - Only classify as SCAM if there are OBVIOUS red flags
 - When in doubt, classify as LEGITIMATE
@@ -144,7 +468,19 @@ LEGITIMATE MESSAGE TYPES:
 - Prescription notifications
 - Order confirmations
 - Service notifications from known companies
-- Marketing messages from real businesses
+- Marketing messages from real businesses"""
+
+def generate_llm_verdict(sms_text, sender_number, cache_key, model=OLLAMA_MODEL, cross_model_failover=None):
+    """
+    One LLM generation for a cache miss, with rule-based fallback on Ollama errors.
+    Successful verdicts are stored in the verdict cache and template index (not when
+    cache_key is None, as for evaluation runs against other models).
+    cross_model_failover=False never lets another model answer (see OllamaRouter.generate).
+    """
+    # Improved balanced prompt - focuses on being conservative
+    prompt = f"""You are a careful SMS security analyst. Your job is to identify CLEAR scams while avoiding false alarms.
+
+{LLM_GUIDELINES}
 
 ANALYZE THIS MESSAGE:
 From: {sender_number}
@@ -161,9 +497,10 @@ CONFIDENCE: [number 50-100]
 REASON: [one sentence explanation]""" #
 
     payload = {
-        "model": OLLAMA_MODEL,
+        "model": model,
         "prompt": prompt,
-        "stream": False,
+        "stream": OLLAMA_STREAM_EARLY_EXIT,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
         "options": {
             "temperature": 0.1,
             "top_p": 0.8,
@@ -173,18 +510,28 @@ REASON: [one sentence explanation]""" #
     } #
 
     try:
-        logger.info(f"🤖 Analyzing with {OLLAMA_MODEL}: {sms_text[:50]}...") #
+        logger.info(f"🤖 Analyzing with {model}: {sms_text[:50]}...") #
         
-        response = requests.post(
-            OLLAMA_API_URL, 
-            json=payload, 
-            headers={"Content-Type": "application/json"}, 
-            timeout=50
-        ) #
-        response.raise_for_status() #
-
-        response_data = response.json() #
-        raw_response = response_data.get("response", "").strip() #
+        with admission.slot() as queued_seconds:
+            metrics.record_stage('admission_wait', queued_seconds)
+            llm_start = time.perf_counter()
+            ollama_in_flight.inc()
+            try:
+                # Fails over between backends; raises only when every backend failed
+                (raw_response, response_data), backend = ollama_router.generate(payload, read_generation, read_timeout=llm_read_timeout(),
+                                                                                 stream=OLLAMA_STREAM_EARLY_EXIT,
+                                                                                 cross_model_failover=cross_model_failover)
+            except Exception:
+                ollama_generations_total.inc("error")
+                raise
+            finally:
+                ollama_in_flight.dec()
+                metrics.record_stage('ollama', time.perf_counter() - llm_start)
+        llm_seconds = time.perf_counter() - llm_start
+        record_llm_latency(llm_seconds)
+        ollama_generations_total.inc("complete" if response_data else "early_exit")
+        record_ollama_stats(response_data)
+        parse_start = time.perf_counter()
         
         logger.info(f"🔍 AI Response: {raw_response}") #
 
@@ -220,31 +567,18 @@ REASON: [one sentence explanation]""" #
                 confidence_score = 70 #
                 ai_reason = "No clear scam indicators found" #
 
-        if confidence_score >= 85:
-            confidence_level = "VERY_HIGH"
-        elif confidence_score >= 75:
-            confidence_level = "HIGH"
-        elif confidence_score >= 65:
-            confidence_level = "MEDIUM"
-        else:
-            confidence_level = "LOW" #
-
-        if classification == "SCAM":
-            risk_score = min(0.9, confidence_score / 100.0) #
-        else:
-            risk_score = max(0.05, (100 - confidence_score) / 200.0) #
-
-        return {
-            "classification": classification,
-            "confidence": confidence_level,
-            "confidence_score": confidence_score,
-            "reason": ai_reason,
-            "risk_score": round(risk_score, 3),
-            "detection_method": "LLM",
-            "model_used": OLLAMA_MODEL,
-            "processing_time": "< 2s" # This is a static placeholder from original code
-        } #
+        result = build_llm_result(classification, confidence_score, ai_reason, backend.model, llm_seconds)
+        metrics.record_stage('parse', time.perf_counter() - parse_start)
+        if cache_key is not None:
+            if backend.model != model: # Failed over to another model: its verdict must not answer for this one
+                cache_key = make_cache_key(sms_text, sender_number, backend.model)
+            with metrics.stage('cache_store'):
+                verdict_cache.put(cache_key, result) # Only LLM verdicts are cached, never fallbacks
+                template_index.add(sms_text, sender_number, backend.model, result)
+        return result
 
+    except LoadShed as shed:
+        return shed_to_fallback(sms_text, sender_number, shed)
     except requests.exceptions.ConnectionError:
         logger.error("❌ Ollama connection failed - is Ollama running?") #
         return analyze_with_fallback_rules(sms_text, sender_number, "OLLAMA_OFFLINE")
@@ -255,29 +589,158 @@ REASON: [one sentence explanation]""" #
         logger.error(f"💥 Unexpected error: {e}") #
         return analyze_with_fallback_rules(sms_text, sender_number, "ERROR")
 
-def analyze_with_fallback_rules(sms_text, sender_number, error_type): # Mostly unchanged
+def llm_read_timeout(limit=OLLAMA_READ_TIMEOUT):
+    """Read timeout for a generation: the time left until this thread's deadline, within [ADMISSION_MIN_READ_TIMEOUT, limit]."""
+    remaining = admission.remaining()
+    if remaining is None:
+        return limit
+    return min(limit, max(ADMISSION_MIN_READ_TIMEOUT, remaining))
+
+def shed_to_fallback(sms_text, sender_number, shed):
+    """Rule-based verdict for an LLM call that admission control turned away."""
+    load_shed_total.inc(shed.priority, shed.reason)
+    logger.warning(f"🚦 Shed {shed.priority} LLM call ({shed.reason}), using fallback rules")
+    result = analyze_with_fallback_rules(sms_text, sender_number, "LOAD_SHED")
+    result["degradation"] = shed.reason
+    return result
+
+def request_deadline_seconds(data, default_seconds):
+    """Seconds a request (or each /batch item) may take; "deadline_seconds" can only shorten the default."""
+    seconds = default_seconds
+    if isinstance(data, dict) and data.get("deadline_seconds") is not None:
+        try:
+            seconds = min(default_seconds, max(0.0, float(data["deadline_seconds"])))
+        except (TypeError, ValueError):
+            pass
+    return seconds
+
+def request_deadline(data, default_seconds):
+    """Absolute deadline (time.monotonic()) for a request, see request_deadline_seconds."""
+    return time.monotonic() + request_deadline_seconds(data, default_seconds)
+
+def build_llm_result(classification, confidence_score, reason, model, llm_seconds):
+    if classification == "SCAM":
+        risk_score = min(0.9, confidence_score / 100.0) #
+    else:
+        risk_score = max(0.05, (100 - confidence_score) / 200.0) #
+
+    return {
+        "classification": classification,
+        "confidence": get_confidence_level(confidence_score),
+        "confidence_score": confidence_score,
+        "reason": reason,
+        "risk_score": round(risk_score, 3),
+        "detection_method": "LLM",
+        "model_used": model,
+        "processing_time": f"{llm_seconds:.2f}s" # Measured LLM round trip
+    } #
+
+def classify_packed_with_ollama(items):
     """
-    Rule-based fallback when AI is unavailable - more conservative approach
+    Classifies several (sms_text, sender_number) pairs in one generation: the guidelines are
+    sent once, followed by the numbered messages, and Ollama's structured output (format)
+    returns one JSON verdict per number. Items whose verdict is missing or malformed, or
+    the whole pack if the generation fails, go through classify_sms_with_ollama instead.
+    Returns the verdicts in item order.
     """
-    logger.info(f"🔄 Using fallback rules due to: {error_type}") #
-    
-    text_lower = sms_text.lower() #
-    
-    urgent_threats = ["urgent", "suspended", "closed", "blocked", "expired"] #
-    action_demands = ["click here", "verify now", "act now", "immediate", "within 24"] #
-    sensitive_requests = ["ssn", "social security", "password", "pin", "bank account", "routing"] #
-    impersonation = ["irs", "government", "police", "fbi", "court"] #
-    
-    legitimate_senders = ["amazon", "fedex", "ups", "usps", "cvs", "walgreens", "google", "apple"] #
-    legitimate_content = ["delivered", "shipped", "prescription ready", "appointment", "verification code", "otp"] #
+    numbered = "\n\n".join(f'[{n}] From: {sender}\nMessage: "{text}"' for n, (text, sender) in enumerate(items, 1))
+    prompt = f"""You are a careful SMS security analyst. Your job is to identify CLEAR scams while avoiding false alarms.
+
+{LLM_GUIDELINES}
+
+ANALYZE THESE {len(items)} MESSAGES INDEPENDENTLY:
+
+{numbered}
+
+Rules for your response:
+- Be conservative - only flag obvious scams
+- Consider the sender (known businesses vs random numbers)
+- Look for multiple red flags, not just one keyword
+
+Respond with JSON only: {{"verdicts": [{{"id": <message number>, "classification": "SCAM" or "LEGITIMATE", "confidence": <number 50-100>, "reason": "<one sentence explanation>"}}]}}, one verdict per message."""
+
+    payload = {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": False, # The JSON is only usable once complete
+        "format": PACKED_VERDICT_SCHEMA,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.1,
+            "top_p": 0.8,
+            "num_predict": BATCH_PACK_TOKENS_PER_MESSAGE * len(items) + 20,
+            "repeat_penalty": 1.1
+        }
+    }
+
+    logger.info(f"📦 Analyzing {len(items)} packed messages with {OLLAMA_MODEL}")
+    try:
+        with admission.slot() as queued_seconds:
+            metrics.record_stage('admission_wait', queued_seconds)
+            llm_start = time.perf_counter()
+            ollama_in_flight.inc()
+            try:
+                response_data, backend = ollama_router.generate(payload, lambda response: response.json(),
+                                                                read_timeout=llm_read_timeout(OLLAMA_READ_TIMEOUT * BATCH_PACK_TIMEOUT_FACTOR))
+            finally:
+                ollama_in_flight.dec()
+                metrics.record_stage('ollama_packed', time.perf_counter() - llm_start)
+    except LoadShed as shed:
+        return [shed_to_fallback(text, sender, shed) for text, sender in items]
+    except Exception as e:
+        ollama_generations_total.inc("error")
+        logger.error(f"💥 Packed generation failed ({type(e).__name__}), classifying {len(items)} messages one by one")
+        return [classify_sms_with_ollama(text, sender) for text, sender in items]
+    llm_seconds = time.perf_counter() - llm_start
+    ollama_generations_total.inc("packed")
+    record_ollama_stats(response_data)
+
+    try:
+        packed_verdicts = json.loads(response_data.get("response", "")).get("verdicts", [])
+        if not isinstance(packed_verdicts, list):
+            raise TypeError("verdicts is not a list")
+    except (ValueError, TypeError, AttributeError) as parse_error:
+        logger.warning(f"⚠️ Packed response parse error: {parse_error}")
+        packed_verdicts = []
+
+    verdicts = {}
+    for verdict in packed_verdicts: # A bad entry only costs its own message a retry
+        try:
+            classification = str(verdict.get("classification", "")).upper()
+            if classification in ("SCAM", "LEGITIMATE") and isinstance(verdict.get("reason"), str):
+                confidence_score = min(100, max(50, int(verdict["confidence"])))
+                verdicts[int(verdict["id"])] = (classification, confidence_score, verdict["reason"].strip())
+        except (ValueError, TypeError, KeyError, AttributeError) as parse_error:
+            logger.warning(f"⚠️ Skipping malformed packed verdict {str(verdict)[:80]}: {parse_error}")
+
+    results = []
+    for n, (text, sender) in enumerate(items, 1):
+        if n not in verdicts:
+            packed_items_total.inc("unparsed")
+            results.append(classify_sms_with_ollama(text, sender))
+            continue
+        packed_items_total.inc("parsed")
+        result = build_llm_result(*verdicts[n], backend.model, llm_seconds)
+        result["packed_with"] = len(items)
+        verdict_cache.put(make_cache_key(text, sender, backend.model), result) # Under the model that answered, as above
+        template_index.add(text, sender, backend.model, result)
+        results.append(result)
+    return results
+
+def evaluate_rules(sms_text, sender_number):
+    """
+    Scores an SMS with the keyword rules from FALLBACK_RULES_FILE, counted in a single compiled pass
+    Used both as a cascade tier and as the fallback when AI is unavailable
+    """
+    counts = fallback_rules.count(sms_text.lower(), sender_number.lower())
     
-    urgent_count = sum(1 for word in urgent_threats if word in text_lower) #
-    action_count = sum(1 for phrase in action_demands if phrase in text_lower) #
-    sensitive_count = sum(1 for word in sensitive_requests if word in text_lower) #
-    imperson_count = sum(1 for word in impersonation if word in text_lower) #
+    urgent_count = counts.get("urgent_threats", 0)
+    action_count = counts.get("action_demands", 0)
+    sensitive_count = counts.get("sensitive_requests", 0)
+    imperson_count = counts.get("impersonation", 0)
     
-    legit_sender = any(sender in sender_number.lower() for sender in legitimate_senders) #
-    legit_content_count = sum(1 for phrase in legitimate_content if phrase in text_lower) #
+    legit_sender = counts.get("legitimate_senders", 0) > 0
+    legit_content_count = counts.get("legitimate_content", 0)
     
     total_scam_indicators = urgent_count + action_count + sensitive_count + imperson_count #
     
@@ -302,26 +765,259 @@ def analyze_with_fallback_rules(sms_text, sender_number, error_type): # Mostly u
         reason = "No clear scam indicators found" #
         risk_score = 0.2 #
     
-    if confidence_score >= 85:
-        confidence_level = "VERY_HIGH"
-    elif confidence_score >= 75:
-        confidence_level = "HIGH"
-    elif confidence_score >= 65:
-        confidence_level = "MEDIUM"
-    else:
-        confidence_level = "LOW" #
-    
     return {
         "classification": classification,
-        "confidence": confidence_level,
+        "confidence": get_confidence_level(confidence_score),
         "confidence_score": confidence_score,
         "reason": reason,
         "risk_score": risk_score,
         "detection_method": "RULE_BASED",
-        "model_used": "Fallback Rules",
+        "model_used": "Fallback Rules"
+    } #
+
+def analyze_with_fallback_rules(sms_text, sender_number, error_type):
+    """
+    Rule-based fallback when AI is unavailable - more conservative approach
+    """
+    logger.info(f"🔄 Using fallback rules due to: {error_type}") #
+    fallbacks_total.labels(error_type).inc()
+    
+    start = time.perf_counter()
+    result = evaluate_rules(sms_text, sender_number)
+    metrics.record_stage('fallback', time.perf_counter() - start)
+    result.update({
         "error": error_type,
         "fallback_used": True
-    } #
+    })
+    return result
+
+def get_confidence_level(confidence_score):
+    if confidence_score >= 85:
+        return "VERY_HIGH"
+    elif confidence_score >= 75:
+        return "HIGH"
+    elif confidence_score >= 65:
+        return "MEDIUM"
+    return "LOW"
+
+def record_llm_latency(seconds):
+    with short_circuit_lock:
+        llm_latency["calls"] += 1
+        if llm_latency["calls"] == 1:
+            llm_latency["ewma_seconds"] = seconds
+        else:
+            llm_latency["ewma_seconds"] += LLM_LATENCY_SMOOTHING * (seconds - llm_latency["ewma_seconds"])
+
+def short_circuit_watchlisted(sms_text, sender_number, want_llm_reason=False):
+    """
+    Fixed SCAM/95 verdict for a watchlisted sender, returned without calling the LLM.
+    With want_llm_reason the LLM assessment is queued in the background instead.
+    """
+    with short_circuit_lock:
+        short_circuit_stats["watchlist_hits"] += 1
+    result = {
+        "classification": "SCAM",
+        "confidence": "VERY_HIGH",
+        "confidence_score": 95,
+        "reason": "Sender number is on the suspicious numbers watchlist",
+        "risk_score": 0.95,
+        "detection_method": "WATCHLIST_OVERRIDE",
+        "model_used": "Watchlist",
+        "decision_tier": "WATCHLIST"
+    }
+    if want_llm_reason:
+        result.update({"llm_reason_id": request_async_llm_reason(sms_text, sender_number), "llm_reason_status": "pending"})
+    return result
+
+def request_async_llm_reason(sms_text, sender_number):
+    """Queues an LLM assessment for later retrieval via GET /analysis/<id>. Returns the id."""
+    reason_id = uuid.uuid4().hex
+    with async_reason_lock:
+        async_reason_results[reason_id] = {"status": "pending", "created": datetime.now().isoformat()}
+        while len(async_reason_results) > ASYNC_REASON_MAX_RESULTS:
+            async_reason_results.popitem(last=False)
+    with short_circuit_lock:
+        short_circuit_stats["async_reasons_requested"] += 1
+
+    def run():
+        try:
+            with admission.context("background"): # Queued behind every request that is waiting for an answer
+                assessment = classify_sms_with_ollama(sms_text, sender_number)
+            update = {"status": "done", "llm_assessment": assessment}
+        except Exception as e:
+            logger.error(f"💥 Background LLM reason failed: {e}")
+            update = {"status": "error"}
+        with async_reason_lock:
+            if reason_id in async_reason_results:
+                async_reason_results[reason_id].update(update)
+
+    async_reason_executor.submit(run)
+    return reason_id
+
+def watchlist_short_circuit_stats():
+    """Watchlist hits answered without the LLM, and the LLM time that saved (estimated)."""
+    with short_circuit_lock:
+        hits = short_circuit_stats["watchlist_hits"]
+        return {
+            "watchlist_hits": hits,
+            "async_reasons_requested": short_circuit_stats["async_reasons_requested"],
+            "avg_llm_seconds": round(llm_latency["ewma_seconds"], 3),
+            "estimated_llm_seconds_saved": round(hits * llm_latency["ewma_seconds"], 1)
+        }
+
+def wants_llm_reason(data):
+    value = data.get("llm_reason", WATCHLIST_ASYNC_LLM_REASON) if isinstance(data, dict) else WATCHLIST_ASYNC_LLM_REASON
+    return value is True or str(value).lower() in ("true", "1", "yes")
+
+def classify_with_cascade(sms_text, sender_number, watchlist_status=None, want_llm_reason=False, defer_llm=False):
+    """
+    Tiered classification: watchlist -> compiled rules -> local classifier -> LLM
+    The result's decision_tier says which tier decided
+    With defer_llm, returns None instead of calling the LLM on a cache miss (packed /batch)
+    """
+    result = classify_without_llm(sms_text, sender_number, watchlist_status, want_llm_reason)
+    if result is not None:
+        return result
+
+    # Tier 4: uncertain messages go to the LLM
+    return classify_llm_tier(sms_text, sender_number, defer_llm)
+
+def classify_without_llm(sms_text, sender_number, watchlist_status=None, want_llm_reason=False):
+    """
+    The cascade tiers before the LLM (watchlist, domain blocklist, rules, local classifier)
+    Returns None when none of them is confident; no cache, network or disk access
+    """
+    # Tier 1: known-bad sender, the verdict is fixed whatever the content
+    if watchlist_status is None:
+        watchlist_status = check_sender_watchlist(sender_number)
+    if watchlist_status == "on_watchlist":
+        return record_decision(short_circuit_watchlisted(sms_text, sender_number, want_llm_reason))
+
+    # Tier 1b: links to blocklisted domains
+    links = check_links(sms_text)
+    if links is not None and links["blocked"]:
+        return record_decision(blocked_link_result(links))
+
+    if not CASCADE_ENABLED:
+        return None
+
+    # Tier 2: compiled rules, trusted only for strong scam patterns
+    with metrics.stage('rules'):
+        rules_result = evaluate_rules(sms_text, sender_number)
+    if rules_result["classification"] == "SCAM" and rules_result["confidence_score"] >= CASCADE_RULES_MIN_SCAM_SCORE:
+        rules_result["decision_tier"] = "RULES"
+        return record_decision(rules_result)
+
+    # Tier 3: local classifier, decides outside the uncertainty band
+    if local_classifier is not None:
+        with metrics.stage('local_model'):
+            scam_probability = local_classifier.scam_probability(sms_text, sender_number)
+        low, high = LOCAL_MODEL_UNCERTAIN_BAND
+        if scam_probability <= low or scam_probability >= high:
+            return record_decision(local_model_result(scam_probability, high))
+    return None
+
+link_checks = threading.local() # .last = (text, trie, links) of this thread's latest check
+
+def check_links(sms_text):
+    """
+    Link hosts of a message grouped by domain list (see DomainLists.check), or None without links.
+    The cascade asks about the same message at several tiers, so a thread's repeated checks of
+    one text against the same lists reuse the first result (and count its links once).
+    """
+    trie = domain_lists.trie
+    last = getattr(link_checks, 'last', None)
+    if last is not None and last[1] is trie and last[0] == sms_text:
+        return last[2]
+    with metrics.stage('links'):
+        links = domain_lists.check(sms_text)
+    if links is not None:
+        for name in ("blocked", "allowlisted", "shortened", "unlisted"):
+            if links[name]:
+                link_domains_total.inc(name, amount=len(links[name]))
+    link_checks.last = (sms_text, trie, links)
+    return links
+
+def blocked_link_result(links):
+    host = links["blocked"][0]
+    return {
+        "classification": "SCAM",
+        "confidence": get_confidence_level(DOMAIN_BLOCKLIST_CONFIDENCE),
+        "confidence_score": DOMAIN_BLOCKLIST_CONFIDENCE,
+        "reason": f"Links to blocklisted domain {host}",
+        "risk_score": round(min(0.9, DOMAIN_BLOCKLIST_CONFIDENCE / 100.0), 3),
+        "detection_method": "RULE_BASED",
+        "decision_tier": "DOMAIN_BLOCKLIST",
+        "links": links
+    }
+
+def link_priority(sms_text):
+    """Admission context one class lower when every link in the message is on the allowlist, else a no-op."""
+    links = check_links(sms_text)
+    if links is None or len(links["allowlisted"]) != len(links["domains"]):
+        return nullcontext()
+    priority, deadline = admission.current()
+    return admission.context(LINK_DEMOTED_PRIORITY.get(priority, priority), deadline)
+
+def local_model_result(scam_probability, threshold):
+    is_scam = scam_probability >= threshold
+    confidence_score = int(round(50 + 50 * (scam_probability if is_scam else 1 - scam_probability)))
+    return {
+        "classification": "SCAM" if is_scam else "LEGITIMATE",
+        "confidence": get_confidence_level(confidence_score),
+        "confidence_score": confidence_score,
+        "reason": f"Local classifier scam probability {scam_probability:.2f}",
+        "risk_score": round(scam_probability, 3),
+        "detection_method": "LOCAL_MODEL",
+        "model_used": "Hashed n-gram classifier",
+        "decision_tier": "LOCAL_MODEL"
+    }
+
+def known_scam_result(sms_text):
+    """Verdict for a message whose text was already logged as a high-confidence scam, or None."""
+    if scam_store is None or not SCAM_STORE_KNOWN_CONTENT:
+        return None
+    try:
+        with metrics.stage('known_scam'):
+            known = scam_store.known_scam(sms_text, SCAM_STORE_KNOWN_MIN_HITS)
+    except Exception as e:
+        logger.warning(f"⚠️ Known scam lookup failed: {e}")
+        return None
+    if known is None:
+        return None
+    confidence_score = known["confidence_score"]
+    return {
+        "classification": known["classification"],
+        "confidence": get_confidence_level(confidence_score),
+        "confidence_score": confidence_score,
+        "reason": known["reason"],
+        "risk_score": round(min(0.9, confidence_score / 100.0), 3),
+        "detection_method": known["detection_method"],
+        "decision_tier": "KNOWN_SCAM",
+        "known_scam": {"hits": known["hits"], "first_seen": known["first_seen"], "last_seen": known["last_seen"]}
+    }
+
+def classify_llm_tier(sms_text, sender_number, defer_llm=False):
+    known = known_scam_result(sms_text)
+    if known is not None:
+        return record_decision(known)
+    if defer_llm:
+        _, result = lookup_cached_verdict(sms_text, sender_number)
+        if result is None:
+            return None # The caller classifies it in a packed generation
+    else:
+        with link_priority(sms_text):
+            result = classify_sms_with_ollama(sms_text, sender_number)
+    return record_llm_decision(result)
+
+def record_llm_decision(result):
+    if result.get("decision_tier") != "DOMAIN_BLOCKLIST":
+        result["decision_tier"] = "FALLBACK" if result.get("fallback_used") else "LLM"
+    return record_decision(result)
+
+def record_decision(result):
+    decisions_total.inc(result.get("decision_tier") or "UNKNOWN")
+    return result
 
 def get_alert_level(classification, confidence_score): # Unchanged
     """Determines alert level for UI"""
@@ -338,57 +1034,187 @@ def get_alert_level(classification, confidence_score): # Unchanged
 app = Flask(__name__)
 CORS(app)
 
-@app.route('/health', methods=['GET']) # Unchanged
+@app.before_request
+def start_ollama_prober_lazily():
+    start_ollama_prober() # For servers that import the app without running __main__ or serve.py; a no-op once started
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_start = time.perf_counter()
+    requests_in_flight.inc(g.metrics_endpoint)
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if "metrics_start" in g:
+        requests_in_flight.dec(g.metrics_endpoint)
+        request_seconds.observe(time.perf_counter() - g.metrics_start, g.metrics_endpoint)
+
+def update_state_gauges():
+    """Copies component stats into gauges right before a scrape."""
+    components = {
+        "verdict_cache": verdict_cache.stats(),
+        "template_index": template_index.stats(),
+        "watchlist": watchlist.stats(),
+        "scam_log": scam_log.stats(),
+        "watchlist_short_circuit": watchlist_short_circuit_stats(),
+        "single_flight": llm_single_flight.stats(),
+        "admission": admission.stats(),
+        "content_verdicts": content_verdicts.stats()
+    }
+    for priority, depth in components["admission"]["queued"].items():
+        state_gauge.set(depth, "admission", f"queued_{priority}")
+    for backend in ollama_router.stats():
+        for field in ("outstanding", "requests", "failures", "consecutive_failures"):
+            ollama_backend_gauge.set(backend[field], backend["url"], field)
+        ollama_backend_gauge.set(int(backend["state"] != "CLOSED"), backend["url"], "circuit_open")
+        ollama_backend_gauge.set(int(backend["probe_status"] == "CONNECTED"), backend["url"], "up")
+        if backend["probe_seconds"] is not None:
+            ollama_backend_gauge.set(backend["probe_seconds"], backend["url"], "probe_seconds")
+    for component, stats in components.items():
+        for field, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                state_gauge.set(value, component, field)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus text exposition of the stage histograms, counters and gauges"""
+    update_state_gauges()
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slow', methods=['GET'])
+def slow_requests():
+    """Per-stage breakdown of the most recent messages slower than METRICS_SLOW_REQUEST_SECONDS"""
+    return jsonify({
+        "threshold_seconds": metrics.slow_threshold_seconds,
+        "samples": metrics.slow_samples()
+    })
+
+@app.route('/health', methods=['GET'])
 def health_check():
-    """Enhanced health check with model testing"""
-    try:
-        test_payload = {
-            "model": OLLAMA_MODEL,
-            "prompt": "Test: respond with OK",
-            "stream": False,
-            "options": {"num_predict": 10}
-        } #
-        
-        response = requests.post(OLLAMA_API_URL, json=test_payload, timeout=50) #
-        ollama_status = "CONNECTED" if response.status_code == 200 else "ERROR" #
-        ollama_response_time = response.elapsed.total_seconds() #
-        
-    except:
-        ollama_status = "OFFLINE" #
-        ollama_response_time = 0 #
+    """Health check answered from the background prober's last results, never waits on Ollama"""
+    ollama_status, ollama_response_time = ollama_router.health()
     
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
+        "worker": {"pid": os.getpid(), "server_workers": SERVER_WORKERS}, # Stats below are this worker process's
         "ollama_status": ollama_status,
         "current_model": OLLAMA_MODEL,
         "response_time_seconds": ollama_response_time,
         "recommended_models": RECOMMENDED_MODELS,
-        "endpoints": ["/analyze", "/batch", "/test", "/models"],
-        "detection_methods": ["LLM", "RULE_BASED"]
+        "endpoints": ["/analyze", "/batch", "/batch/stream", "/analysis/<id>", "/test", "/models", "/templates", "/scams", "/scams/summary", "/metrics", "/metrics/slow"],
+        "detection_methods": ["LLM", "RULE_BASED", "LOCAL_MODEL", "WATCHLIST_OVERRIDE"],
+        "cascade_enabled": CASCADE_ENABLED,
+        "local_model_loaded": local_classifier is not None,
+        "watchlist": watchlist.stats(),
+        "watchlist_short_circuit": watchlist_short_circuit_stats(),
+        "domain_lists": domain_lists.stats(),
+        "scam_log": scam_log.stats(),
+        "scam_store": scam_store.stats() if scam_store else None,
+        "ollama_router": dict(ollama_router.settings(), probe_seconds=OLLAMA_PROBE_SECONDS, keep_alive=OLLAMA_KEEP_ALIVE),
+        "ollama_backends": ollama_router.stats(),
+        "verdict_cache": verdict_cache.stats(),
+        "template_index": template_index.stats(),
+        "single_flight": llm_single_flight.stats(),
+        "admission": admission.stats(),
+        "content_verdicts": content_verdicts.stats()
     }) #
 
-@app.route('/models', methods=['GET']) # Unchanged
+@app.route('/models', methods=['GET'])
 def list_models():
     """Get available Ollama models"""
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=20) #
-        if response.status_code == 200:
-            models = response.json().get("models", []) #
-            return jsonify({
-                "available_models": [model["name"] for model in models],
-                "current_model": OLLAMA_MODEL,
-                "recommended": RECOMMENDED_MODELS
-            }) #
-    except:
-        pass #
+    backends = ollama_router.tags()
+    reachable = [backend for backend in backends if "available_models" in backend]
+    if reachable:
+        return jsonify({
+            "available_models": list(dict.fromkeys(m for backend in reachable for m in backend["available_models"])),
+            "current_model": OLLAMA_MODEL,
+            "backend_models": ollama_router.models,
+            "backends": backends,
+            "recommended": RECOMMENDED_MODELS
+        }) #
     
     return jsonify({
         "error": "Could not fetch models - ensure Ollama is running",
         "current_model": OLLAMA_MODEL,
+        "backends": backends,
         "recommended": RECOMMENDED_MODELS
     }) #
 
+@app.route('/templates', methods=['GET'])
+def template_stats():
+    """Template cluster statistics and the most reused clusters"""
+    try:
+        limit = max(1, min(500, int(request.args.get('limit', 20))))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    return jsonify({
+        "stats": template_index.stats(),
+        "top_clusters": template_index.top_clusters(limit)
+    })
+
+def scam_query_filters(args):
+    """Filters for /scams and /scams/summary from the query string; raises ValueError on bad times."""
+    return {
+        "sender": args.get('sender'),
+        "message": args.get('message'),
+        "text": args.get('q'),
+        "since": parse_time(args['since']) if args.get('since') else None,
+        "until": parse_time(args['until']) if args.get('until') else None,
+        "classification": args.get('classification')
+    }
+
+@app.route('/scams', methods=['GET'])
+def query_scam_events():
+    """Logged high-confidence scams, newest first (?sender, ?message, ?q, ?since, ?until, ?limit, ?cursor)"""
+    if scam_store is None:
+        return jsonify({"error": "The scam store is disabled (SCAM_LOG_FORMAT is not 'sqlite')"}), 404
+    try:
+        limit = max(1, min(SCAM_STORE_QUERY_MAX_LIMIT, int(request.args.get('limit', 50))))
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+        filters = scam_query_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(scam_store.query(limit, cursor, **filters))
+
+@app.route('/scams/summary', methods=['GET'])
+def summarize_scam_events():
+    """Event count, distinct senders and first/last time for the /scams filters"""
+    if scam_store is None:
+        return jsonify({"error": "The scam store is disabled (SCAM_LOG_FORMAT is not 'sqlite')"}), 404
+    try:
+        filters = scam_query_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(scam_store.summary(**filters))
+
+@app.route('/scams/known', methods=['DELETE'])
+def forget_known_scam():
+    """Stops answering a message text as a known scam; body {"message": "..."}"""
+    if scam_store is None:
+        return jsonify({"error": "The scam store is disabled (SCAM_LOG_FORMAT is not 'sqlite')"}), 404
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('message'), str):
+        return jsonify({"error": "Invalid request. 'message' is required."}), 400
+    forgotten = scam_store.forget_known(data['message'])
+    if forgotten:
+        content_verdicts.clear() # Hashes of this text (any sender) must not be answered from before
+    logger.info(f"🗑️ Known scam {'forgotten' if forgotten else 'not found'}: {data['message'][:50]}...")
+    return jsonify({"forgotten": forgotten})
+
+@app.route('/analysis/<reason_id>', methods=['GET'])
+def get_async_llm_reason(reason_id):
+    """Background LLM assessment requested for a watchlisted sender ("llm_reason": true)"""
+    with async_reason_lock:
+        entry = async_reason_results.get(reason_id)
+        entry = dict(entry) if entry is not None else None
+    if entry is None:
+        return jsonify({"error": "Unknown or expired llm_reason_id"}), 404
+    entry["llm_reason_id"] = reason_id
+    return jsonify(entry)
+
 @app.route('/analyze', methods=['POST'])
 def analyze_sms():
     """Main SMS analysis endpoint - MODIFIED"""
@@ -405,41 +1231,31 @@ def analyze_sms():
         
         start_time = datetime.now()
 
-        # First check if sender is on watchlist
-        watchlist_status = check_sender_watchlist(sender_id)
+        with metrics.trace("analyze", sender=sender_id, message_length=len(message_content)):
+            # First check if sender is on watchlist
+            watchlist_status = check_sender_watchlist(sender_id)
         
-        # Core analysis result from LLM or fallback
-        core_analysis_result = classify_sms_with_ollama(message_content, sender_id)
-        processing_time = (datetime.now() - start_time).total_seconds()
+            # Core analysis result from the tiered cascade (watchlist, rules, local model, LLM or fallback)
+            with admission.context("interactive", request_deadline(data, ADMISSION_INTERACTIVE_DEADLINE_SECONDS)):
+                core_analysis_result = classify_with_cascade(message_content, sender_id, watchlist_status, wants_llm_reason(data))
+            processing_time = (datetime.now() - start_time).total_seconds()
         
-        # Create the final result object to be sent to client
-        final_result = core_analysis_result.copy()
+            # Create the final result object to be sent to client
+            final_result = core_analysis_result.copy()
 
-        # Enhancement: Override analysis if sender is on watchlist
-        if watchlist_status == "on_watchlist":
-            # Override the classification to be a high confidence scam
+            # Add sender watchlist status and other metadata
             final_result.update({
-                "classification": "SCAM",
-                "confidence": "VERY_HIGH",
-                "confidence_score": 95,
-                "reason": f"Sender number is on the suspicious numbers watchlist. Original assessment: {core_analysis_result['reason']}",
-                "risk_score": 0.95,
-                "detection_method": "WATCHLIST_OVERRIDE"
+                "sender": sender_id,
+                "sender_watchlist_status": watchlist_status,
+                "message_preview": message_content[:50] + "..." if len(message_content) > 50 else message_content,
+                "alert_level": get_alert_level(final_result["classification"], final_result["confidence_score"]),
+                "processing_time_seconds": round(processing_time, 2),
+                "timestamp": datetime.now().isoformat()
             })
-
-        # Add sender watchlist status and other metadata
-        final_result.update({
-            "sender": sender_id,
-            "sender_watchlist_status": watchlist_status,
-            "message_preview": message_content[:50] + "..." if len(message_content) > 50 else message_content,
-            "alert_level": get_alert_level(final_result["classification"], final_result["confidence_score"]),
-            "processing_time_seconds": round(processing_time, 2),
-            "timestamp": datetime.now().isoformat()
-        })
         
-        # Log high-confidence scams (will now include watchlisted numbers automatically due to confidence override)
-        if final_result.get("alert_level") == "HIGH":
-            log_high_confidence_scam(sender_id, message_content, core_analysis_result)
+            # Log high-confidence scams (will now include watchlisted numbers automatically due to confidence override)
+            if final_result.get("alert_level") == "HIGH":
+                log_high_confidence_scam(sender_id, message_content, core_analysis_result)
             
         logger.info(f"✅ Result for {sender_id}: {final_result['classification']} ({final_result['confidence']}), Watchlist: {final_result['sender_watchlist_status']}")
         return jsonify(final_result)
@@ -452,126 +1268,474 @@ def analyze_sms():
             "detection_method": "ERROR_HANDLER"
         }), 500
 
+def analyze_batch_item(msg, want_llm_reason=False, deadline_seconds=None):
+    """
+    Analyzes a single /batch entry. Returns None for invalid entries.
+    Runs on the batch worker pool, so a failure only falls back to rules for this item.
+    want_llm_reason is the batch-wide opt-in; an entry can also set "llm_reason" itself.
+    deadline_seconds is the item's admission deadline, counted from when a worker starts it,
+    so items queued behind the rest of a large batch get the same time as the first ones.
+    """
+    entry = parse_batch_entry(msg)
+    if entry is None:
+        return None
+    msg_id, sender, message = entry
+
+    with metrics.trace("batch_item", id=msg_id, sender=sender, message_length=len(message)):
+        watchlist_status = "none"
+        analysis_start_time = datetime.now()
+        try:
+            # --- Enhancement 1: Watchlist Check (first cascade tier) ---
+            watchlist_status = check_sender_watchlist(sender)
+
+            # --- Core Analysis ---
+            deadline = None if deadline_seconds is None else time.monotonic() + deadline_seconds
+            with admission.context("batch", deadline):
+                analysis_result = classify_with_cascade(message, sender, watchlist_status, want_llm_reason or wants_llm_reason(msg))
+        except Exception as e:
+            logger.error(f"💥 Batch item {msg_id} failed: {e}")
+            analysis_result = analyze_with_fallback_rules(message, sender, "ERROR")
+            analysis_result["decision_tier"] = "FALLBACK"
+        analysis_end_time = datetime.now()
+
+        # --- Log high-confidence scams ---
+        if analysis_result['classification'] == "SCAM" and analysis_result['confidence_score'] >= 85:
+            log_high_confidence_scam(sender, message, analysis_result)
+
+    return build_batch_result(msg_id, sender, message, watchlist_status, analysis_result,
+                              (analysis_end_time - analysis_start_time).total_seconds())
+
+def parse_batch_entry(msg):
+    """Returns (id, sender, message) for a valid /batch entry, else None."""
+    if not isinstance(msg, dict):
+        return None
+
+    msg_id = msg.get('id')
+    sender = msg.get('sender')
+    message = msg.get('message')
+
+    if not all([msg_id is not None, sender, message]) or not isinstance(sender, str) or not isinstance(message, str):
+        # Skip invalid message entries in batch
+        return None
+    return msg_id, sender, message
+
+def build_batch_result(msg_id, sender, message, watchlist_status, analysis_result, processing_time):
+    # --- Alert Level ---
+    alert_level = get_alert_level(analysis_result['classification'], analysis_result['confidence_score'])
+
+    # --- Final Assembly ---
+    final_result = {
+        "id": msg_id,
+        "sender": sender,
+        "message_content": message, # Return full message content
+        "classification": analysis_result.get('classification', 'ERROR'),
+        "confidence": analysis_result.get('confidence', 'NONE'),
+        "confidence_score": analysis_result.get('confidence_score', 0),
+        "reason": analysis_result.get('reason'),
+        "risk_score": analysis_result.get('risk_score', 0.0),
+        "detection_method": analysis_result.get('detection_method', 'ERROR'),
+        "decision_tier": analysis_result.get('decision_tier'),
+        "alert_level": alert_level,
+        "sender_watchlist_status": watchlist_status,
+        "processing_time_seconds": processing_time,
+        "timestamp": datetime.now().isoformat()
+    }
+    if "llm_reason_id" in analysis_result:
+        final_result["llm_reason_id"] = analysis_result["llm_reason_id"]
+        final_result["llm_reason_status"] = analysis_result["llm_reason_status"]
+    if "degradation" in analysis_result:
+        final_result["error"] = analysis_result["error"]
+        final_result["degradation"] = analysis_result["degradation"]
+    return final_result
+
+def analyze_batch_packed(messages, want_llm_reason=False, deadline_seconds=None):
+    """
+    Packed /batch: every entry first goes through the cascade up to the LLM tier on the batch
+    pool; entries still undecided are classified BATCH_PACK_SIZE at a time in one generation.
+    """
+    entries = [parse_batch_entry(msg) for msg in messages]
+    start = time.perf_counter()
+
+    def first_pass(i):
+        if entries[i] is None:
+            return None
+        msg_id, sender, message = entries[i]
+        watchlist_status = "none"
+        try:
+            watchlist_status = check_sender_watchlist(sender)
+            result = classify_with_cascade(message, sender, watchlist_status, want_llm_reason or wants_llm_reason(messages[i]), defer_llm=True)
+        except Exception as e:
+            logger.error(f"💥 Batch item {msg_id} failed: {e}")
+            result = analyze_with_fallback_rules(message, sender, "ERROR")
+            result["decision_tier"] = "FALLBACK"
+        return [watchlist_status, result]
+
+    decided = list(batch_executor.map(first_pass, range(len(entries))))
+    pending = [i for i, item in enumerate(decided) if item is not None and item[1] is None]
+    packs = [pending[j:j + BATCH_PACK_SIZE] for j in range(0, len(pending), BATCH_PACK_SIZE)]
+
+    def run_pack(pack):
+        deadline = None if deadline_seconds is None else time.monotonic() + deadline_seconds # Per pack, like per item
+        with admission.context("batch", deadline):
+            verdicts = classify_packed_with_ollama([(entries[i][2], entries[i][1]) for i in pack])
+        for i, verdict in zip(pack, verdicts):
+            decided[i][1] = record_llm_decision(verdict)
+
+    list(batch_executor.map(run_pack, packs))
+    processing_time = time.perf_counter() - start # Items share their packs, so the batch time is reported for each
+
+    results = []
+    for entry, item in zip(entries, decided):
+        if entry is None:
+            continue
+        msg_id, sender, message = entry
+        watchlist_status, analysis_result = item
+        if analysis_result['classification'] == "SCAM" and analysis_result['confidence_score'] >= 85:
+            log_high_confidence_scam(sender, message, analysis_result)
+        results.append(build_batch_result(msg_id, sender, message, watchlist_status, analysis_result, processing_time))
+    logger.info(f"📦 Packed {len(pending)} of {len(entries)} messages into {len(packs)} generations")
+    return results
+
+def wants_packed_batch(data):
+    value = data.get("packed", BATCH_PACKED_DEFAULT)
+    return value is True or str(value).lower() in ("true", "1", "yes")
+
+def wants_compact_batch(data):
+    value = data.get("compact", COMPACT_BATCH_DEFAULT)
+    return value is True or str(value).lower() in ("true", "1", "yes")
+
+def content_hash(sender, message):
+    """Hash a compact /batch client sends instead of the message: sha256 of sender + "\n" + message, hex."""
+    return hashlib.sha256(f"{sender}\n{message}".encode('utf-8')).hexdigest()
+
+def read_request_body():
+    """
+    Decodes the request body: JSON as usual, or gzip (Content-Encoding: gzip) and/or
+    MessagePack (Content-Type: application/msgpack). Raises ValueError for bodies it cannot decode.
+    """
+    encoding = request.headers.get('Content-Encoding', '').lower()
+    is_msgpack = request.mimetype in ('application/msgpack', 'application/x-msgpack')
+    if encoding in ('', 'identity') and not is_msgpack:
+        return request.get_json()
+    if encoding not in ('', 'identity', 'gzip'):
+        raise ValueError(f"Unsupported Content-Encoding '{encoding}'")
+
+    raw = request.get_data(cache=False)
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            raw = decompressor.decompress(raw, COMPACT_MAX_BODY_BYTES)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip body: {e}")
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Decompressed body exceeds {COMPACT_MAX_BODY_BYTES} bytes")
+    if not is_msgpack:
+        return json.loads(raw)
+    if msgpack is None:
+        raise ValueError("MessagePack bodies need the msgpack package on the server")
+    try:
+        return msgpack.unpackb(raw, raw=False)
+    except Exception as e:
+        raise ValueError(f"Invalid MessagePack body: {e}")
+
+def compact_response(payload):
+    """MessagePack when the client prefers it (and msgpack is installed), else compact JSON; gzip-compressed when accepted."""
+    if msgpack is not None and request.accept_mimetypes.best_match(['application/json', 'application/msgpack']) == 'application/msgpack':
+        body, mimetype = msgpack.packb(payload, use_bin_type=True), 'application/msgpack'
+    else:
+        body, mimetype = json.dumps(payload, separators=(',', ':')).encode('utf-8'), 'application/json'
+    response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if len(body) >= COMPACT_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, COMPACT_GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def compact_result(result):
+    return {key: value for key, value in result.items() if key not in COMPACT_DROPPED_FIELDS}
+
+def resolve_hashed_entry(msg):
+    """Compact result for a {"id", "sender", "hash"} entry, or None when the server has no verdict for the hash."""
+    msg_id, sender = msg['id'], msg['sender']
+    watchlist_status = check_sender_watchlist(sender)
+    if watchlist_status == "on_watchlist": # Decided by the sender alone, no body needed
+        compact_entries_total.inc("watchlist")
+        analysis_result = record_decision(short_circuit_watchlisted("", sender))
+        return compact_result(build_batch_result(msg_id, sender, "", watchlist_status, analysis_result, 0.0))
+
+    verdict = content_verdicts.get(str(msg['hash']).lower())
+    if verdict is None:
+        compact_entries_total.inc("hash_miss")
+        return None
+    # The body would now be decided differently when a link was blocklisted or the rules were reloaded since
+    if domain_lists.blocked_hosts(verdict.pop("link_hosts", [])) or verdict.pop("rules_mtime", None) != fallback_rules.file_mtime:
+        compact_entries_total.inc("hash_stale")
+        return None
+    compact_entries_total.inc("hash_hit")
+    verdict.update({"id": msg_id, "sender_watchlist_status": watchlist_status, "processing_time_seconds": 0.0, "cached": True})
+    return verdict
+
+def analyze_batch_compact(messages, want_llm_reason=False, deadline_seconds=None, packed=False):
+    """
+    Compact /batch: hash-only entries (no "message" key) are answered from content_verdicts
+    (or listed in need_body), entries with a message go through the regular or packed batch
+    path, and any other entry, including an empty message, gets {"id", "error"}.
+    Returns {"results": [...] in input order, "need_body": [ids]}.
+    """
+    resolved, need_body, bodies = {}, [], []
+    for position, msg in enumerate(messages):
+        if isinstance(msg, dict) and 'message' not in msg and msg.get('hash') and msg.get('id') is not None and isinstance(msg.get('sender'), str) and msg['sender']:
+            result = resolve_hashed_entry(msg)
+            if result is None:
+                need_body.append(msg['id'])
+            else:
+                resolved[position] = result
+        elif parse_batch_entry(msg) is not None:
+            bodies.append((position, msg))
+        else:
+            compact_entries_total.inc("invalid")
+            empty = isinstance(msg, dict) and msg.get('message') == ''
+            resolved[position] = {
+                "id": msg.get('id') if isinstance(msg, dict) else None,
+                "error": "Empty message" if empty else "Invalid entry. 'id' and string 'sender' and 'message' (or 'hash') are required."
+            }
+
+    body_messages = [msg for _, msg in bodies]
+    if packed:
+        analyzed = analyze_batch_packed(body_messages, want_llm_reason, deadline_seconds)
+    else:
+        analyzed = list(batch_executor.map(lambda msg: analyze_batch_item(msg, want_llm_reason, deadline_seconds), body_messages))
+    for (position, msg), result in zip(bodies, analyzed):
+        compact_entries_total.inc("body")
+        if result["decision_tier"] in COMPACT_CACHEABLE_TIERS:
+            content_verdicts.put(content_hash(msg['sender'], msg['message']),
+                                 dict(compact_result(result), link_hosts=extract_domains(msg['message']), rules_mtime=fallback_rules.file_mtime))
+        resolved[position] = compact_result(result)
+
+    return {"results": [resolved[position] for position in sorted(resolved)], "need_body": need_body}
+
 @app.route('/batch', methods=['POST'])
 def batch_analyze():
-    """Analyzes a batch of SMS messages."""
+    """Analyzes a batch of SMS messages concurrently on the batch worker pool."""
     start_time = datetime.now()
-    data = request.get_json()
+    try:
+        data = read_request_body()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     if not data or 'messages' not in data or not isinstance(data['messages'], list):
         return jsonify({"error": "Invalid request. 'messages' list is required."}), 400
 
-    results = []
     messages = data['messages']
+    want_llm_reason = wants_llm_reason(data)
+    deadline_seconds = request_deadline_seconds(data, ADMISSION_BATCH_DEADLINE_SECONDS)
 
-    for msg in messages:
-        msg_id = msg.get('id')
-        sender = msg.get('sender')
-        message = msg.get('message')
+    if wants_compact_batch(data):
+        compact = analyze_batch_compact(messages, want_llm_reason, deadline_seconds, wants_packed_batch(data))
+        logger.info(f"✅ Compact batch: {len(messages)} entries, {len(compact['need_body'])} bodies requested, "
+                    f"in {(datetime.now() - start_time).total_seconds():.2f} seconds.")
+        return compact_response(compact)
 
-        if not all([msg_id is not None, sender, message]):
-            # Skip invalid message entries in batch
-            continue
-
-        # --- Core Analysis ---
-        analysis_start_time = datetime.now()
-        analysis_result = classify_sms_with_ollama(message, sender)
-        analysis_end_time = datetime.now()
-        
-        # --- Enhancement 1: Watchlist Check ---
-        watchlist_status = check_sender_watchlist(sender)
-        
-        # Override classification if sender is on watchlist (high-confidence signal)
-        if watchlist_status == 'on_watchlist':
-            analysis_result['classification'] = "SCAM"
-            analysis_result['confidence_score'] = 95
-            analysis_result['confidence'] = "VERY_HIGH"
-            analysis_result['reason'] = "Sender is on the suspicious number watchlist. " + analysis_result.get('reason', '')
-            analysis_result['detection_method'] = "WATCHLIST_OVERRIDE"
-
-        # --- Log high-confidence scams ---
-        if analysis_result['classification'] == "SCAM" and analysis_result['confidence_score'] >= 85:
-            log_high_confidence_scam(sender, message, analysis_result)
-
-        # --- Alert Level ---
-        alert_level = get_alert_level(analysis_result['classification'], analysis_result['confidence_score'])
-
-        # --- Final Assembly ---
-        final_result = {
-            "id": msg_id,
-            "sender": sender,
-            "message_content": message, # Return full message content
-            "classification": analysis_result.get('classification', 'ERROR'),
-            "confidence": analysis_result.get('confidence', 'NONE'),
-            "confidence_score": analysis_result.get('confidence_score', 0),
-            "reason": analysis_result.get('reason'),
-            "risk_score": analysis_result.get('risk_score', 0.0),
-            "detection_method": analysis_result.get('detection_method', 'ERROR'),
-            "alert_level": alert_level,
-            "sender_watchlist_status": watchlist_status,
-            "processing_time_seconds": (analysis_end_time - analysis_start_time).total_seconds(),
-            "timestamp": datetime.now().isoformat()
-        }
-        results.append(final_result)
+    if wants_packed_batch(data):
+        results = analyze_batch_packed(messages, want_llm_reason, deadline_seconds)
+    else:
+        # map() yields results in input order, whatever order the items finish in
+        results = [result for result in batch_executor.map(lambda msg: analyze_batch_item(msg, want_llm_reason, deadline_seconds), messages) if result is not None]
 
     end_time = datetime.now()
     processing_time = (end_time - start_time).total_seconds()
-    logger.info(f"✅ Batch processed {len(messages)} messages in {processing_time:.2f} seconds.")
+    logger.info(f"✅ Batch processed {len(messages)} messages in {processing_time:.2f} seconds ({BATCH_MAX_WORKERS} workers).")
 
     return jsonify(results)
 
-@app.route('/test', methods=['GET']) # Modified to include watchlist status
+def analyze_stream_item(line_number, msg, deadline):
+    """Runs analyze_batch_item for one NDJSON line; invalid entries become an error line."""
+    result = analyze_batch_item(msg, deadline_seconds=deadline - time.monotonic())
+    if result is None:
+        return {"line": line_number, "error": "Invalid entry. 'id' and string 'sender' and 'message' are required."}
+    return result
+
+@app.route('/batch/stream', methods=['POST'])
+def batch_analyze_stream():
+    """
+    Streaming variant of /batch. The body is newline-delimited JSON, one
+    {"id", "sender", "message"} object per line. Each verdict is written as one NDJSON
+    line as soon as it is ready, so results arrive in completion order, not input order.
+    """
+    max_in_flight = BATCH_MAX_WORKERS * 2 # Stop reading input while this many items are pending
+
+    def generate():
+        start_time = datetime.now()
+        pending = {} # future -> (line number, entry id)
+        count = 0
+
+        def emit(done):
+            for future in done:
+                line_number, msg_id = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e: # One failed item must not cut off the rest of the stream
+                    logger.error(f"💥 Stream line {line_number} failed: {e}")
+                    result = {"id": msg_id, "line": line_number, "error": "Internal error while analyzing this entry"}
+                yield json.dumps(result) + "\n"
+
+        for line_number, line in enumerate(request.stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            count += 1
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                yield json.dumps({"line": line_number, "error": "Invalid JSON"}) + "\n"
+                continue
+
+            # Each line gets its own deadline from when it was read
+            future = batch_executor.submit(analyze_stream_item, line_number, msg, request_deadline(msg, ADMISSION_BATCH_DEADLINE_SECONDS))
+            pending[future] = (line_number, msg.get('id') if isinstance(msg, dict) else None)
+            yield from emit([f for f in pending if f.done()])
+            if len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from emit(done)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from emit(done)
+
+        processing_time = (datetime.now() - start_time).total_seconds()
+        logger.info(f"✅ Streamed batch of {count} messages in {processing_time:.2f} seconds.")
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def classify_for_evaluation(target, sms_text, sender_number):
+    """One message through an evaluation target: 'rules', 'local_model', 'cascade' or 'llm:<model>'."""
+    if target == "rules":
+        result = evaluate_rules(sms_text, sender_number)
+        result["decision_tier"] = "RULES"
+        return result
+    if target == "local_model":
+        return local_model_result(local_classifier.scam_probability(sms_text, sender_number), 0.5)
+    if target == "cascade":
+        return classify_with_cascade(sms_text, sender_number)
+    if target.startswith("llm:"):
+        # Uncached, so every case is generated, and only by the target's model: a report must not score another one
+        result = generate_llm_verdict(sms_text, sender_number, None, target[4:], cross_model_failover=False)
+        return record_llm_decision(result)
+    raise ValueError(f"Unknown evaluation target '{target}'")
+
+def evaluation_targets(models=None):
+    """The tiers plus one 'llm:<model>' target per model (default: the models the configured backends serve)."""
+    return list(EVALUATION_TIERS) + [f"llm:{model}" for model in (models or ollama_router.models)]
+
+def evaluation_state(target):
+    """Hash of what besides the dataset decides a target's verdicts: its rules, model, code and lists."""
+    code = [__file__, inspect.getsourcefile(FallbackRules)]
+    if target == "rules":
+        return state_hash(code + [FALLBACK_RULES_FILE])
+    if target == "local_model":
+        return state_hash(code + [LOCAL_MODEL_FILE, inspect.getsourcefile(HashedNgramClassifier)])
+    if target.startswith("llm:"):
+        return state_hash(code) # The prompt and the verdict parsing live in this file
+    files = code + [FALLBACK_RULES_FILE, LOCAL_MODEL_FILE, SUSPICIOUS_NUMBERS_FILE, WATCHLIST_BINARY_FILE, *domain_lists.paths.values()]
+    files += [inspect.getsourcefile(cls) for cls in (HashedNgramClassifier, Watchlist, DomainLists, TemplateIndex)]
+    return state_hash(files, {"model": OLLAMA_MODEL, "cascade": CASCADE_ENABLED, "rules_min_scam_score": CASCADE_RULES_MIN_SCAM_SCORE,
+                              "local_model_band": LOCAL_MODEL_UNCERTAIN_BAND, "local_model_loaded": local_classifier is not None})
+
+def evaluate_target(target, cases, workers=BATCH_MAX_WORKERS, refresh=False):
+    """
+    Report for one target over the cases: summary metrics plus per-case results.
+    Served from evaluation_cache unless refresh, while evaluation_state(target) is unchanged.
+    """
+    if target not in EVALUATION_TIERS and not target.startswith("llm:"):
+        raise ValueError(f"Unknown evaluation target '{target}' (use {', '.join(EVALUATION_TIERS)} or llm:<model>)")
+    if target == "local_model" and local_classifier is None:
+        raise ValueError(f"No local model loaded from {LOCAL_MODEL_FILE}; run train_local_classifier.py first")
+    if target.startswith("llm:") and not ollama_router.serves(target[4:]):
+        raise ValueError(f"No Ollama backend serves {target[4:]} (configured: {', '.join(ollama_router.models)})")
+    digest = dataset_hash(cases)
+    state = evaluation_state(target)
+    cache_name = f"{target}@{OLLAMA_MODEL}" if target == "cascade" else target
+    if not refresh:
+        report = evaluation_cache.get(cache_name, digest, state)
+        if report is not None:
+            report["cached"] = True
+            return report
+
+    tally = TokenTally() # Only this run's generations, not other requests' running at the same time
+
+    def classify(sms_text, sender):
+        with tally.active():
+            return classify_for_evaluation(target, sms_text, sender)
+
+    start = time.perf_counter()
+    rows = run_cases(cases, classify, workers)
+    wall_seconds = time.perf_counter() - start
+    uses_llm = target == "cascade" or target.startswith("llm:")
+    report = {
+        "target": target,
+        "model": OLLAMA_MODEL if target == "cascade" else (target[4:] if target.startswith("llm:") else None),
+        "dataset_hash": digest,
+        "state_hash": state,
+        "evaluated_at": datetime.now().isoformat(),
+        "summary": summarize(rows, wall_seconds, tally.tokens if uses_llm else None),
+        "results": rows
+    }
+    evaluation_cache.put(cache_name, digest, report, state)
+    report["cached"] = False
+    return report
+
+@app.route('/test', methods=['GET'])
 def test_examples():
-    """Test with diverse examples to check for over-classification"""
-    test_cases = [
-        {"message": "Your Amazon package will be delivered today by 8 PM", "sender": "Amazon", "expected": "LEGITIMATE"}, #
-        {"message": "Prescription ready for pickup at CVS Pharmacy", "sender": "CVS", "expected": "LEGITIMATE"}, #
-        {"message": "URGENT! Account suspended. Click bit.ly/verify123 to restore access NOW!", "sender": "+1234567890", "expected": "SCAM"}, #
-        {"message": "Congratulations! You won $5000! Reply with your SSN to claim prize", "sender": "Unknown", "expected": "SCAM"}, #
-        {"message": "IRS Notice: You owe $2000 in back taxes. Pay immediately or face arrest.", "sender": "+919876500001", "expected": "SCAM"}, # Example watchlist number
-        {"message": "Hi, this is Sarah from the dentist office confirming your appointment", "sender": "+5551234567", "expected": "LEGITIMATE"}, #
-    ]
-    
-    results_for_response = []
-    correct_count = 0 #
-    
-    for test in test_cases:
-        core_result = classify_sms_with_ollama(test["message"], test["sender"]) #
-        is_correct = core_result["classification"] == test["expected"] #
-        if is_correct:
-            correct_count += 1 #
-            
-        watchlist_status = check_sender_watchlist(test["sender"])
-
-        results_for_response.append({
-            "message": test["message"], #
-            "sender": test["sender"], #
-            "expected": test["expected"], #
-            "actual_classification": core_result["classification"], # Renamed from "actual"
-            "confidence": core_result["confidence_score"], #
-            "method": core_result["detection_method"], #
-            "correct": is_correct, #
-            "reason": core_result["reason"], #
-            "sender_watchlist_status": watchlist_status
-        })
-    
-    accuracy = (correct_count / len(test_cases)) * 100 if test_cases else 0 #
-    
+    """
+    Runs the labeled EVALUATION_DATASET_FILE against one target (?target=, default the
+    cascade) in parallel. Cached per dataset hash; ?refresh=true re-runs it.
+    """
+    target = request.args.get('target', 'cascade')
+    refresh = request.args.get('refresh', '').lower() in ("true", "1", "yes")
+    try:
+        cases = load_dataset(EVALUATION_DATASET_FILE)
+    except OSError as e:
+        return jsonify({"error": f"Could not read evaluation dataset {EVALUATION_DATASET_FILE}: {e}"}), 500
+    try:
+        with admission.context("batch"):
+            report = evaluate_target(target, cases, BATCH_MAX_WORKERS, refresh)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    summary = report["summary"]
     return jsonify({
-        "test_results": results_for_response,
-        "accuracy_percentage": round(accuracy, 1),
-        "total_tests": len(test_cases),
-        "correct_predictions": correct_count,
-        "model_used": OLLAMA_MODEL
+        "test_results": report["results"],
+        "accuracy_percentage": summary["accuracy_percentage"],
+        "total_tests": summary["total"],
+        "correct_predictions": summary["correct"],
+        "tier_mix": summary["tier_mix"],
+        "model_used": report["model"] or target,
+        "target": target,
+        "metrics": {key: value for key, value in summary.items() if key not in ("total", "correct", "tier_mix", "accuracy_percentage")},
+        "dataset": EVALUATION_DATASET_FILE,
+        "dataset_hash": report["dataset_hash"],
+        "evaluated_at": report["evaluated_at"],
+        "cached": report["cached"]
     }) #
 
 if __name__ == '__main__':
     load_suspicious_numbers() # Load watchlist at startup
+    load_domain_lists()
+    import_legacy_scam_log()
+    start_ollama_prober() # Probe backends and warm up their models in the background
     print("🚀 SMS Scam Detection Server v3.1 (with Watchlist & Scam Logging)") #
     print("=" * 50) #
     print(f"🤖 Current Model: {OLLAMA_MODEL}") #
+    print(f"🔌 Ollama: {len(OLLAMA_BACKENDS)} backend(s), pool {OLLAMA_POOL_SIZE} each, timeouts {OLLAMA_CONNECT_TIMEOUT}s connect / {OLLAMA_READ_TIMEOUT}s read")
+    for url, model in OLLAMA_BACKENDS:
+        print(f"   - {url} ({model})")
     print(f"📡 Server: http://localhost:5000") #
-    print(f"👁️ Watchlist: Loaded from '{SUSPICIOUS_NUMBERS_FILE}' ({len(WATCHLIST_NUMBERS)} entries)")
-    print(f"📝 Scam Log: Will be written to '{HIGH_CONFIDENCE_SCAMS_FILE}'")
+    print(f"👁️ Watchlist: Loaded from '{watchlist.stats()['source']}' ({len(watchlist)} entries, {watchlist.stats()['storage']}, reloaded on change)")
+    print(f"🔗 Domain Lists: {domain_lists.stats()['blocklisted']} blocklisted, {domain_lists.stats()['allowlisted']} allowlisted, {domain_lists.stats()['shorteners']} shortener domains (reloaded on change)")
+    print(f"📝 Scam Log: Will be written to '{scam_log.path}' ({SCAM_LOG_FORMAT}, background writer, batches of {SCAM_LOG_BATCH_SIZE})")
+    print(f"🧠 Local Model: {'Loaded from ' + repr(LOCAL_MODEL_FILE) if local_classifier else 'Not loaded (run train_local_classifier.py)'}")
+    print(f"📚 Fallback Rules: Loaded from '{fallback_rules.active.source}' (hot-reloaded on change)")
+    print(f"⚡ Verdict Cache: {VERDICT_CACHE_MAX_ENTRIES} entries, {VERDICT_CACHE_TTL_SECONDS}s TTL, persisted to '{VERDICT_CACHE_DB}'")
+    print(f"🚦 Admission: {ADMISSION_MAX_CONCURRENT} concurrent generations, queue {ADMISSION_MAX_QUEUE}, deadlines {ADMISSION_INTERACTIVE_DEADLINE_SECONDS}s /analyze / {ADMISSION_BATCH_DEADLINE_SECONDS}s /batch")
     print("=" * 50) #
     print("📋 RECOMMENDED MODELS (install with 'ollama pull <model>'):") #
     for i, model in enumerate(RECOMMENDED_MODELS, 1): #
@@ -580,15 +1744,22 @@ if __name__ == '__main__':
     print("🔧 API ENDPOINTS:") #
     print("   GET  /health   - Server & model status") #
     print("   GET  /models   - Available Ollama models")   #
-    print("   GET  /test     - Test accuracy with examples") #
+    print("   GET  /test     - Evaluate the labeled dataset (?target=rules|local_model|cascade|llm:<model>)") #
+    print("   GET  /templates - Template cluster statistics")
+    print("   GET  /metrics  - Prometheus metrics (/metrics/slow for slow request breakdowns)")
     print("   POST /analyze  - Analyze single SMS") #
+    print("   GET  /analysis/<id> - Background LLM reason for a watchlisted sender")
+    print("   GET  /scams    - Query logged scams (?sender, ?q, ?since=1h; /scams/summary for counts)")
     print("   POST /batch    - Analyze multiple SMS") #
+    print("   POST /batch/stream - Analyze NDJSON SMS, results streamed as they finish")
     print("=" * 50) #
     print("⚠️  SETUP REQUIRED:") #
     print("   1. Install Ollama: https://ollama.ai") #
     print("   2. Start Ollama: ollama serve") #
     print("   3. Install model: ollama pull llama3.2:3b") #
     print(f"  4. Create '{SUSPICIOUS_NUMBERS_FILE}' (optional, for watchlist feature)")
+    print("   For production, run several worker processes with: python serve.py --workers 4")
     print("=" * 50) #
     
-    app.run(host='0.0.0.0', port=5000, debug=True) #
\ No newline at end of file
+    # Development server only; SMS_DEBUG=1 turns on the debugger and reloader
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('SMS_DEBUG') == '1', threaded=True) #
\ No newline at end of file
@@ -0,0 +1,255 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond stages (watchlist, rules) up to slow LLM generations
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_text(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def mask_sender(sender):
+    """Phone numbers keep their last four digits ('+91******3210'); alphanumeric sender IDs are kept."""
+    sender = str(sender or '')
+    if sum(c.isdigit() for c in sender) < 7:
+        return sender
+    return re.sub(r'\d', '*', sender[:-4]) + sender[-4:]
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {} # label values tuple -> value
+        self._children = {} # label values tuple -> series from labels()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(labels)
+
+    def labels(self, *labels):
+        """The (cached) series for these label values, for hot paths that update it on every message."""
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children.setdefault(labels, self._child(self._key(labels)))
+        return child
+
+    def _child(self, key):
+        return _Child(self, key)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class _Child:
+    """One labelled counter or gauge series with the label check done once."""
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        metric = self.metric
+        with metric.lock:
+            metric.values[self.key] = metric.values.get(self.key, 0) + amount
+
+
+class _HistogramChild:
+    """One histogram series; observe() is one bisect and three additions under the lock."""
+    __slots__ = ('lock', 'buckets', 'series')
+
+    def __init__(self, histogram, key):
+        self.lock = histogram.lock
+        self.buckets = histogram.buckets
+        with histogram.lock:
+            self.series = histogram.values.setdefault(key, [[0] * (len(histogram.buckets) + 1), 0.0, 0])
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        series = self.series
+        with self.lock:
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; observe() is one bisect and a few additions under a lock."""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self, key):
+        return _HistogramChild(self, key)
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self.values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, labels, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+
+class _StageTimer:
+    """Times one with-block for MetricsRegistry.stage(); a plain object, cheaper than a generator context manager."""
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.registry.record_stage(self.name, time.perf_counter() - self.start)
+
+
+class _TraceLocal(threading.local):
+    trace = None # A class default is much cheaper to read than getattr() with a default
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms rendered in the Prometheus text format, plus
+    per-message stage timing. stage() feeds one labelled histogram and, when a trace is
+    active on the current thread, the trace's stage breakdown. Traces slower than
+    slow_threshold_seconds are kept in a bounded sample for later inspection, with the
+    sender masked.
+    """
+
+    def __init__(self, prefix='sms', slow_threshold_seconds=None, slow_samples=100):
+        self.prefix = prefix
+        self.metrics = []
+        self.slow_threshold_seconds = slow_threshold_seconds
+        self.slow_requests = deque(maxlen=slow_samples)
+        self._slow_lock = threading.Lock()
+        self._local = _TraceLocal()
+        self.stage_seconds = self.histogram('stage_seconds', "Time spent per analysis stage", ['stage'])
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(f"{self.prefix}_{name}", help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(f"{self.prefix}_{name}", help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(f"{self.prefix}_{name}", help_text, labelnames, buckets))
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def record_stage(self, name, seconds):
+        self.stage_seconds.labels(name).observe(seconds)
+        trace = self._local.trace
+        if trace is not None:
+            trace["stages"][name] = trace["stages"].get(name, 0.0) + seconds
+
+    @contextmanager
+    def trace(self, kind, **info):
+        """Collects the stage breakdown of one analyzed message on this thread."""
+        trace = {"kind": kind, "stages": {}, **info}
+        previous = self._local.trace
+        self._local.trace = trace
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            self._local.trace = previous
+            total = time.perf_counter() - start
+            if self.slow_threshold_seconds is not None and total >= self.slow_threshold_seconds:
+                trace["total_seconds"] = round(total, 6)
+                trace["stages"] = {k: round(v, 6) for k, v in trace["stages"].items()}
+                trace["timestamp"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                if "sender" in trace:
+                    trace["sender"] = mask_sender(trace["sender"])
+                with self._slow_lock:
+                    self.slow_requests.append(trace)
+
+    def slow_samples(self):
+        """Copy of the slow trace sample, safe while other threads append to it."""
+        with self._slow_lock:
+            return list(self.slow_requests)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,62 @@
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaClient:
+    """
+    Shared HTTP client for one Ollama server. Reuses keep-alive connections from a
+    bounded pool instead of opening a new TCP connection per request, and separates
+    the connect timeout (fail fast when Ollama is down) from the read timeout
+    (generation can legitimately take a while).
+    """
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=3, read_timeout=50):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        # pool_block: callers beyond pool_size wait for a free connection instead of opening extra ones
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    @property
+    def generate_url(self):
+        return f"{self.base_url}/api/generate"
+
+    @property
+    def tags_url(self):
+        return f"{self.base_url}/api/tags"
+
+    @property
+    def ps_url(self):
+        return f"{self.base_url}/api/ps"
+
+    def _timeout(self, read_timeout):
+        return (self.connect_timeout, read_timeout if read_timeout is not None else self.read_timeout)
+
+    def generate(self, payload, read_timeout=None, stream=False):
+        """POSTs to /api/generate. Connection and timeout errors are raised to the caller."""
+        return self.session.post(self.generate_url, json=payload, timeout=self._timeout(read_timeout), stream=stream)
+
+    def tags(self, read_timeout=20):
+        """GETs /api/tags (installed models)."""
+        return self.session.get(self.tags_url, timeout=self._timeout(read_timeout))
+
+    def ps(self, read_timeout=5):
+        """GETs /api/ps (models currently loaded in memory)."""
+        return self.session.get(self.ps_url, timeout=self._timeout(read_timeout))
+
+    def settings(self):
+        return {
+            "base_url": self.base_url,
+            "pool_size": self.pool_size,
+            "connect_timeout_seconds": self.connect_timeout,
+            "read_timeout_seconds": self.read_timeout
+        }
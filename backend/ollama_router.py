@@ -0,0 +1,353 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+
+from ollama_client import OllamaClient
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
+
+class NoBackendAvailable(requests.exceptions.ConnectionError):
+    """Every backend's circuit is open; callers treat it like Ollama being offline."""
+
+
+def is_backend_failure(error):
+    """
+    Whether an error says the backend is unhealthy: no connection, a timeout, a broken
+    response stream or a 5xx. A 4xx (bad payload, unknown model) or an unparsable body
+    would fail the same way on every backend, so it neither fails over nor opens a circuit.
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                              requests.exceptions.ChunkedEncodingError))
+
+
+def normalize_model_name(name):
+    """Ollama's full model name: an untagged 'llama3.2' is 'llama3.2:latest'."""
+    name = (name or '').strip()
+    return name if ':' in name.rsplit('/', 1)[-1] else f"{name}:latest"
+
+
+def parse_backends(spec, default_model):
+    """
+    Parses 'url' or 'model@url' entries separated by commas, e.g.
+    'http://10.0.0.2:11434,gemma2:2b@http://10.0.0.3:11434'. Returns [(url, model), ...].
+    """
+    backends = []
+    for entry in (spec or '').split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model, _, url = entry.rpartition('@') if '@' in entry else ('', '', entry)
+        backends.append((url.strip(), model.strip() or default_model))
+    return backends
+
+
+class OllamaBackend:
+    """One Ollama server: its pooled client, the model it serves and its circuit breaker state."""
+
+    def __init__(self, url, model, pool_size, connect_timeout, read_timeout):
+        self.client = OllamaClient(url, pool_size, connect_timeout, read_timeout)
+        self.name = self.client.base_url
+        self.model = model
+        self.outstanding = 0
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_pick = 0
+        self.ewma_seconds = None
+        # Filled in by the background prober
+        self.probe_status = "UNKNOWN"
+        self.probe_seconds = None
+        self.probe_error = None
+        self.probed_at = None
+        self.model_loaded = None # None when the server cannot tell (no /api/ps)
+        self.warming = False
+        self.warmed_at = None
+
+    def snapshot(self):
+        return {
+            "url": self.name,
+            "model": self.model,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "avg_seconds": round(self.ewma_seconds, 3) if self.ewma_seconds is not None else None,
+            "last_error": self.last_error,
+            "retry_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.opened_until)) if self.state == OPEN else None,
+            "probe_status": self.probe_status,
+            "probe_seconds": round(self.probe_seconds, 4) if self.probe_seconds is not None else None,
+            "probe_error": self.probe_error,
+            "probed_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.probed_at)) if self.probed_at else None,
+            "model_loaded": self.model_loaded,
+            "warmed_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.warmed_at)) if self.warmed_at else None
+        }
+
+
+class OllamaRouter:
+    """
+    Spreads generations over several Ollama backends. Each call goes to the available
+    backend with the fewest outstanding requests (ties go to the least recently used one),
+    preferring backends that serve the requested model. A backend's circuit opens after
+    failure_threshold consecutive failures and stays open for open_seconds; then a single
+    trial request decides whether it closes again. A call that fails with a backend
+    failure (see is_backend_failure) is retried on the next backend within what is left of
+    the call's read timeout, so callers only see an error once every backend has failed
+    or the time is up.
+    """
+
+    def __init__(self, backends, pool_size=10, connect_timeout=3, read_timeout=50,
+                 failure_threshold=3, open_seconds=30, cross_model_failover=True):
+        if not backends:
+            raise ValueError("At least one Ollama backend is required")
+        self.backends = [OllamaBackend(url, model, pool_size, connect_timeout, read_timeout) for url, model in backends]
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.cross_model_failover = cross_model_failover
+        self.lock = threading.Lock()
+        self._picks = 0
+        self._prober = None
+        self._prober_pid = None
+
+    @property
+    def models(self):
+        return list(dict.fromkeys(backend.model for backend in self.backends))
+
+    def _available(self, backend, now):
+        if backend.state == CLOSED:
+            return True
+        if backend.state == OPEN and now >= backend.opened_until:
+            backend.state = HALF_OPEN
+        return backend.state == HALF_OPEN and not backend.trial_in_flight
+
+    def serves(self, model):
+        """Whether any configured backend serves the model (healthy or not)."""
+        return any(normalize_model_name(b.model) == normalize_model_name(model) for b in self.backends)
+
+    def _acquire(self, model, tried, cross_model_failover):
+        """Picks and reserves a backend, or returns None when none is left to try."""
+        now = time.time()
+        with self.lock:
+            candidates = [b for b in self.backends if b not in tried and self._available(b, now)]
+            if model is not None:
+                same_model = [b for b in candidates if normalize_model_name(b.model) == normalize_model_name(model)]
+                candidates = same_model or (candidates if cross_model_failover else [])
+            if not candidates:
+                return None
+            backend = min(candidates, key=lambda b: (b.outstanding, b.last_pick))
+            self._picks += 1
+            backend.last_pick = self._picks
+            backend.outstanding += 1
+            backend.requests += 1
+            if backend.state == HALF_OPEN:
+                backend.trial_in_flight = True
+            return backend
+
+    def _release(self, backend, error, seconds, backend_failure=True):
+        with self.lock:
+            backend.outstanding -= 1
+            backend.trial_in_flight = False
+            if error is not None and not backend_failure:
+                # The backend answered, just not usefully: it counts as up, but its timing is not averaged
+                backend.last_error = error
+                backend.consecutive_failures = 0
+                backend.state = CLOSED
+                return
+            if error is None:
+                backend.consecutive_failures = 0
+                if backend.state != CLOSED:
+                    logger.info(f"✅ Ollama backend {backend.name} recovered, circuit closed")
+                backend.state = CLOSED
+                backend.ewma_seconds = seconds if backend.ewma_seconds is None else backend.ewma_seconds + 0.1 * (seconds - backend.ewma_seconds)
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = error
+            if backend.state == HALF_OPEN or backend.consecutive_failures >= self.failure_threshold:
+                if backend.state != OPEN:
+                    logger.warning(f"🔌 Ollama backend {backend.name} circuit opened for {self.open_seconds}s after: {error}")
+                backend.state = OPEN
+                backend.opened_until = time.time() + self.open_seconds
+
+    def generate(self, payload, read, read_timeout=None, stream=False, cross_model_failover=None):
+        """
+        Runs one generation and returns (read(response), backend). The payload's model is
+        replaced by the chosen backend's model. read() runs while the backend is still
+        reserved, so streamed reads count as outstanding and read errors trigger failover.
+        read_timeout (default: the client's) bounds the whole call: each failover attempt
+        only gets the time the previous attempts left. cross_model_failover=False keeps the
+        call on backends serving the payload's model (default: the router's setting).
+        """
+        requested_model = payload.get("model")
+        if cross_model_failover is None:
+            cross_model_failover = self.cross_model_failover
+        budget = read_timeout if read_timeout is not None else self.backends[0].client.read_timeout
+        deadline = time.monotonic() + budget
+        tried = []
+        last_error = None
+        while True:
+            remaining = deadline - time.monotonic()
+            if tried and remaining <= 0:
+                if len(tried) < len(self.backends):
+                    logger.warning(f"⏱️ No time left to fail over after {len(tried)} Ollama backend(s)")
+                break
+            backend = self._acquire(requested_model, tried, cross_model_failover)
+            if backend is None:
+                break
+            tried.append(backend)
+            start = time.perf_counter()
+            try:
+                response = backend.client.generate(dict(payload, model=backend.model), max(remaining, 0.001), stream)
+                if not response.ok:
+                    response.close() # A streamed error body is never read, so hand the connection back to the pool
+                response.raise_for_status()
+                result = read(response)
+            except Exception as e:
+                backend_failure = is_backend_failure(e)
+                self._release(backend, f"{type(e).__name__}: {e}"[:200], time.perf_counter() - start, backend_failure)
+                if not backend_failure:
+                    raise
+                last_error = e
+                if len(tried) < len(self.backends):
+                    logger.warning(f"↪️ Ollama backend {backend.name} failed ({type(e).__name__}), trying the next one")
+                continue
+            self._release(backend, None, time.perf_counter() - start)
+            return result, backend
+        if last_error is not None:
+            raise last_error
+        raise NoBackendAvailable("No Ollama backend available (all circuits open)")
+
+    def probe(self, backend, timeout=2):
+        """
+        Cheap status check: /api/ps (falling back to /api/tags on older servers) instead
+        of a generation, so probing never competes with real traffic for the model.
+        """
+        start = time.perf_counter()
+        model_loaded, error = None, None
+        try:
+            response = backend.client.ps(read_timeout=timeout)
+            if response.status_code == 404:
+                response = backend.client.tags(read_timeout=timeout)
+                response.raise_for_status()
+            else:
+                response.raise_for_status()
+                loaded = {normalize_model_name(m.get(field)) for m in response.json().get("models", [])
+                          for field in ("name", "model") if m.get(field)}
+                model_loaded = normalize_model_name(backend.model) in loaded
+            status = "CONNECTED"
+        except requests.exceptions.HTTPError as e:
+            status, error = "ERROR", str(e)[:200]
+        except Exception as e:
+            status, error = "OFFLINE", f"{type(e).__name__}: {e}"[:200]
+        with self.lock:
+            backend.probe_status = status
+            backend.probe_seconds = time.perf_counter() - start if status == "CONNECTED" else None
+            backend.probe_error = error
+            backend.probed_at = time.time()
+            backend.model_loaded = model_loaded
+        return status
+
+    def warm_up(self, backend, keep_alive=None, timeout=120):
+        """
+        Loads the backend's model into memory. A generate request without a prompt
+        makes Ollama load the model and return; keep_alive then keeps it resident.
+        """
+        payload = {"model": backend.model}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        start = time.perf_counter()
+        try:
+            response = backend.client.generate(payload, read_timeout=timeout)
+            response.raise_for_status()
+            with self.lock:
+                backend.warmed_at = time.time()
+                backend.model_loaded = True
+            logger.info(f"🔥 Warmed up {backend.model} on {backend.name} in {time.perf_counter() - start:.1f}s")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Warm-up of {backend.model} on {backend.name} failed: {e}")
+            return False
+        finally:
+            backend.warming = False
+
+    def start_prober(self, interval_seconds=10, keep_alive=None, warm_up=True, warm_up_timeout=120, probe_timeout=2):
+        """
+        Probes every backend in the background every interval_seconds. With warm_up, a
+        reachable backend whose model is not loaded (at startup, or after Ollama evicted
+        it) gets a warm-up on its own thread, so the next real request does not pay the load.
+        Safe to call on every request: only the first call in each process starts it.
+        """
+        if self._prober_pid == os.getpid():
+            return
+        with self.lock:
+            if self._prober_pid == os.getpid():
+                return
+            self._prober_pid = os.getpid() # A prober started before a fork does not run in the child
+
+        def probe_all():
+            while True:
+                for backend in self.backends:
+                    status = self.probe(backend, probe_timeout)
+                    needs_load = backend.model_loaded is False or (backend.model_loaded is None and backend.warmed_at is None)
+                    if warm_up and status == "CONNECTED" and needs_load and not backend.warming:
+                        backend.warming = True
+                        threading.Thread(target=self.warm_up, args=(backend, keep_alive, warm_up_timeout),
+                                         name='ollama-warm-up', daemon=True).start()
+                time.sleep(interval_seconds)
+
+        self._prober = threading.Thread(target=probe_all, name='ollama-prober', daemon=True)
+        self._prober.start()
+
+    def health(self):
+        """Overall status from the last probes: CONNECTED if any backend answered, else ERROR/OFFLINE/UNKNOWN."""
+        with self.lock:
+            statuses = [(b.probe_status, b.probe_seconds) for b in self.backends]
+        connected = [seconds for status, seconds in statuses if status == "CONNECTED"]
+        if connected:
+            return "CONNECTED", min(connected)
+        for status in ("ERROR", "OFFLINE"):
+            if any(s == status for s, _ in statuses):
+                return status, 0
+        return "UNKNOWN", 0
+
+    def tags(self):
+        """Installed models per backend; unreachable backends report an error instead."""
+        report = []
+        for backend in self.backends:
+            entry = {"url": backend.name, "model": backend.model, "state": backend.state}
+            try:
+                response = backend.client.tags()
+                response.raise_for_status()
+                entry["available_models"] = [model["name"] for model in response.json().get("models", [])]
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"[:200]
+            report.append(entry)
+        return report
+
+    def stats(self):
+        with self.lock:
+            return [backend.snapshot() for backend in self.backends]
+
+    def settings(self):
+        client = self.backends[0].client
+        return {
+            "backends": len(self.backends),
+            "pool_size_per_backend": client.pool_size,
+            "connect_timeout_seconds": client.connect_timeout,
+            "read_timeout_seconds": client.read_timeout,
+            "failure_threshold": self.failure_threshold,
+            "open_seconds": self.open_seconds,
+            "cross_model_failover": self.cross_model_failover
+        }
@@ -0,0 +1,186 @@
+import atexit
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCAM_LOG_FORMATS = ('csv', 'jsonl.gz', 'sqlite')
+_STOP = object() # Queue sentinel: flush what is left and exit
+
+
+class ScamLogWriter:
+    """
+    Append-only scam event log written by one background thread. Request threads only
+    put a row on a bounded queue; the writer batches rows and appends them with one open
+    and one write per batch, flushing when batch_size rows are waiting or flush_interval
+    has passed. When the queue is full, events are dropped and counted instead of
+    blocking the request.
+
+    Formats: 'csv' (same columns as before, readable by train_local_classifier.py) or
+    'jsonl.gz', where every batch is appended as its own gzip member (concatenated
+    members are still one valid gzip file). The active file is rotated to
+    '<name>.<YYYYMMDD-HHMMSS><ext>' when it grows past rotate_bytes or the day changes.
+    With 'sqlite', batches go to a ScamEventStore (store), whose retention replaces rotation.
+    """
+
+    def __init__(self, path, fieldnames, log_format='csv', max_queue=10000, batch_size=200,
+                 flush_interval_seconds=1.0, rotate_bytes=50 * 1024 * 1024, rotate_daily=False, store=None):
+        if log_format not in SCAM_LOG_FORMATS:
+            raise ValueError(f"Unknown scam log format {log_format!r}, expected one of {SCAM_LOG_FORMATS}")
+        if log_format == 'sqlite' and store is None:
+            raise ValueError("The 'sqlite' scam log format needs a ScamEventStore")
+        self.path = path
+        self.store = store
+        self.fieldnames = fieldnames
+        self.log_format = log_format
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.rotate_bytes = rotate_bytes
+        self.rotate_daily = rotate_daily
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock() # Guards the counters below and _closed
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.last_flush = None
+        self._day = time.strftime('%Y%m%d')
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='scam-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, row):
+        """Queues one row (a dict keyed by fieldnames). Never blocks; returns False if dropped."""
+        with self.lock: # close() flips _closed under the lock, so no row lands behind the stop sentinel
+            if self._closed:
+                return False
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self.enqueued += 1
+        return True
+
+    def close(self, timeout=10):
+        """Stops accepting events, writes everything already queued and joins the writer."""
+        with self.lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is None:
+            return
+        self.queue.put(_STOP) # Blocking put: the writer is draining, so room frees up
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"⚠️ Scam log writer did not finish within {timeout}s; {self.queue.qsize()} events unwritten")
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while True:
+            try:
+                row = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                row = None
+            stopping = row is _STOP
+            if row is not None and not stopping:
+                batch.append(row)
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write_batch(batch)
+                batch = []
+            if stopping:
+                return
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval_seconds
+
+    def _rotate_if_needed(self):
+        today = time.strftime('%Y%m%d')
+        if not os.path.exists(self.path):
+            self._day = today
+            return
+        too_big = self.rotate_bytes and os.path.getsize(self.path) >= self.rotate_bytes
+        new_day = self.rotate_daily and today != self._day
+        if not (too_big or new_day):
+            return
+        base, ext = self.path[:-len(self.extension)], self.extension
+        rotated = f"{base}.{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+        suffix = 1
+        while os.path.exists(rotated):
+            rotated = f"{base}.{time.strftime('%Y%m%d-%H%M%S')}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, rotated)
+        self._day = today
+        with self.lock:
+            self.rotations += 1
+        logger.info(f"🗂️ Rotated scam log to {rotated}")
+
+    @property
+    def extension(self):
+        for ext in ('.jsonl.gz', '.csv'):
+            if self.path.endswith(ext):
+                return ext
+        return ''
+
+    def _encode(self, batch, new_file):
+        if self.log_format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=self.fieldnames)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(batch)
+            return buffer.getvalue().encode('utf-8')
+        lines = ''.join(json.dumps({k: row.get(k) for k in self.fieldnames}) + '\n' for row in batch)
+        return gzip.compress(lines.encode('utf-8'))
+
+    def _write_batch(self, batch):
+        try:
+            if self.store is not None:
+                self.store.insert_many(batch)
+            else:
+                self._rotate_if_needed()
+                new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                data = self._encode(batch, new_file)
+                with open(self.path, mode='ab') as f:
+                    f.write(data)
+            with self.lock:
+                self.written += len(batch)
+                self.batches += 1
+                self.last_flush = time.time()
+            logger.info(f"📝 Logged {len(batch)} high-confidence scam(s) to {self.path}")
+        except Exception as e:
+            with self.lock:
+                self.write_errors += 1
+                self.dropped += len(batch)
+            logger.error(f"💥 Error writing scam log batch of {len(batch)}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "path": self.path,
+                "format": self.log_format,
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+                "rotations": self.rotations,
+                "write_errors": self.write_errors,
+                "last_flush": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.last_flush)) if self.last_flush else None
+            }
@@ -0,0 +1,362 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from verdict_cache import normalize_message, SQLITE_BUSY_TIMEOUT_SECONDS
+from watchlist import normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+# Only content the LLM itself judged becomes known. Watchlist, blocklist, rule and local
+# model verdicts are cheaper to recompute (and may be wrong), and a known-scam answer being
+# logged again must not confirm itself.
+KNOWN_CONTENT_METHOD = "LLM"
+KNOWN_CONTENT_EXCLUDED_TIERS = ("KNOWN_SCAM", "DOMAIN_BLOCKLIST", "RULES", "LOCAL_MODEL", "WATCHLIST", "FALLBACK")
+DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhd])$')
+DURATION_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        sender TEXT NOT NULL,
+        sender_key TEXT NOT NULL,
+        message TEXT NOT NULL,
+        message_key TEXT NOT NULL,
+        classification TEXT,
+        confidence_score INTEGER,
+        detection_method TEXT,
+        decision_tier TEXT,
+        reason TEXT,
+        analysis_json TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS events_sender_ts ON events (sender_key, ts)",
+    "CREATE INDEX IF NOT EXISTS events_message_ts ON events (message_key, ts)",
+    "CREATE INDEX IF NOT EXISTS events_ts ON events (ts)",
+    """CREATE TABLE IF NOT EXISTS known_content (
+        message_key TEXT PRIMARY KEY,
+        classification TEXT NOT NULL,
+        confidence_score INTEGER NOT NULL,
+        reason TEXT,
+        detection_method TEXT,
+        hits INTEGER NOT NULL,
+        first_seen REAL NOT NULL,
+        last_seen REAL NOT NULL
+    ) WITHOUT ROWID""",
+    "CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)"
+]
+FULL_TEXT_SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(message, content='events', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts (rowid, message) VALUES (new.id, new.message);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts (events_fts, rowid, message) VALUES ('delete', old.id, old.message);
+    END"""
+]
+
+
+def message_key(sms_text):
+    """Content address of a message, shared by every sender that sends the same (normalized) text."""
+    return hashlib.sha256(normalize_message(sms_text).encode('utf-8')).hexdigest()
+
+
+def sender_key(sender, default_country_code='91'):
+    """'+<E.164 digits>' for phone numbers in any format, the upper-cased ID for alphanumeric senders."""
+    digits = normalize_phone_number(sender, default_country_code=default_country_code)
+    return f"+{digits}" if digits else (sender or '').strip().upper()
+
+
+def parse_time(value, now=None):
+    """Epoch seconds for an ISO timestamp, epoch seconds, or a duration ago ('90m', '1h', '7d')."""
+    value = str(value).strip()
+    match = DURATION.match(value)
+    if match:
+        return (now or time.time()) - float(match.group(1)) * DURATION_SECONDS[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time {value!r}: use an ISO timestamp, epoch seconds or a duration like 1h") from None
+
+
+def full_text_query(text):
+    """Every word must match; each is quoted so user input is never parsed as FTS syntax."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class ScamEventStore:
+    """
+    Indexed store for high-confidence scam events in SQLite: events are indexed by
+    sender and time, by message content and time, and full-text (FTS5, when the SQLite
+    build has it). known_content keeps one row per distinct message text, so a message
+    that was already logged as a high-confidence scam is recognized with one primary
+    key lookup; a known verdict expires known_ttl_days after it was last confirmed by the
+    LLM, or at once with forget_known(). Events older than retention_days, and the oldest
+    beyond max_events, are deleted by compact(), which the writer runs every
+    compact_interval_seconds. Each process opens its own write connection, so worker
+    processes can share the file; reads use a connection per thread and never wait for
+    writes or compaction (WAL).
+    """
+
+    def __init__(self, db_path, retention_days=90, max_events=1000000, compact_interval_seconds=3600,
+                 default_country_code='91', known_ttl_days=7):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.known_ttl_days = known_ttl_days
+        self.max_events = max_events
+        self.compact_interval_seconds = compact_interval_seconds
+        self.default_country_code = default_country_code
+        self.full_text = False
+        self._lock = threading.Lock() # One connection per process, used by one thread at a time
+        self._db = None
+        self._db_pid = None
+        self._read_local = threading.local()
+        self._counts_lock = threading.Lock() # Counters only, so stats() never waits behind a write or compaction
+        self._last_compaction = time.monotonic()
+        self.inserted = 0
+        self.deleted = 0
+        self.compactions = 0
+        self.known_lookups = 0
+        self.known_hits = 0
+        self.known_forgotten = 0
+
+    def _connection(self):
+        if self._db is None or self._db_pid != os.getpid():
+            self._db_pid = os.getpid()
+            self._db = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            self._db.execute("PRAGMA auto_vacuum=INCREMENTAL") # Only takes effect on a new file
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            try:
+                for statement in FULL_TEXT_SCHEMA:
+                    self._db.execute(statement)
+                self.full_text = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"⚠️ SQLite has no FTS5 ({e}); text search in {self.db_path} falls back to LIKE scans")
+            self._db.commit()
+        return self._db
+
+    def _read_connection(self):
+        """This thread's read-only connection, opened after the write connection created the schema."""
+        db = getattr(self._read_local, 'db', None)
+        if db is None or self._read_local.pid != os.getpid():
+            with self._lock:
+                self._connection()
+            db = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+            db.execute("PRAGMA query_only=ON")
+            self._read_local.db, self._read_local.pid = db, os.getpid()
+        return db
+
+    def event_from_row(self, row):
+        """Column values for a scam log row (timestamp, sender_id, message_content, analysis_json)."""
+        analysis = row.get('analysis_json') or '{}'
+        try:
+            result = json.loads(analysis) if isinstance(analysis, str) else dict(analysis)
+        except ValueError:
+            result = {}
+        try:
+            ts = datetime.fromisoformat(row.get('timestamp') or '').timestamp()
+        except ValueError:
+            ts = time.time()
+        sender = row.get('sender_id') or ''
+        message = row.get('message_content') or ''
+        return (ts, sender, sender_key(sender, self.default_country_code), message, message_key(message),
+                result.get('classification'), result.get('confidence_score'), result.get('detection_method'),
+                result.get('decision_tier'), result.get('reason'), analysis if isinstance(analysis, str) else json.dumps(analysis))
+
+    def _insert(self, db, rows):
+        events = [self.event_from_row(row) for row in rows]
+        db.executemany(
+            "INSERT INTO events (ts, sender, sender_key, message, message_key, classification, confidence_score, "
+            "detection_method, decision_tier, reason, analysis_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", events)
+        db.executemany(
+            "INSERT INTO known_content VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT (message_key) DO UPDATE SET hits = hits + 1, last_seen = max(last_seen, excluded.last_seen)",
+            [(e[4], e[5], e[6] or 0, e[9], e[7], e[0], e[0]) for e in events
+             if e[5] and e[7] == KNOWN_CONTENT_METHOD and e[8] not in KNOWN_CONTENT_EXCLUDED_TIERS])
+        return len(events)
+
+    def insert_many(self, rows):
+        """Stores a batch of scam log rows in one transaction, then compacts if it is due."""
+        with self._lock:
+            db = self._connection()
+            with db:
+                count = self._insert(db, rows)
+        with self._counts_lock:
+            self.inserted += count
+        if time.monotonic() - self._last_compaction >= self.compact_interval_seconds:
+            self.compact()
+        return count
+
+    def import_csv(self, csv_path):
+        """
+        One-time import of a legacy scam log CSV. Recorded in store_meta inside the same
+        transaction, so concurrent worker processes import it exactly once.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+        marker = f"imported:{os.path.abspath(csv_path)}"
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                if db.execute("SELECT 1 FROM store_meta WHERE key = ?", (marker,)).fetchone():
+                    db.rollback()
+                    return 0
+                with open(csv_path, mode='r', newline='', encoding='utf-8') as f:
+                    count = self._insert(db, list(csv.DictReader(f)))
+                db.execute("INSERT INTO store_meta VALUES (?, ?)", (marker, time.strftime('%Y-%m-%dT%H:%M:%S')))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        with self._counts_lock:
+            self.inserted += count
+        logger.info(f"🗃️ Imported {count} scam events from {csv_path} into {self.db_path}")
+        return count
+
+    def compact(self, now=None):
+        """Applies retention and the event cap, then returns freed pages to the file system."""
+        now = now or time.time()
+        cutoff = now - self.retention_days * 86400
+        with self._lock:
+            db = self._connection()
+            with db:
+                deleted = db.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+                deleted += db.execute(
+                    "DELETE FROM events WHERE id <= (SELECT id FROM events ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_events,)).rowcount
+                # Also drops rows promoted from non-LLM verdicts by earlier versions
+                db.execute("DELETE FROM known_content WHERE last_seen < ? OR detection_method IS NOT ?",
+                           (max(cutoff, now - self.known_ttl_days * 86400), KNOWN_CONTENT_METHOD))
+            if deleted:
+                if self.full_text:
+                    with db:
+                        db.execute("INSERT INTO events_fts (events_fts) VALUES ('optimize')")
+                db.execute("PRAGMA incremental_vacuum").fetchall() # Frees one page per step
+            self._last_compaction = time.monotonic()
+        with self._counts_lock:
+            self.deleted += deleted
+            self.compactions += 1
+        if deleted:
+            logger.info(f"🧹 Compacted scam store: deleted {deleted} events")
+        return deleted
+
+    def known_scam(self, sms_text, min_hits=1):
+        """The first logged LLM verdict for this message text with its hit count, or None once it expired."""
+        key = message_key(sms_text)
+        cutoff = time.time() - min(self.retention_days, self.known_ttl_days) * 86400
+        row = self._read_connection().execute(
+            "SELECT classification, confidence_score, reason, detection_method, hits, first_seen, last_seen "
+            "FROM known_content WHERE message_key = ? AND last_seen >= ? AND hits >= ? AND detection_method = ?",
+            (key, cutoff, min_hits, KNOWN_CONTENT_METHOD)).fetchone()
+        with self._counts_lock:
+            self.known_lookups += 1
+            self.known_hits += row is not None
+        if row is None:
+            return None
+        classification, confidence_score, reason, detection_method, hits, first_seen, last_seen = row
+        return {"message_key": key, "classification": classification, "confidence_score": confidence_score,
+                "reason": reason, "detection_method": detection_method, "hits": hits,
+                "first_seen": datetime.fromtimestamp(first_seen).isoformat(), "last_seen": datetime.fromtimestamp(last_seen).isoformat()}
+
+    def forget_known(self, sms_text):
+        """Stops answering this message text from the store (e.g. a reported false positive). Returns True if it was known."""
+        with self._lock:
+            db = self._connection()
+            with db:
+                forgotten = db.execute("DELETE FROM known_content WHERE message_key = ?", (message_key(sms_text),)).rowcount
+        with self._counts_lock:
+            self.known_forgotten += forgotten
+        return bool(forgotten)
+
+    def _where(self, sender=None, message=None, text=None, since=None, until=None, classification=None):
+        clauses, params = [], []
+        if sender:
+            clauses.append("sender_key = ?")
+            params.append(sender_key(sender, self.default_country_code))
+        if message:
+            clauses.append("message_key = ?")
+            params.append(message_key(message))
+        if text:
+            if self.full_text:
+                clauses.append("id IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+                params.append(full_text_query(text))
+            else:
+                for word in text.split():
+                    clauses.append("message LIKE ? ESCAPE '\\'")
+                    params.append('%' + re.sub(r'([%_\\])', r'\\\1', word) + '%')
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if classification:
+            clauses.append("classification = ?")
+            params.append(classification.upper())
+        return clauses, params
+
+    def query(self, limit=50, cursor=None, **filters):
+        """
+        Newest events first, matching all given filters (sender, message, text, since,
+        until, classification). Paginated by id: pass the returned next_cursor to get
+        the next page, which stays stable while new events are appended.
+        """
+        clauses, params = self._where(**filters)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(int(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._read_connection().execute(
+            "SELECT id, ts, sender, message, classification, confidence_score, detection_method, decision_tier, reason "
+            f"FROM events {where} ORDER BY id DESC LIMIT ?", params + [limit + 1]).fetchall()
+        events = [{"id": row[0], "timestamp": datetime.fromtimestamp(row[1]).isoformat(), "sender": row[2],
+                   "message_content": row[3], "classification": row[4], "confidence_score": row[5],
+                   "detection_method": row[6], "decision_tier": row[7], "reason": row[8]} for row in rows[:limit]]
+        return {"events": events, "next_cursor": events[-1]["id"] if len(rows) > limit else None}
+
+    def summary(self, **filters):
+        """Event count, distinct senders and first/last time for the same filters as query()."""
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        count, senders, first, last = self._read_connection().execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT sender_key), MIN(ts), MAX(ts) FROM events {where}", params).fetchone()
+        return {"events": count, "distinct_senders": senders,
+                "first_seen": datetime.fromtimestamp(first).isoformat() if first is not None else None,
+                "last_seen": datetime.fromtimestamp(last).isoformat() if last is not None else None}
+
+    def iter_messages(self, classification="SCAM"):
+        """(message, sender) of every stored event with the classification, oldest first."""
+        rows = self._read_connection().execute(
+            "SELECT message, sender FROM events WHERE classification = ? ORDER BY id", (classification,)).fetchall()
+        return rows
+
+    def stats(self):
+        with self._counts_lock:
+            return {
+                "path": self.db_path,
+                "full_text": self.full_text,
+                "retention_days": self.retention_days,
+                "max_events": self.max_events,
+                "inserted": self.inserted,
+                "deleted": self.deleted,
+                "compactions": self.compactions,
+                "known_ttl_days": self.known_ttl_days,
+                "known_lookups": self.known_lookups,
+                "known_hits": self.known_hits,
+                "known_forgotten": self.known_forgotten
+            }
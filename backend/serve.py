@@ -0,0 +1,70 @@
+"""
+Production launcher: runs the server under gunicorn with several worker processes.
+
+Each worker imports main after the fork, so it has its own Ollama sessions, executors
+and SQLite connections. Workers share the memory-mapped binary watchlist (build it
+with build_watchlist.py) and the verdict databases, and split the admission slots
+between them so together they never start more generations than the backends run in
+parallel. Needs gunicorn (pip install gunicorn); `python main.py` remains the
+single-process development server.
+
+    python serve.py --workers 4
+    python serve.py --workers 8 --threads 16 --bind 0.0.0.0:8080
+"""
+import argparse
+import os
+import sys
+
+
+def post_worker_init(worker):
+    """Per-worker startup, after the app was imported in the worker process."""
+    import main
+    main.load_suspicious_numbers()
+    main.load_domain_lists()
+    main.import_legacy_scam_log()
+    main.start_ollama_prober()
+    main.logger.info(f"🚀 Worker {os.getpid()} ready ({main.ADMISSION_MAX_CONCURRENT} admission slots, watchlist {main.watchlist.stats()['storage']})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the SMS scam detection server with several worker processes")
+    parser.add_argument('--bind', default='0.0.0.0:5000')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="Request threads per worker")
+    parser.add_argument('--timeout', type=int, default=120, help="Seconds before a silent worker is restarted")
+    parser.add_argument('--access-log', action='store_true', help="Log every request to stdout")
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("❌ The production server needs gunicorn: pip install gunicorn (or run python main.py for development)")
+
+    # Read by main in every worker, so each takes its share of the admission slots
+    os.environ['SMS_SERVER_WORKERS'] = str(args.workers)
+
+    class DetectionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import main
+            return main.app
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread", # Request handling blocks on Ollama, so each worker serves with threads
+        "timeout": args.timeout,
+        "preload_app": False, # Import main in each worker: no sockets, threads or connections cross the fork
+        "post_worker_init": post_worker_init,
+        "accesslog": "-" if args.access_log else None
+    }
+    print(f"🚀 Starting {args.workers} workers x {args.threads} threads on {args.bind}")
+    DetectionServer(options).run()
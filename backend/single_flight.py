@@ -0,0 +1,73 @@
+import threading
+
+
+class FollowerTimeout(Exception):
+    """A caller gave up waiting for the in-flight call it joined."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key runs the function,
+    callers arriving while it is in flight wait for it and share its result (or its
+    exception). Nothing is remembered once the call finishes; that is the cache's job.
+    A waiting caller can bound its wait with a timeout; the call itself keeps running.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns (result, shared). shared is True when the result came from another caller's call.
+        A caller that joins a call raises FollowerTimeout if it is not done within timeout seconds.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self.calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(None if timeout is None else max(0.0, timeout)):
+                with self.lock:
+                    call.waiters -= 1
+                raise FollowerTimeout(key)
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": len(self.calls),
+                "waiting": sum(call.waiters for call in self.calls.values()),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced
+            }
@@ -0,0 +1,253 @@
+import logging
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from domain_lists import URL_PATTERN, normalize_domain, registrable_domain
+from verdict_cache import normalize_message, sender_class
+
+logger = logging.getLogger(__name__)
+
+# Masks applied in order: variable parts of transactional SMS become placeholders
+# so "Your OTP is 483920" and "Your OTP is 118204" canonicalize to the same text.
+# Links are masked first, to a marker the later masks leave alone; the marker becomes
+# <url:registrable domain> at the end, so a lookalike domain changes the template.
+URL_MARKER = '\x00'
+TEMPLATE_MASKS = [
+    (re.compile(r'\b[\w.+-]+@[\w-]+\.[\w.]+\b'), ' <email> '),
+    (re.compile(r'(\brs\.?|\binr|\busd|₹|\$|€|£)\s*[\d,]+(\.\d+)?'), ' <amt> '),
+    (re.compile(r'\b\d{1,4}[/-]\d{1,2}[/-]\d{1,4}\b'), ' <date> '),
+    (re.compile(r'\b(?=[a-z\d]*[a-z])(?=[a-z\d]*\d)[a-z\d]{4,}\b'), ' <id> '), # order IDs, masked card numbers like xx2004
+    (re.compile(r'\d+([.,:]\d+)*'), ' <num> '),
+]
+
+# MinHash signature via one-permutation hashing: each feature hash lands in one of
+# MINHASH_BINS bins and each bin keeps its minimum. Bands of BAND_SIZE bins are the LSH keys;
+# at Jaccard 0.7 two messages share at least one band ~99% of the time.
+MINHASH_BINS = 16
+BAND_SIZE = 2
+EMPTY_BIN = 1 << 32
+
+TOKEN_PATTERN = re.compile(r'<url:[^>\s]+>|<\w+>|\w+')
+
+
+def canonicalize_template(sms_text):
+    """
+    Normalizes an SMS, masks URLs (keeping their registrable domain), amounts, dates,
+    IDs and digits, and drops punctuation.
+    """
+    text = normalize_message(sms_text).replace(URL_MARKER, ' ')
+    domains = []
+
+    def mask_url(match):
+        host = normalize_domain(match.group(1)) or 'unknown'
+        domains.append(registrable_domain(host))
+        return f' {URL_MARKER} '
+
+    text = URL_PATTERN.sub(mask_url, text)
+    for pattern, placeholder in TEMPLATE_MASKS:
+        text = pattern.sub(placeholder, text)
+    if domains:
+        parts = text.split(URL_MARKER) # One more part than links: the input's own markers were dropped
+        text = parts[0] + ''.join(f'<url:{domain}>{part}' for domain, part in zip(domains, parts[1:]))
+    return ' '.join(TOKEN_PATTERN.findall(text))
+
+
+def link_domains(tokens):
+    """The <url:domain> tokens of a canonical template."""
+    return frozenset(t for t in tokens if t.startswith('<url:'))
+
+
+def template_features(tokens):
+    """Hashed word unigrams and bigrams of a canonical template."""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return frozenset(zlib.crc32(f.encode('utf-8')) for f in features)
+
+
+def minhash_bands(features):
+    """LSH band keys for a feature set; bands made only of empty bins are skipped."""
+    signature = [EMPTY_BIN] * MINHASH_BINS
+    for h in features:
+        b = h % MINHASH_BINS
+        if h < signature[b]:
+            signature[b] = h
+    bands = []
+    for start in range(0, MINHASH_BINS, BAND_SIZE):
+        band = tuple(signature[start:start + BAND_SIZE])
+        if any(v != EMPTY_BIN for v in band):
+            bands.append((start, band))
+    return bands
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class TemplateIndex:
+    """
+    Near-duplicate index over canonicalized SMS. Each cluster remembers the LLM verdict of
+    its first member; later messages that land in the cluster reuse it. Exact canonical
+    matches are a dict lookup, near matches go through MinHash LSH buckets and are then
+    confirmed with the exact Jaccard similarity of their word features and must link to
+    the same registrable domains as the cluster. A cluster's verdict is reused for
+    ttl_seconds after it was recorded, like a verdict cache entry; then the cluster is dropped.
+    """
+
+    def __init__(self, max_clusters=50000, min_similarity=0.7, min_tokens=4, ttl_seconds=86400):
+        self.max_clusters = max_clusters
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.min_tokens = min_tokens # Very short texts are only matched exactly
+        self._clusters = OrderedDict() # cluster_id -> cluster dict, least recently seen first
+        self._by_canonical = {} # (scope, canonical text) -> cluster_id
+        self._buckets = {} # (scope, band, band value) -> set of cluster_ids
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _scope(self, sender_number, model):
+        return f"{model}|{sender_class(sender_number)}"
+
+    def _band_keys(self, scope, features):
+        return [(scope, start, band) for start, band in minhash_bands(features)]
+
+    def _find(self, scope, canonical, tokens):
+        now = time.time()
+        cluster_id = self._by_canonical.get((scope, canonical))
+        if cluster_id is not None:
+            if now - self._clusters[cluster_id]['created'] <= self.ttl_seconds:
+                return cluster_id, False, None
+            self._expire(cluster_id)
+        if len(tokens) < self.min_tokens:
+            return None, False, None
+
+        features = template_features(tokens)
+        domains = link_domains(tokens)
+        best_id, best_similarity = None, self.min_similarity
+        expired = set()
+        for key in self._band_keys(scope, features):
+            for candidate_id in self._buckets.get(key, ()):
+                candidate = self._clusters[candidate_id]
+                if now - candidate['created'] > self.ttl_seconds:
+                    expired.add(candidate_id)
+                    continue
+                if candidate['domains'] != domains:
+                    continue # Same wording with other links is how phishing copies a real template
+                similarity = jaccard(candidate['features'], features)
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate_id, similarity
+        for expired_id in expired:
+            self._expire(expired_id)
+        return best_id, True, features
+
+    def lookup(self, sms_text, sender_number, model):
+        """Returns (cluster_id, verdict copy) for a known template, or (None, None)."""
+        scope = self._scope(sender_number, model)
+        canonical = canonicalize_template(sms_text)
+        tokens = canonical.split()
+        with self._lock:
+            cluster_id, near, _ = self._find(scope, canonical, tokens)
+            if cluster_id is None:
+                self.misses += 1
+                return None, None
+            cluster = self._clusters[cluster_id]
+            self._clusters.move_to_end(cluster_id)
+            cluster['hits'] += 1
+            cluster['last_seen'] = time.time()
+            self.hits += 1
+            if near:
+                self.near_hits += 1
+            return cluster_id, dict(cluster['verdict'])
+
+    def add(self, sms_text, sender_number, model, verdict):
+        """Records the verdict for a message's template, creating a cluster if none matches."""
+        scope = self._scope(sender_number, model)
+        canonical = canonicalize_template(sms_text)
+        tokens = canonical.split()
+        with self._lock:
+            cluster_id, _, features = self._find(scope, canonical, tokens)
+            if cluster_id is not None:
+                return cluster_id
+
+            cluster_id = self._next_id
+            self._next_id += 1
+            if features is None:
+                features = template_features(tokens)
+            self._clusters[cluster_id] = {
+                'id': cluster_id,
+                'scope': scope,
+                'canonical': canonical,
+                'features': features,
+                'domains': link_domains(tokens),
+                'indexed': len(tokens) >= self.min_tokens,
+                'verdict': dict(verdict),
+                'hits': 0,
+                'created': time.time(),
+                'last_seen': time.time()
+            }
+            self._by_canonical[(scope, canonical)] = cluster_id
+            if len(tokens) >= self.min_tokens:
+                for key in self._band_keys(scope, features):
+                    self._buckets.setdefault(key, set()).add(cluster_id)
+
+            while len(self._clusters) > self.max_clusters:
+                self._evict_oldest()
+            return cluster_id
+
+    def _evict_oldest(self):
+        self._remove(next(iter(self._clusters)))
+        self.evictions += 1
+
+    def _expire(self, cluster_id):
+        self._remove(cluster_id)
+        self.expirations += 1
+
+    def _remove(self, cluster_id):
+        cluster = self._clusters.pop(cluster_id)
+        self._by_canonical.pop((cluster['scope'], cluster['canonical']), None)
+        if cluster['indexed']:
+            for key in self._band_keys(cluster['scope'], cluster['features']):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(cluster_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clusters": len(self._clusters),
+                "max_clusters": self.max_clusters,
+                "lsh_buckets": len(self._buckets),
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def top_clusters(self, limit=20):
+        """Most reused clusters first."""
+        with self._lock:
+            clusters = sorted(self._clusters.values(), key=lambda c: c['hits'], reverse=True)[:limit]
+            return [{
+                "cluster_id": c['id'],
+                "template": c['canonical'],
+                "scope": c['scope'],
+                "classification": c['verdict'].get('classification'),
+                "confidence_score": c['verdict'].get('confidence_score'),
+                "hits": c['hits'],
+                "created": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(c['created'])),
+                "last_seen": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(c['last_seen']))
+            } for c in clusters]
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, LoadShed
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_queued_callers_are_admitted_by_priority_then_arrival():
+    admission = AdmissionController(max_concurrent=1)
+    order = []
+
+    def take_slot(priority, label):
+        with admission.context(priority):
+            with admission.slot():
+                order.append(label)
+
+    with admission.slot():
+        threads = []
+        for priority, label in [("background", "background"), ("batch", "batch-1"), ("interactive", "interactive"), ("batch", "batch-2")]:
+            thread = threading.Thread(target=take_slot, args=(priority, label))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: admission.stats()["queue_depth"] == len(threads))
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["interactive", "batch-1", "batch-2", "background"]
+    assert admission.stats()["admitted"] == 5
+
+
+def test_deadline_expiring_in_the_queue_sheds_the_caller():
+    admission = AdmissionController(max_concurrent=1)
+    with admission.slot():
+        with admission.context("batch", time.monotonic() + 0.1):
+            start = time.monotonic()
+            with pytest.raises(LoadShed) as shed:
+                with admission.slot():
+                    pytest.fail("admitted while the only slot was taken")
+    assert shed.value.reason == "DEADLINE_EXPIRED"
+    assert 0.05 < time.monotonic() - start < 2
+    stats = admission.stats()
+    assert stats["queue_depth"] == 0 and stats["in_use"] == 0
+    assert stats["shed_by_reason"] == {"batch:DEADLINE_EXPIRED": 1}
+
+
+def test_predicted_wait_beyond_the_deadline_sheds_at_once():
+    admission = AdmissionController(max_concurrent=1)
+    admission.ewma_seconds = 10.0
+    with admission.slot():
+        with admission.context("interactive", time.monotonic() + 1):
+            with pytest.raises(LoadShed) as shed:
+                with admission.slot():
+                    pass
+    assert shed.value.reason == "PREDICTED_WAIT"
+    assert shed.value.predicted_wait == pytest.approx(10.0)
+
+
+def test_full_queue_sheds():
+    admission = AdmissionController(max_concurrent=1, max_queue=0)
+    with admission.slot():
+        with pytest.raises(LoadShed) as shed:
+            with admission.slot():
+                pass
+    assert shed.value.reason == "QUEUE_FULL"
+
+
+def test_expired_counts_a_deadline_shed_for_the_thread_context():
+    admission = AdmissionController(max_concurrent=1)
+    with admission.context("interactive", time.monotonic()):
+        shed = admission.expired()
+    assert (shed.reason, shed.priority) == ("DEADLINE_EXPIRED", "interactive")
+    assert admission.stats()["shed_by_reason"] == {"interactive:DEADLINE_EXPIRED": 1}
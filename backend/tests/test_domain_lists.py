@@ -0,0 +1,42 @@
+import pytest
+
+from domain_lists import BLOCK, DomainLists, DomainTrie, extract_domains
+
+
+@pytest.mark.parametrize("text, hosts", [
+    ("Verify at https://Secure-Login.Example.COM/auth?id=1 now", ["secure-login.example.com"]),
+    ("Track at amazon.in/track or hxxp://bad.xyz:8080/x.", ["amazon.in", "bad.xyz"]),
+    ("Pay at sbi.co.in. Thanks", ["sbi.co.in"]),
+    ("Mail us at help@bank.com", []),
+    ("Ref no.xx1234 and code ab.cd_9", []), # A TLD running into a longer word is not a host
+    ("Balance Rs.5000.00 on 12.05.2025", []),
+    ("Win at prize.top-deal", []),
+])
+def test_extract_domains(text, hosts):
+    assert extract_domains(text) == hosts
+
+
+def test_trie_finds_the_most_specific_listed_parent():
+    trie = DomainTrie()
+    trie.add("example.com", "parent")
+    trie.add("login.example.com", "child")
+    assert trie.lookup("a.login.example.com") == "child"
+    assert trie.lookup("www.example.com") == "parent"
+    assert trie.lookup("example.org") is None
+    assert len(trie) == 2
+
+
+def test_check_groups_hosts_by_list(tmp_path):
+    blocklist, allowlist = tmp_path / "block.txt", tmp_path / "allow.txt"
+    blocklist.write_text("# scam domains\nbad.xyz\n0.0.0.0 phish.example.com\n", encoding="utf-8")
+    allowlist.write_text("example.com\n", encoding="utf-8")
+    lists = DomainLists(str(blocklist), str(allowlist))
+    assert lists.load()
+
+    links = lists.check("Go to www.example.com, login.phish.example.com, bit.ly/x or bad.xyz1 and new.site")
+    assert links["allowlisted"] == ["www.example.com"]
+    assert links["blocked"] == ["login.phish.example.com"]
+    assert links["shortened"] == ["bit.ly"]
+    assert links["unlisted"] == ["new.site"]
+    assert lists.blocked_hosts(["a.bad.xyz", "example.com"]) == ["a.bad.xyz"]
+    assert lists.trie.lookup("bad.xyz")[0] == BLOCK
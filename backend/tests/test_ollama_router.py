@@ -0,0 +1,135 @@
+import time
+
+import pytest
+import requests
+
+from ollama_router import CLOSED, HALF_OPEN, OPEN, NoBackendAvailable, OllamaRouter, normalize_model_name
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.body = body or {"response": "ok"}
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error", response=self)
+
+    def json(self):
+        return self.body
+
+
+class ScriptedClient:
+    """Stands in for a backend's OllamaClient: each generate() call takes the next scripted outcome."""
+
+    def __init__(self, client, outcomes, delay=0.0):
+        self.client = client
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.read_timeouts = []
+
+    def generate(self, payload, read_timeout=None, stream=False):
+        self.read_timeouts.append(read_timeout)
+        time.sleep(self.delay)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def make_router(outcomes_per_backend, delay=0.0, **options):
+    router = OllamaRouter([(f"http://backend-{i}:11434", "m") for i in range(len(outcomes_per_backend))], **options)
+    for backend, outcomes in zip(router.backends, outcomes_per_backend):
+        backend.client = ScriptedClient(backend.client, outcomes, delay)
+    return router
+
+
+def generate(router):
+    return router.generate({"model": "m", "prompt": "hi"}, lambda response: response.json())
+
+
+def test_breaker_opens_then_half_opens_and_closes_after_a_good_trial():
+    down = requests.exceptions.ConnectionError("refused")
+    router = make_router([[down, down, FakeResponse()]], failure_threshold=2, open_seconds=0.1)
+    backend = router.backends[0]
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            generate(router)
+    assert backend.state == OPEN
+    with pytest.raises(NoBackendAvailable):
+        generate(router)
+
+    time.sleep(0.15)
+    assert router._available(backend, time.time())
+    assert backend.state == HALF_OPEN
+    result, used = generate(router)
+    assert result == {"response": "ok"} and used is backend
+    assert backend.state == CLOSED and backend.consecutive_failures == 0
+
+
+def test_failed_half_open_trial_reopens_the_circuit():
+    down = requests.exceptions.ConnectTimeout("timed out")
+    router = make_router([[down, down]], failure_threshold=1, open_seconds=0.1)
+    backend = router.backends[0]
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        generate(router)
+    assert backend.state == OPEN
+
+    time.sleep(0.15)
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        generate(router)
+    assert backend.state == OPEN
+    assert backend.opened_until > time.time()
+
+
+def test_server_errors_fail_over_to_the_next_backend():
+    router = make_router([[FakeResponse(503)], [FakeResponse()]], failure_threshold=1)
+    result, used = generate(router)
+    assert used is router.backends[1]
+    assert router.backends[0].state == OPEN and router.backends[1].state == CLOSED
+
+
+def test_client_errors_neither_fail_over_nor_trip_the_breaker():
+    router = make_router([[FakeResponse(400)], [FakeResponse()]], failure_threshold=1)
+    with pytest.raises(requests.exceptions.HTTPError):
+        generate(router)
+    assert [b.state for b in router.backends] == [CLOSED, CLOSED]
+    assert router.backends[1].client.read_timeouts == []
+
+
+def test_failover_attempts_share_the_read_timeout():
+    slow = requests.exceptions.ReadTimeout("slow")
+    router = make_router([[slow], [slow], [slow]], delay=0.2, failure_threshold=5)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        router.generate({"model": "m"}, lambda response: response, read_timeout=0.3)
+    timeouts = [timeout for backend in router.backends for timeout in backend.client.read_timeouts]
+    assert len(timeouts) == 2 # No time was left for the third backend
+    assert timeouts[0] == pytest.approx(0.3, abs=0.05)
+    assert timeouts[1] < 0.15
+
+
+def test_untagged_model_names_match_latest():
+    assert normalize_model_name("llama3.2") == "llama3.2:latest"
+    assert normalize_model_name("llama3.2:3b") == "llama3.2:3b"
+    assert normalize_model_name("registry:5000/team/model") == "registry:5000/team/model:latest"
+
+
+def test_cross_model_failover_can_be_turned_off_per_call():
+    router = OllamaRouter([("http://backend-0:11434", "llama3.2:3b")])
+    router.backends[0].client = ScriptedClient(router.backends[0].client, [FakeResponse()])
+    assert router.serves("llama3.2:3b") and not router.serves("gemma2:2b")
+
+    with pytest.raises(NoBackendAvailable):
+        router.generate({"model": "gemma2:2b"}, lambda response: response.json(), cross_model_failover=False)
+    assert router.backends[0].client.read_timeouts == []
+    _, used = router.generate({"model": "gemma2:2b"}, lambda response: response.json())
+    assert used.model == "llama3.2:3b" # The router's default still fails over to another model
@@ -0,0 +1,41 @@
+import csv
+import threading
+
+from scam_log import ScamLogWriter
+
+FIELDS = ['timestamp', 'sender_id', 'message_content', 'analysis_json']
+
+
+def make_row(n):
+    return {'timestamp': '2025-01-01T00:00:00', 'sender_id': f'+9198765{n:05d}', 'message_content': f'scam {n}', 'analysis_json': '{}'}
+
+
+def test_close_during_log_still_writes_the_row(tmp_path):
+    path = str(tmp_path / 'scams.csv')
+    writer = ScamLogWriter(path, FIELDS, flush_interval_seconds=60)
+    writer.start()
+    closer = threading.Thread(target=writer.close)
+    put_nowait = writer.queue.put_nowait
+
+    def put_while_closing(row):
+        closer.start() # close() runs between log()'s closed check and its put
+        closer.join(0.2)
+        put_nowait(row)
+
+    writer.queue.put_nowait = put_while_closing
+    assert writer.log(make_row(1))
+    closer.join(5)
+
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['message_content'] for row in rows] == ['scam 1']
+    assert writer.stats()['enqueued'] == writer.stats()['written'] == 1
+
+
+def test_log_after_close_is_refused(tmp_path):
+    writer = ScamLogWriter(str(tmp_path / 'scams.csv'), FIELDS)
+    writer.start()
+    assert writer.log(make_row(1))
+    writer.close()
+    assert not writer.log(make_row(2))
+    assert writer.stats()['written'] == 1
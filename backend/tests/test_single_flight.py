@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from single_flight import FollowerTimeout, SingleFlight
+
+
+def start_leader(flight, key, fn):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = flight.do(key, fn)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for_waiters(flight, count):
+    deadline = time.monotonic() + 5
+    while flight.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, "follower never joined"
+        time.sleep(0.005)
+
+
+def test_follower_shares_the_leaders_result():
+    release = threading.Event()
+    flight = SingleFlight()
+    leader, outcome = start_leader(flight, "k", lambda: release.wait(5) and "verdict")
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.005)
+
+    follower = {}
+    thread = threading.Thread(target=lambda: follower.update(result=flight.do("k", lambda: "not called")))
+    thread.start()
+    wait_for_waiters(flight, 1)
+    release.set()
+    leader.join(5)
+    thread.join(5)
+
+    assert outcome["result"] == ("verdict", False)
+    assert follower["result"] == ("verdict", True)
+    assert flight.stats() == {"in_flight": 0, "waiting": 0, "leaders": 1, "coalesced": 1}
+
+
+def test_leader_error_propagates_to_followers():
+    release = threading.Event()
+    flight = SingleFlight()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("backend exploded")
+
+    leader, outcome = start_leader(flight, "k", fail)
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.005)
+    follower = {}
+
+    def follow():
+        try:
+            flight.do("k", lambda: "not called")
+        except ValueError as e:
+            follower["error"] = e
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    wait_for_waiters(flight, 1)
+    release.set()
+    leader.join(5)
+    thread.join(5)
+
+    assert isinstance(outcome["error"], ValueError)
+    assert follower["error"] is outcome["error"]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_follower_timeout_leaves_the_call_running():
+    release = threading.Event()
+    flight = SingleFlight()
+    leader, outcome = start_leader(flight, "k", lambda: release.wait(5) and "verdict")
+    while not flight.stats()["in_flight"]:
+        time.sleep(0.005)
+
+    with pytest.raises(FollowerTimeout):
+        flight.do("k", lambda: "not called", timeout=0.05)
+    assert flight.stats()["waiting"] == 0
+
+    release.set()
+    leader.join(5)
+    assert outcome["result"] == ("verdict", False)
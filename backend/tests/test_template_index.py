@@ -0,0 +1,33 @@
+import time
+
+from template_index import TemplateIndex, canonicalize_template
+
+VERDICT = {"classification": "LEGITIMATE", "confidence_score": 90}
+
+
+def test_canonical_template_keeps_link_domains():
+    assert canonicalize_template("Your OTP is 483920. Login at https://netbanking.hdfcbank.com/x") == \
+        "your otp is <num> login at <url:hdfcbank.com>"
+
+
+def test_templated_messages_share_a_verdict_but_not_across_domains():
+    index = TemplateIndex()
+    index.add("Rs 500 debited from a/c xx2004 on 12/05/2025. Info: hdfcbank.com/help", "AX-HDFCBK", "m", VERDICT)
+
+    cluster_id, verdict = index.lookup("Rs 1,250.00 debited from a/c xx9911 on 03/06/2025. Info: hdfcbank.com/help", "AX-HDFCBK", "m")
+    assert cluster_id is not None and verdict == VERDICT
+    assert index.lookup("Rs 1,250.00 debited from a/c xx9911 on 03/06/2025. Info: hdfcbank-help.top/help", "AX-HDFCBK", "m") == (None, None)
+    assert index.lookup("Rs 500 debited from a/c xx2004 on 12/05/2025. Info: hdfcbank.com/help", "AX-HDFCBK", "other-model") == (None, None)
+
+
+def test_clusters_expire_with_their_verdict(monkeypatch):
+    index = TemplateIndex(ttl_seconds=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    index.add("Your parcel 4821 was delivered today at 5 PM", "AX-DELHVY", "m", VERDICT)
+    assert index.lookup("Your parcel 9930 was delivered today at 7 PM", "AX-DELHVY", "m")[1] == VERDICT
+
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert index.lookup("Your parcel 9930 was delivered today at 7 PM", "AX-DELHVY", "m") == (None, None)
+    stats = index.stats()
+    assert stats["clusters"] == 0 and stats["expirations"] == 1 and stats["lsh_buckets"] == 0
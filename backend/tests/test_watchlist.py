@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from watchlist import Watchlist, build_watchlist_index, load_watchlist_binary, write_watchlist_binary
+
+CSV_ROWS = """country_code,phone_number,name,source,detection_date
+91,9876500001,ScammerRavi,UserReport,2025-01-15
+91,9876500002,,GovAlert,2025-02-20
+44,7700900003,UKSpamCo,CrowdSourced,2025-03-10
+91,9876500001,Duplicate,Later,2025-04-01
+91,98450*,BlockedSeries,Telecom,2025-05-05
+91,9812300000..9812300099,RangeA,Telecom,2025-06-06
+91,9812300050..9812300199,RangeB,Telecom,2025-06-07
+"""
+
+SENDERS = ["+919876500001", "09876500002", "+447700900003", "+919845012345", "+919812300000",
+           "+919812300150", "+919812300200", "+919999999999", "AX-HDFCBK"]
+
+
+@pytest.fixture
+def watchlist_csv(tmp_path):
+    path = tmp_path / "suspicious_numbers.csv"
+    path.write_text(CSV_ROWS, encoding="utf-8")
+    return str(path)
+
+
+def test_binary_round_trip_answers_like_the_csv_index(watchlist_csv, tmp_path):
+    index = build_watchlist_index(watchlist_csv)
+    binary = str(tmp_path / "suspicious_numbers.bin")
+    assert write_watchlist_binary(index, binary) == os.path.getsize(binary)
+
+    mapped = load_watchlist_binary(binary)
+    assert mapped.storage == "mmap" and index.storage == "memory"
+    assert mapped.numbers.tobytes() == index.numbers.tobytes()
+    assert mapped.meta.tobytes() == index.meta.tobytes()
+    assert list(mapped.strings) == list(index.strings)
+    assert len(mapped) == len(index) == 3 + 1 + 1 # Duplicate kept once, overlapping ranges merged
+
+    from_csv, from_binary = Watchlist(watchlist_csv), Watchlist(watchlist_csv, binary_path=binary)
+    from_csv.index, from_binary.index = index, mapped
+    for sender in SENDERS:
+        assert from_binary.lookup(sender) == from_csv.lookup(sender), sender
+
+
+def test_lookups_cover_exact_prefix_and_range_entries(watchlist_csv, tmp_path):
+    binary = str(tmp_path / "suspicious_numbers.bin")
+    write_watchlist_binary(build_watchlist_index(watchlist_csv), binary)
+    watchlist = Watchlist(watchlist_csv, binary_path=binary)
+    assert watchlist.load()
+    assert watchlist.stats()["storage"] == "mmap"
+
+    assert watchlist.lookup("+919876500001")["name"] == "ScammerRavi" # First row wins
+    assert watchlist.lookup("09876500002")["source"] == "GovAlert"
+    assert watchlist.lookup("+919845012345")["match"] == "prefix"
+    merged = watchlist.lookup("+919812300150")
+    assert merged["match"] == "range" and merged["name"] == "RangeA"
+    assert watchlist.lookup("+919812300200") is None
+    assert watchlist.lookup("AX-HDFCBK") is None
+
+
+def test_binary_older_than_the_csv_is_ignored(watchlist_csv, tmp_path):
+    binary = str(tmp_path / "suspicious_numbers.bin")
+    write_watchlist_binary(build_watchlist_index(watchlist_csv), binary)
+    csv_mtime = os.path.getmtime(binary) + 10
+    os.utime(watchlist_csv, (csv_mtime, csv_mtime))
+
+    watchlist = Watchlist(watchlist_csv, binary_path=binary)
+    assert watchlist.load()
+    assert watchlist.stats()["storage"] == "memory"
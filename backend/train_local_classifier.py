@@ -0,0 +1,78 @@
+"""
+Trains the local classifier tier offline.
+
+Scam examples come from the high-confidence scam log (the scam_events.db store or a
+CSV log); the labeled corpus adds both
+classes. The corpus is a CSV with 'message' and 'label' (SCAM or LEGITIMATE) columns
+and an optional 'sender' column.
+
+    python train_local_classifier.py --corpus labeled_sms.csv
+"""
+import argparse
+import csv
+import os
+import random
+
+from local_classifier import HashedNgramClassifier, DEFAULT_NUM_BUCKETS
+from scam_store import ScamEventStore
+
+
+def read_examples(corpus_path, scam_log_path):
+    examples = []
+    if scam_log_path and scam_log_path.endswith('.db'):
+        if os.path.exists(scam_log_path):
+            examples.extend((message, sender, True) for message, sender in ScamEventStore(scam_log_path).iter_messages())
+        else:
+            print(f"⚠️ No scam store at {scam_log_path}; using the labeled corpus only")
+    elif scam_log_path:
+        with open(scam_log_path, mode='r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('message_content'):
+                    examples.append((row['message_content'], row.get('sender_id', ''), True))
+    if corpus_path:
+        with open(corpus_path, mode='r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                label = (row.get('label') or '').strip().upper()
+                if row.get('message') and label in ("SCAM", "LEGITIMATE"):
+                    examples.append((row['message'], row.get('sender', ''), label == "SCAM"))
+    return examples
+
+
+def accuracy(model, examples, threshold=0.5):
+    if not examples:
+        return 0.0
+    correct = sum(1 for text, sender, is_scam in examples if (model.scam_probability(text, sender) >= threshold) == is_scam)
+    return correct / len(examples)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the hashed n-gram scam classifier")
+    parser.add_argument('--corpus', help="Labeled CSV with message,label[,sender] columns")
+    parser.add_argument('--scam-log', default='scam_events.db', help="Scam store (.db) or CSV log used as extra SCAM examples ('' to skip)")
+    parser.add_argument('--output', default='local_model.json')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--learning-rate', type=float, default=0.5)
+    parser.add_argument('--l2', type=float, default=1e-5)
+    parser.add_argument('--buckets', type=int, default=DEFAULT_NUM_BUCKETS)
+    parser.add_argument('--holdout', type=float, default=0.1, help="Fraction kept aside to report accuracy")
+    args = parser.parse_args()
+
+    examples = read_examples(args.corpus, args.scam_log)
+    if not examples:
+        parser.error("No training examples found")
+    scam_count = sum(1 for _, _, is_scam in examples if is_scam)
+    if scam_count in (0, len(examples)):
+        print("⚠️ Only one class in the training data; add a labeled corpus with both SCAM and LEGITIMATE rows.")
+
+    random.Random(42).shuffle(examples)
+    holdout_size = int(len(examples) * args.holdout)
+    holdout, train = examples[:holdout_size], examples[holdout_size:]
+
+    model = HashedNgramClassifier.train(train, args.epochs, args.learning_rate, args.l2, args.buckets)
+    model.save(args.output)
+
+    print(f"🧠 Trained on {len(train)} messages ({scam_count} scam in total), {len(model.weights)} non-zero weights")
+    print(f"   Train accuracy:   {accuracy(model, train):.3f}")
+    if holdout:
+        print(f"   Holdout accuracy: {accuracy(model, holdout):.3f} ({len(holdout)} messages)")
+    print(f"💾 Saved to {args.output}")
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+PHONE_SENDER_PATTERN = re.compile(r'^\+?[\d\s\-()]{5,}$')
+SQLITE_BUSY_TIMEOUT_SECONDS = 5 # How long a write waits for another worker process holding the lock
+
+
+def normalize_message(sms_text):
+    """Normalizes SMS text so trivially different copies of the same message share a key."""
+    text = unicodedata.normalize('NFKC', sms_text or '')
+    return ' '.join(text.lower().split())
+
+
+def sender_class(sender_number):
+    """
+    Buckets a sender for cache keying. Phone numbers all share one class (the watchlist
+    handles individual numbers); alphanumeric IDs like 'AX-ICICIB' or 'Amazon' keep their name
+    because the LLM judges them by it.
+    """
+    sender = (sender_number or '').strip()
+    if not sender or sender.lower() == 'unknown':
+        return 'UNKNOWN'
+    if PHONE_SENDER_PATTERN.match(sender):
+        return 'PHONE'
+    return sender.upper()
+
+
+def make_cache_key(sms_text, sender_number, model):
+    """Content address for a verdict: normalized text + sender class + model."""
+    raw = f"{model}\x1f{sender_class(sender_number)}\x1f{normalize_message(sms_text)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class VerdictCache:
+    """
+    Bounded LRU cache with a TTL for LLM verdicts, optionally backed by SQLite
+    so verdicts survive a restart. Safe to share between request threads: the lock
+    only covers the in-memory LRU, and database reads and writes run outside it on a
+    per-thread connection, so a hit never waits behind another thread's commit.
+    Worker processes pointed at the same database share verdicts: a miss in one
+    process's memory layer reads what any other process stored. Expired rows, and the
+    oldest beyond max_db_entries, are pruned from the file every prune_interval_seconds.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=86400, db_path=None, max_db_entries=None,
+                 prune_interval_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.max_db_entries = max_db_entries or max_entries * 10
+        self.prune_interval_seconds = prune_interval_seconds
+        self._entries = OrderedDict() # key -> (stored_at, verdict)
+        self._lock = threading.Lock()
+        self._local = threading.local() # Per-thread database connection, tagged with the process id
+        self.persistent = False
+        self._next_prune = 0.0
+        self.hits = 0
+        self.shared_hits = 0 # Hits read from the database, possibly stored by another process
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.db_pruned = 0
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            db = self._connection()
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, verdict TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS verdicts_stored_at ON verdicts (stored_at)")
+            db.commit()
+            self.persistent = True
+            self._prune()
+            count = db.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            logger.info(f"💾 Verdict cache persistence at {self.db_path} ({count} stored verdicts)")
+        except Exception as e:
+            logger.error(f"💥 Could not open verdict cache database {self.db_path}: {e}. Using memory only.")
+            self.persistent = False
+
+    def _connection(self):
+        """This thread's connection; one inherited across a fork is never used in the child."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.db = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+            local.db.execute("PRAGMA journal_mode=WAL")
+            local.db.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.db
+
+    def get(self, key):
+        """Returns a copy of the cached verdict, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, verdict = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(verdict)
+                del self._entries[key]
+                self.expirations += 1
+
+        stored = self._db_get(key, now) # Outside the lock: other threads keep hitting memory meanwhile
+        with self._lock:
+            if stored is not None:
+                self._insert(key, stored)
+                self.hits += 1
+                self.shared_hits += 1
+                return dict(stored[1])
+            self.misses += 1
+            return None
+
+    def put(self, key, verdict):
+        entry = (time.time(), dict(verdict))
+        with self._lock:
+            self._insert(key, entry)
+            prune_due = self.persistent and time.monotonic() >= self._next_prune
+        self._db_put(key, entry)
+        if prune_due:
+            self._prune()
+
+    def clear(self):
+        """Drops every verdict, in memory and in the database. Returns the number of database rows deleted."""
+        with self._lock:
+            self._entries.clear()
+        if not self.persistent:
+            return 0
+        try:
+            db = self._connection()
+            with db:
+                return db.execute("DELETE FROM verdicts").rowcount
+        except Exception as e:
+            logger.warning(f"⚠️ Verdict cache clear failed: {e}")
+            return 0
+
+    def _insert(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _db_get(self, key, now):
+        if not self.persistent:
+            return None
+        try:
+            row = self._connection().execute("SELECT stored_at, verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+        except Exception as e:
+            logger.warning(f"⚠️ Verdict cache read failed: {e}")
+            return None
+        if row is None or now - row[0] > self.ttl_seconds:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _db_put(self, key, entry):
+        if not self.persistent:
+            return
+        try:
+            db = self._connection()
+            db.execute(
+                "INSERT OR REPLACE INTO verdicts (key, stored_at, verdict) VALUES (?, ?, ?)",
+                (key, entry[0], json.dumps(entry[1]))
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Verdict cache write failed: {e}")
+
+    def _prune(self):
+        """Deletes expired rows and the oldest rows beyond max_db_entries from the database."""
+        with self._lock:
+            self._next_prune = time.monotonic() + self.prune_interval_seconds
+        try:
+            db = self._connection()
+            with db:
+                pruned = db.execute("DELETE FROM verdicts WHERE stored_at < ?", (time.time() - self.ttl_seconds,)).rowcount
+                pruned += db.execute(
+                    "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_db_entries,)).rowcount
+        except Exception as e:
+            logger.warning(f"⚠️ Verdict cache prune failed: {e}")
+            return 0
+        with self._lock:
+            self.db_pruned += pruned
+        return pruned
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "persistent": self.persistent,
+                "max_db_entries": self.max_db_entries,
+                "db_pruned": self.db_pruned
+            }
@@ -0,0 +1,375 @@
+import csv
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+logger = logging.getLogger(__name__)
+
+PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+BINARY_MAGIC = b'SMSWL\x00\x00\x01' # Last byte is the format version
+
+
+def normalize_phone_number(raw_number, country_code=None, default_country_code='91', prefix=False):
+    """
+    Canonicalizes a phone number to E.164 digits (no '+'), e.g. '+91 98765-00001' -> '919876500001'.
+    National numbers get country_code, or default_country_code when they look like a
+    10-digit national number. Returns None for alphanumeric sender IDs and invalid numbers.
+    With prefix=True the input is the leading part of a number block, so any national
+    prefix gets a country code and only the digit count upper bound applies.
+    """
+    number = PHONE_SEPARATORS.sub('', raw_number or '')
+    country_code = (country_code or '').strip().lstrip('+')
+
+    if number.startswith('+'):
+        digits = number[1:]
+    elif number.startswith('00'):
+        digits = number[2:] # International dialing prefix
+    elif country_code:
+        digits = country_code + number.lstrip('0') # Drop the national trunk prefix
+    elif prefix:
+        digits = default_country_code + number.lstrip('0')
+    elif len(number) == 10:
+        digits = default_country_code + number
+    elif len(number) == 11 and number.startswith('0'):
+        digits = default_country_code + number[1:]
+    else:
+        digits = number # Assume it already carries its country code
+
+    min_length = 1 if prefix else 7
+    if not digits.isdigit() or not min_length <= len(digits) <= 15:
+        return None
+    return digits
+
+
+class WatchlistIndex:
+    """
+    Immutable watchlist snapshot. Exact numbers are a sorted packed array of E.164 integers
+    (8 bytes each) searched with bisect; metadata is interned into parallel index arrays.
+    Number blocks are kept as prefixes ('+9198765*') and merged [start, end] ranges.
+    """
+
+    def __init__(self, numbers, meta, strings, prefixes, range_starts, range_ends, range_meta=(), source=None, storage="memory"):
+        self.numbers = numbers # array('Q') or a memoryview of a mapped file, sorted, unique
+        self.meta = meta # array('I'), 3 string-table indexes (name, source, date) per number
+        self.strings = strings # interned metadata strings; index 0 is ''
+        self.prefixes = prefixes # dict: digit prefix -> (name, source, date)
+        self.prefix_lengths = sorted({len(p) for p in prefixes})
+        self.range_starts = range_starts # array('Q'), sorted, non-overlapping
+        self.range_ends = range_ends # array('Q'), same length as range_starts
+        self.range_meta = range_meta # (name, source, date) of the first row of each merged range
+        self.source = source
+        self.storage = storage # "memory" (built from the CSV) or "mmap" (binary file, shared page cache)
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.numbers) + len(self.prefixes) + len(self.range_starts)
+
+    def _entry(self, position):
+        base = position * 3
+        name, source, date = (self.strings[i] or None for i in self.meta[base:base + 3])
+        return {"name": name, "source": source, "detection_date": date}
+
+    def lookup(self, e164_digits):
+        """Returns the matching entry's metadata plus how it matched, or None."""
+        value = int(e164_digits)
+        position = bisect_left(self.numbers, value)
+        if position < len(self.numbers) and self.numbers[position] == value:
+            return dict(self._entry(position), match="exact", number=f"+{e164_digits}")
+
+        for length in self.prefix_lengths:
+            if length > len(e164_digits):
+                break
+            entry = self.prefixes.get(e164_digits[:length])
+            if entry is not None:
+                name, source, date = entry
+                return {"name": name, "source": source, "detection_date": date, "match": "prefix", "number": f"+{e164_digits[:length]}*"}
+
+        position = bisect_right(self.range_starts, value) - 1
+        if position >= 0 and value <= self.range_ends[position]:
+            name, source, date = self.range_meta[position]
+            return {"name": name, "source": source, "detection_date": date, "match": "range",
+                    "number": f"+{self.range_starts[position]}..+{self.range_ends[position]}"}
+        return None
+
+    def stats(self):
+        return {
+            "numbers": len(self.numbers),
+            "prefixes": len(self.prefixes),
+            "ranges": len(self.range_starts),
+            "index_bytes": (self.numbers.itemsize * len(self.numbers) + self.meta.itemsize * len(self.meta)
+                            + self.range_starts.itemsize * len(self.range_starts) * 2),
+            "source": self.source,
+            "storage": self.storage,
+            "loaded_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at))
+        }
+
+
+class MappedStrings:
+    """Read-only string table over a mapped file: uint32 offsets into a UTF-8 blob, decoded on access."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+
+def row_metadata(row):
+    return tuple((row.get(k) or '').strip() or None for k in ('name', 'source', 'detection_date'))
+
+
+def build_watchlist_index(csv_path, default_country_code='91'):
+    """
+    Reads the watchlist CSV (phone_number, country_code, name, source, detection_date) into a
+    WatchlistIndex. A phone_number ending in '*' is a prefix block ('+9198765*') and
+    'start..end' is an inclusive range ('+919876500000..+919876500999').
+    """
+    values = array('Q')
+    meta = array('I')
+    strings, string_ids = [''], {'': 0}
+    prefixes = {}
+    ranges = []
+    skipped = 0
+
+    def intern(text):
+        text = (text or '').strip()
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(strings)
+            strings.append(text)
+        return string_id
+
+    with open(csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            phone_number = (row.get('phone_number') or '').strip()
+            country_code = row.get('country_code')
+            if not phone_number:
+                continue
+
+            if phone_number.endswith('*'):
+                prefix = normalize_phone_number(phone_number[:-1], country_code, default_country_code, prefix=True)
+                if prefix is None:
+                    skipped += 1
+                    continue
+                prefixes[prefix] = row_metadata(row)
+                continue
+
+            if '..' in phone_number:
+                start, _, end = phone_number.partition('..')
+                start = normalize_phone_number(start, country_code, default_country_code)
+                end = normalize_phone_number(end, country_code, default_country_code)
+                # Equal lengths keep integer order the same as number order
+                if start is None or end is None or len(start) != len(end) or int(start) > int(end):
+                    skipped += 1
+                    continue
+                ranges.append((int(start), int(end), row_metadata(row)))
+                continue
+
+            digits = normalize_phone_number(phone_number, country_code, default_country_code)
+            if digits is None:
+                skipped += 1
+                continue
+            values.append(int(digits))
+            meta.extend((intern(row.get('name')), intern(row.get('source')), intern(row.get('detection_date'))))
+
+    # Sort numbers (and their metadata with them), keeping the first row for duplicates
+    order = sorted(range(len(values)), key=values.__getitem__)
+    numbers, sorted_meta = array('Q'), array('I')
+    for i in order:
+        if numbers and numbers[-1] == values[i]:
+            continue
+        numbers.append(values[i])
+        sorted_meta.extend(meta[i * 3:i * 3 + 3])
+
+    # Merge overlapping ranges so a single bisect answers a lookup
+    range_starts, range_ends, range_meta = array('Q'), array('Q'), []
+    for start, end, metadata in sorted(ranges, key=lambda r: (r[0], r[1])):
+        if range_ends and start <= range_ends[-1] + 1 and len(str(start)) == len(str(range_ends[-1])):
+            range_ends[-1] = max(range_ends[-1], end)
+        else:
+            range_starts.append(start)
+            range_ends.append(end)
+            range_meta.append(metadata)
+
+    if skipped:
+        logger.warning(f"⚠️ Skipped {skipped} watchlist rows that could not be normalized")
+    return WatchlistIndex(numbers, sorted_meta, strings, prefixes, range_starts, range_ends, range_meta, csv_path)
+
+
+def _align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def write_watchlist_binary(index, path, default_country_code='91'):
+    """
+    Writes an index in the binary format load_watchlist_binary() maps: the magic, a
+    little-endian uint32 header length, a JSON header (section offsets, byte order,
+    prefixes and range metadata, which are small) and 8-byte aligned native-order
+    sections: numbers (uint64), metadata ids (3 x uint32 per number), string offsets
+    (uint32) and UTF-8 string bytes, range starts and ends (uint64). The file is written
+    next to the target and renamed over it, so processes mapping the old file keep it.
+    """
+    encoded = [text.encode('utf-8') for text in index.strings]
+    string_offsets = array('I', [0])
+    for text in encoded:
+        string_offsets.append(string_offsets[-1] + len(text))
+    sections = [("numbers", index.numbers.tobytes()), ("meta", index.meta.tobytes()),
+                ("string_offsets", string_offsets.tobytes()), ("string_bytes", b''.join(encoded)),
+                ("range_starts", index.range_starts.tobytes()), ("range_ends", index.range_ends.tobytes())]
+
+    layout, offset = {}, 0
+    for name, data in sections:
+        layout[name] = [offset, len(data)]
+        offset = _align(offset + len(data))
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "default_country_code": default_country_code,
+        "source": index.source,
+        "built_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "sections": layout,
+        "prefixes": index.prefixes,
+        "range_meta": list(index.range_meta)
+    }).encode('utf-8')
+
+    data_start = _align(len(BINARY_MAGIC) + 4 + len(header))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(BINARY_MAGIC + len(header).to_bytes(4, 'little') + header)
+        for name, data in sections:
+            f.seek(data_start + layout[name][0])
+            f.write(data)
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+    return data_start + offset
+
+
+def load_watchlist_binary(path):
+    """
+    Memory-maps a file written by write_watchlist_binary(). Lookups read the mapped pages
+    directly (memoryview casts, no copies), so every process mapping the same file shares
+    one copy in the page cache. Raises ValueError for files it cannot use.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if view[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError(f"{path} is not a binary watchlist (or was built by another format version)")
+    header_length = int.from_bytes(view[len(BINARY_MAGIC):len(BINARY_MAGIC) + 4], 'little')
+    header_start = len(BINARY_MAGIC) + 4
+    header = json.loads(bytes(view[header_start:header_start + header_length]))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine; rebuild it here")
+    data_start = _align(header_start + header_length)
+
+    def section(name, item_format):
+        offset, length = header["sections"][name]
+        return view[data_start + offset:data_start + offset + length].cast(item_format)
+
+    prefixes = {prefix: tuple(entry) for prefix, entry in header["prefixes"].items()}
+    index = WatchlistIndex(section("numbers", 'Q'), section("meta", 'I'),
+                           MappedStrings(section("string_offsets", 'I'), section("string_bytes", 'B')),
+                           prefixes, section("range_starts", 'Q'), section("range_ends", 'Q'),
+                           [tuple(entry) for entry in header["range_meta"]], path, storage="mmap")
+    index.default_country_code = header["default_country_code"]
+    return index
+
+
+class Watchlist:
+    """
+    Watchlist store with hot reload. A background thread rebuilds the index when the CSV
+    changes and swaps it in with one reference assignment, so lookups never take a lock.
+    When binary_path exists and is not older than the CSV, it is memory-mapped instead
+    of parsing the CSV, so worker processes share one read-only copy.
+    """
+
+    def __init__(self, csv_path, default_country_code='91', reload_interval_seconds=10, binary_path=None):
+        self.csv_path = csv_path
+        self.binary_path = binary_path
+        self.default_country_code = default_country_code
+        self.reload_interval_seconds = reload_interval_seconds
+        self.index = WatchlistIndex(array('Q'), array('I'), [''], {}, array('Q'), array('Q'))
+        self.reloads = 0
+        self._loaded_from = None # (path, mtime) of the current index
+        self._stale_binary_mtime = None
+        self._reloader = None
+
+    def _pick_source(self):
+        """(path, mtime, is_binary) to load from, or None when neither file exists."""
+        def mtime(path):
+            try:
+                return os.path.getmtime(path) if path else None
+            except OSError:
+                return None
+
+        csv_mtime, binary_mtime = mtime(self.csv_path), mtime(self.binary_path)
+        if binary_mtime is not None and (csv_mtime is None or binary_mtime >= csv_mtime):
+            return self.binary_path, binary_mtime, True
+        if binary_mtime is not None and binary_mtime != self._stale_binary_mtime:
+            self._stale_binary_mtime = binary_mtime # Warn once per binary file, not on every reload check
+            logger.warning(f"⚠️ {self.binary_path} is older than {self.csv_path}; parsing the CSV. Rebuild it with build_watchlist.py")
+        if csv_mtime is None:
+            return None
+        return self.csv_path, csv_mtime, False
+
+    def load(self):
+        """(Re)loads the index from the binary file or the CSV. Returns True if a new index was swapped in."""
+        source = self._pick_source()
+        if source is None:
+            logger.warning(f"⚠️ Watchlist file not found: {self.csv_path}. Watchlist will be empty.")
+            return False
+        path, mtime, is_binary = source
+        if (path, mtime) == self._loaded_from:
+            return False
+        try:
+            start = time.time()
+            if is_binary:
+                index = load_watchlist_binary(path)
+                if index.default_country_code != self.default_country_code:
+                    logger.warning(f"⚠️ {path} was built with default country code {index.default_country_code}, "
+                                   f"not {self.default_country_code}")
+            else:
+                index = build_watchlist_index(path, self.default_country_code)
+            self.index = index # Atomic swap: readers see either the old or the new index
+            self._loaded_from = (path, mtime)
+            self.reloads += 1
+            logger.info(f"👁️ Loaded {len(index)} watchlist entries from {path} in {time.time() - start:.2f}s")
+            return True
+        except Exception as e:
+            logger.error(f"💥 Error loading suspicious numbers from {path}: {e}. Keeping previous watchlist.")
+            return False
+
+    def start_auto_reload(self):
+        if self._reloader is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.reload_interval_seconds)
+                self.load()
+
+        self._reloader = threading.Thread(target=watch, name='watchlist-reloader', daemon=True)
+        self._reloader.start()
+
+    def lookup(self, sender_number):
+        """Returns the watchlist entry for a sender, or None. Alphanumeric sender IDs never match."""
+        digits = normalize_phone_number(sender_number, default_country_code=self.default_country_code)
+        if digits is None:
+            return None
+        return self.index.lookup(digits)
+
+    def __len__(self):
+        return len(self.index)
+
+    def stats(self):
+        return dict(self.index.stats(), reloads=self.reloads, reload_interval_seconds=self.reload_interval_seconds)